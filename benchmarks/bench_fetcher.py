@@ -0,0 +1,58 @@
+"""Compare sequential and concurrent price history fetching against a fake client.
+
+Run from the repository root:
+    python -m benchmarks.bench_fetcher --symbols 200 --latency 0.25
+"""
+import argparse
+import time as time
+
+from pyRobot.fetcher import PriceFetcher
+from pyRobot.fake_session import FakeSession
+
+def sequential(client: FakeSession, requests: dict) -> dict:
+    # The old behaviour, one symbol at a time with a single blocking retry
+    responses = {}
+    for symbol, kwargs in requests.items():
+        response = client.get_price_history(**kwargs)
+        if 'error' in response:
+            time.sleep(2)
+            response = client.get_price_history(**kwargs)
+        responses[symbol] = response
+    return responses
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.25)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=50.0, help='requests per second allowed by the token bucket')
+    parser.add_argument('--skip-sequential', action='store_true')
+    args = parser.parse_args()
+
+    requests = {
+        'SYM{}'.format(i): {'symbol': 'SYM{}'.format(i), 'start_date': '0', 'end_date': '60000'}
+        for i in range(args.symbols)
+    }
+
+    if not args.skip_sequential:
+        client = FakeSession(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+        start = time.perf_counter()
+        sequential(client=client, requests=requests)
+        print("sequential: {seconds:.2f}s, {calls} calls".format(seconds=time.perf_counter() - start, calls=client.calls['get_price_history']))
+
+    client = FakeSession(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    fetcher = PriceFetcher(session=client, max_workers=args.workers, requests_per_second=args.rate, burst=args.workers, requests_per_window=None)
+    start = time.perf_counter()
+    responses = fetcher.fetch(requests=requests)
+    print("concurrent: {seconds:.2f}s, {calls} calls, {ok} ok, {failed} failed".format(
+        seconds=time.perf_counter() - start,
+        calls=client.calls['get_price_history'],
+        ok=len(responses),
+        failed=len(fetcher.failures)
+    ))
+    fetcher.close()
+
+if __name__ == '__main__':
+    main()
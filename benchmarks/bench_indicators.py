@@ -0,0 +1,126 @@
+"""Time the extended indicator library on a large synthetic universe.
+
+Run from the repository root (the defaults are 500 symbols x 50,000 bars, about
+25 million rows, and want several GiB of memory):
+    python -m benchmarks.bench_indicators
+    python -m benchmarks.bench_indicators --symbols 100 --bars 10000 --modes batch --output indicators.json
+
+Every indicator is timed on its own fresh StockFrame, then all of them together
+to show what the shared nodes save, then the per-bar refresh with everything
+registered. The candles are built as arrays, a list of 25 million dicts would
+not fit in memory.
+"""
+import argparse
+import json
+import platform
+import time as time
+
+import numpy as np
+import pandas as pd
+
+from typing import List, Dict, Callable
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+from benchmarks.bench_suite import START_TIME, BAR_MILLISECONDS, synthetic_candles, measure, git_commit
+
+INDICATORS: Dict[str, Callable[[Indicators], None]] = {
+    'macd': lambda indicators: indicators.macd(),
+    'bollinger_bands': lambda indicators: indicators.bollinger_bands(),
+    'atr': lambda indicators: indicators.atr(),
+    'vwap': lambda indicators: indicators.vwap(),
+    'stochastic_oscillator': lambda indicators: indicators.stochastic_oscillator(),
+    'obv': lambda indicators: indicators.obv()
+}
+
+def register_all(indicators: Indicators) -> None:
+    # Next to the SMA and EMA they share nodes with
+    indicators.sma(period=20)
+    indicators.ema(period=12)
+    for register in INDICATORS.values():
+        register(indicators)
+
+def synthetic_arrays(symbols: int, bars: int, seed: int = 0) -> Dict[str, Dict[str, np.ndarray]]:
+    # The same random walks as synthetic_candles, shaped for StockFrame.from_arrays
+    rng = np.random.default_rng(seed)
+    arrays = {}
+
+    for symbol_number in range(symbols):
+        close = 100.0 + np.cumsum(rng.normal(scale=0.1, size=bars))
+        spread = np.abs(rng.normal(scale=0.05, size=bars))
+        arrays['SYM{:04d}'.format(symbol_number)] = {
+            'datetime': START_TIME + np.arange(bars, dtype=np.int64) * BAR_MILLISECONDS,
+            'open': close - spread / 2,
+            'close': close,
+            'high': close + spread,
+            'low': close - spread,
+            'volume': rng.integers(100, 10_000, size=bars)
+        }
+
+    return arrays
+
+def run_suite(symbols: int, bars: int, new_bars: int, repeat: int, modes: List[str]) -> List[Dict[str, float]]:
+    arrays = synthetic_arrays(symbols=symbols, bars=bars)
+    rows = symbols * bars
+    next_bars = [
+        synthetic_candles(symbols=symbols, bars=1, seed=bar + 1, start_bar=bars + bar)
+        for bar in range(new_bars)
+    ]
+
+    results = []
+    for mode in modes:
+        streaming = mode == 'streaming'
+
+        def setup_frame() -> dict:
+            return {'indicators': Indicators(price_data_frame=StockFrame.from_arrays(arrays=arrays), streaming=streaming)}
+
+        def setup_registered() -> dict:
+            stock_frame = StockFrame.from_arrays(arrays=arrays)
+            indicators = Indicators(price_data_frame=stock_frame, streaming=streaming)
+            register_all(indicators=indicators)
+            return {'stock_frame': stock_frame, 'indicators': indicators}
+
+        def per_bar_loop(stock_frame: StockFrame, indicators: Indicators) -> None:
+            for latest_bar in next_bars:
+                stock_frame.add_rows(data=latest_bar)
+                indicators.refresh()
+
+        for name, register in INDICATORS.items():
+            results.append(measure('{}.{}'.format(mode, name), setup_frame, register, rows, repeat))
+
+        results += [
+            measure('{}.all'.format(mode), setup_frame, lambda indicators: register_all(indicators=indicators), rows, repeat),
+            measure('{}.per_bar_loop'.format(mode), setup_registered, per_bar_loop, symbols * new_bars, repeat)
+        ]
+
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=50_000, help='history per symbol')
+    parser.add_argument('--new-bars', type=int, default=5, help='bars appended in the per-bar benchmark')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--modes', nargs='+', choices=['streaming', 'batch'], default=['streaming', 'batch'])
+    parser.add_argument('--output', type=str, default=None, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run_suite(symbols=args.symbols, bars=args.bars, new_bars=args.new_bars, repeat=args.repeat, modes=args.modes)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'scale': {'symbols': args.symbols, 'bars': args.bars, 'new_bars': args.new_bars},
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, mode='w') as output_file:
+            json.dump(report, output_file, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Load test the per-bar robot loop against a FakeSession.
+
+Run from the repository root:
+    python -m benchmarks.bench_robot --symbols 1000 --bars 5 --latency 0.05
+    python -m benchmarks.bench_robot --symbols 1000 --bars 5 --shards 4
+"""
+import argparse
+import operator
+import tempfile
+import pathlib
+import time as time
+
+from datetime import datetime, timedelta
+
+from pyRobot.robot import PyRobot
+from pyRobot.indicators import Indicators
+from pyRobot.fetcher import PriceFetcher
+from pyRobot.fake_session import FakeSession
+from pyRobot.order_journal import OrderJournal
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=1000)
+    parser.add_argument('--bars', type=int, default=5, help='loop iterations to run')
+    parser.add_argument('--days', type=int, default=2, help='history loaded before the loop starts')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--rate', type=float, default=500.0, help='requests per second allowed by the fetcher')
+    parser.add_argument('--shards', type=int, default=0, help='worker processes to split the symbols across, 0 for none')
+    args = parser.parse_args()
+
+    session = FakeSession(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    trading_robot = PyRobot(client_id='', redirect_uri='', session=session)
+    trading_robot.fetcher = PriceFetcher(session=session, max_workers=args.workers, requests_per_second=args.rate, burst=args.workers, requests_per_window=None, metrics=trading_robot.metrics)
+    trading_robot.order_journal = OrderJournal(path=pathlib.Path(tempfile.mkdtemp()).joinpath('orders.jsonl'))
+
+    trading_robot.create_portfolio()
+    for number in range(args.symbols):
+        trading_robot.portfolio.add_position(symbol='SYM{:04d}'.format(number), asset_type='equity', purchase_date=None)
+
+    end_date = datetime.now()
+    start = time.perf_counter()
+    historical_prices = trading_robot.grab_historical_prices(start=end_date - timedelta(days=args.days), end=end_date)
+    fetch_history = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stock_frame = trading_robot.create_stock_frame(data=historical_prices['aggregated'])
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.rsi(period=14)
+    indicators.sma(period=50)
+    indicators.ema(period=20)
+    indicators.set_indicator_signals(indicator='rsi', buy=40.0, sell=20.0, condition_buy=operator.ge, condition_sell=operator.le)
+    if args.shards:
+        trading_robot.create_shards(indicators=indicators, shards=args.shards)
+    setup = time.perf_counter() - start
+
+    print("history: {rows:,} rows for {symbols} symbols, fetched in {fetch:.2f}s, indicators set up in {setup:.2f}s".format(
+        rows=len(historical_prices['aggregated']),
+        symbols=args.symbols,
+        fetch=fetch_history,
+        setup=setup
+    ))
+
+    for bar in range(args.bars):
+        start = time.perf_counter()
+        latest_bar = trading_robot.get_latest_bar()
+        fetched = time.perf_counter()
+
+        signals = trading_robot._process_bar(latest_bar=latest_bar, indicators=indicators)
+        processed = time.perf_counter()
+
+        trading_robot.execute_signals(signals=signals, trades_to_execute={})
+        executed = time.perf_counter()
+
+        print("bar {bar}: fetch {fetch:.3f}s ({count} bars, {failed} failed), process {process:.4f}s, execute {execute:.4f}s".format(
+            bar=bar,
+            fetch=fetched - start,
+            count=len(latest_bar),
+            failed=len(trading_robot.fetcher.failures),
+            process=processed - fetched,
+            execute=executed - processed
+        ))
+
+    print("api calls: {calls}".format(calls=session.calls))
+
+    snapshot = trading_robot.metrics.snapshot()
+    for name, stage in snapshot['stages'].items():
+        print("{name:<20} n={count:<6} wall p50 {p50:.4f}s p95 {p95:.4f}s p99 {p99:.4f}s  cpu p50 {cpu:.4f}s".format(
+            name=name,
+            cpu=stage['cpu']['p50'],
+            **stage['wall']
+        ))
+    print("counters: {counters}".format(counters=snapshot['counters']))
+    trading_robot.fetcher.close()
+    if trading_robot.shards is not None:
+        trading_robot.shards.close()
+
+if __name__ == '__main__':
+    main()
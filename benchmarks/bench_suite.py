@@ -0,0 +1,195 @@
+"""Time the StockFrame, Indicators and per-bar loop hot paths on synthetic candles.
+
+Run from the repository root, no TD credentials needed:
+    python -m benchmarks.bench_suite --symbols 100 --bars 2000 --output bench.json
+
+Every benchmark records the best wall time over --repeat runs, the throughput
+in rows per second and the peak memory traced during one extra run.
+"""
+import argparse
+import json
+import operator
+import platform
+import subprocess
+import time as time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from typing import List, Dict, Callable
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+
+START_TIME = 1_600_000_000_000      # milliseconds since epoch
+BAR_MILLISECONDS = 60_000
+
+def synthetic_candles(symbols: int, bars: int, seed: int = 0, start_bar: int = 0) -> List[dict]:
+    # A random walk per symbol, shaped like the candles grab_historical_prices returns
+    rng = np.random.default_rng(seed)
+    candles = []
+
+    for symbol_number in range(symbols):
+        symbol = 'SYM{:04d}'.format(symbol_number)
+        close = 100.0 + np.cumsum(rng.normal(scale=0.1, size=bars))
+        spread = np.abs(rng.normal(scale=0.05, size=bars))
+        volume = rng.integers(100, 10_000, size=bars)
+
+        for bar in range(bars):
+            candles.append({
+                'symbol': symbol,
+                'open': float(close[bar] - spread[bar] / 2),
+                'close': float(close[bar]),
+                'high': float(close[bar] + spread[bar]),
+                'low': float(close[bar] - spread[bar]),
+                'volume': int(volume[bar]),
+                'datetime': START_TIME + (start_bar + bar) * BAR_MILLISECONDS
+            })
+
+    return candles
+
+def measure(name: str, setup: Callable[[], dict], run: Callable[..., None], rows: int, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        context = setup()
+        start = time.perf_counter()
+        run(**context)
+        timings.append(time.perf_counter() - start)
+
+        # Let the frame go before the next setup builds another one
+        del context
+
+    # Peak memory comes from a separate run, tracing slows the timed ones down
+    context = setup()
+    tracemalloc.start()
+    run(**context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    result = {
+        'name': name,
+        'seconds': best,
+        'median_seconds': float(np.median(timings)),
+        'rows': rows,
+        'rows_per_second': rows / best if best else float('inf'),
+        'peak_memory_bytes': peak
+    }
+    print("{name:<32} {seconds:>10.4f}s {rate:>14,.0f} rows/s {memory:>10.1f} MiB".format(
+        name=name,
+        seconds=best,
+        rate=result['rows_per_second'],
+        memory=peak / 2 ** 20
+    ))
+    return result
+
+def register_indicators(indicators: Indicators) -> None:
+    indicators.rsi(period=14)
+    indicators.sma(period=50)
+    indicators.ema(period=20)
+    indicators.set_indicator_signals(indicator='rsi', buy=40.0, sell=20.0, condition_buy=operator.ge, condition_sell=operator.le)
+    indicators.set_indicator_signal_compare(indicator_1='ema', indicator_2='sma', condition_buy=operator.ge, condition_sell=operator.le)
+
+def run_suite(symbols: int, bars: int, new_bars: int, repeat: int) -> List[Dict[str, float]]:
+    candles = synthetic_candles(symbols=symbols, bars=bars)
+    rows = len(candles)
+
+    # One fresh bar per symbol for every simulated loop iteration
+    next_bars = [
+        synthetic_candles(symbols=symbols, bars=1, seed=bar + 1, start_bar=bars + bar)
+        for bar in range(new_bars)
+    ]
+
+    def new_frame() -> dict:
+        # Drop the pandas view built by the constructor so it gets timed
+        stock_frame = StockFrame(data=candles)
+        stock_frame._reset_views()
+        return {'stock_frame': stock_frame}
+
+    def new_indicators(streaming: bool, pending_bar: bool = False) -> Callable[[], dict]:
+        def setup() -> dict:
+            stock_frame = StockFrame(data=candles)
+            indicators = Indicators(price_data_frame=stock_frame, streaming=streaming)
+            register_indicators(indicators=indicators)
+
+            # Leave a new bar waiting, so refresh has something to do
+            if pending_bar:
+                stock_frame.add_rows(data=next_bars[0])
+            return {'stock_frame': stock_frame, 'indicators': indicators}
+        return setup
+
+    # Only every tenth symbol gets a bar, like halts, illiquid names or failed fetches leave it
+    sparse_bars = [latest_bar[::10] for latest_bar in next_bars]
+
+    def per_bar_loop(stock_frame: StockFrame, indicators: Indicators, bars: List[List[dict]] = next_bars) -> None:
+        for latest_bar in bars:
+            stock_frame.add_rows(data=latest_bar)
+            indicators.refresh()
+            indicators.check_signals()
+
+    results = [
+        measure('create_frame', lambda: {}, lambda: StockFrame(data=candles), rows, repeat),
+        measure('frame', new_frame, lambda stock_frame: stock_frame.frame, rows, repeat),
+        measure('symbol_groups', new_frame, lambda stock_frame: stock_frame.symbol_groups, rows, repeat),
+        measure('add_rows', new_frame, lambda stock_frame: [stock_frame.add_rows(data=bar) for bar in next_bars], symbols * new_bars, repeat)
+    ]
+
+    for streaming in (True, False):
+        mode = 'streaming' if streaming else 'batch'
+
+        def setup_frame() -> dict:
+            stock_frame = StockFrame(data=candles)
+            return {'indicators': Indicators(price_data_frame=stock_frame, streaming=streaming)}
+
+        results += [
+            measure('{}.change_in_price'.format(mode), setup_frame, lambda indicators: indicators.change_in_price(), rows, repeat),
+            measure('{}.rsi'.format(mode), setup_frame, lambda indicators: indicators.rsi(period=14), rows, repeat),
+            measure('{}.sma'.format(mode), setup_frame, lambda indicators: indicators.sma(period=50), rows, repeat),
+            measure('{}.ema'.format(mode), setup_frame, lambda indicators: indicators.ema(period=20), rows, repeat),
+            measure('{}.refresh'.format(mode), new_indicators(streaming, pending_bar=True), lambda stock_frame, indicators: indicators.refresh(), rows, repeat),
+            measure('{}.check_signals'.format(mode), new_indicators(streaming), lambda stock_frame, indicators: indicators.check_signals(), symbols, repeat),
+            measure('{}.per_bar_loop'.format(mode), new_indicators(streaming), per_bar_loop, symbols * new_bars, repeat),
+            measure(
+                '{}.per_bar_loop_sparse'.format(mode), new_indicators(streaming),
+                lambda stock_frame, indicators: per_bar_loop(stock_frame=stock_frame, indicators=indicators, bars=sparse_bars),
+                sum(len(latest_bar) for latest_bar in sparse_bars), repeat
+            )
+        ]
+
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, default=100)
+    parser.add_argument('--bars', type=int, default=2000, help='history per symbol')
+    parser.add_argument('--new-bars', type=int, default=10, help='bars appended in the per-bar benchmarks')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', type=str, default=None, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    results = run_suite(symbols=args.symbols, bars=args.bars, new_bars=args.new_bars, repeat=args.repeat)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'scale': {'symbols': args.symbols, 'bars': args.bars, 'new_bars': args.new_bars},
+        'results': results
+    }
+
+    if args.output:
+        with open(args.output, mode='w') as output_file:
+            json.dump(report, output_file, indent=4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from typing import List, Dict, Optional
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+
+class Backtest():
+    def __init__(self, stock_frame: StockFrame, indicators: Indicators, quantity: int = 1, commission: float = 0.0) -> None:
+        self.stock_frame = stock_frame
+        self.indicators = indicators
+        self.quantity = quantity
+        self.commission = commission
+
+        self.signals: Dict[str, Dict[str, np.ndarray]] = {}
+        self.positions: Dict[str, np.ndarray] = {}
+        self.equity: Dict[str, np.ndarray] = {}
+
+    def _indicator_columns(self, symbol: str) -> Dict[str, np.ndarray]:
+        # Every registered indicator over the symbol's whole history, shared inputs computed once
+        store = self.stock_frame.store
+        columns = {name: store.column(symbol, name) for name in store.columns}
+        columns.update(self.indicators.graph.compute(base=columns))
+        return columns
+
+    def _positions(self, buys: np.ndarray, sells: np.ndarray) -> np.ndarray:
+        # Long only: a buy opens the position and a sell closes it, so the
+        # position is the last event carried forward (a bar with both does nothing)
+        events = np.full(len(buys), np.nan)
+        events[buys & ~sells] = 1.0
+        events[sells & ~buys] = 0.0
+
+        holding = pd.Series(events).ffill().fillna(0.0).to_numpy()
+
+        # Orders go out on the signal bar's close and fill on the next bar's open
+        positions = np.zeros(len(holding))
+        positions[1:] = holding[:-1]
+        return positions
+
+    def run_symbol(self, symbol: str) -> Dict[str, float]:
+        columns = self._indicator_columns(symbol=symbol)
+        plan = self.indicators.signal_plan
+
+        values = np.column_stack([columns[name] for name in plan.columns]) if plan.columns else np.empty((len(columns['close']), 0))
+        signals = plan.evaluate(values=values)
+        positions = self._positions(buys=signals['buys'], sells=signals['sells'])
+
+        open_prices = columns['open']
+        close_prices = columns['close']
+
+        # Each bar earns its intraday move while held, plus the overnight gap if it was held the bar before
+        previous_close = np.concatenate(([close_prices[0]], close_prices[:-1])) if len(close_prices) else close_prices
+        previous_position = np.concatenate(([0.0], positions[:-1])) if len(positions) else positions
+        bar_pnl = positions * (close_prices - open_prices) + previous_position * (open_prices - previous_close)
+
+        trades = np.abs(np.diff(positions, prepend=0.0))
+        bar_pnl = bar_pnl * self.quantity - trades * self.commission
+        equity = np.cumsum(bar_pnl)
+
+        self.signals[symbol] = signals
+        self.positions[symbol] = positions
+        self.equity[symbol] = equity
+
+        drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity if len(equity) else equity
+        round_trips = int(trades.sum() // 2)
+
+        return {
+            'bars': len(close_prices),
+            'buy_signals': int(signals['buys'].sum()),
+            'sell_signals': int(signals['sells'].sum()),
+            'trades': int(trades.sum()),
+            'round_trips': round_trips,
+            'exposure': float(positions.mean()) if len(positions) else 0.0,
+            'profit_loss': float(equity[-1]) if len(equity) else 0.0,
+            'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0
+        }
+
+    def run(self, symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """Replay the whole StockFrame through the indicators and signals, one row of results per symbol."""
+
+        if symbols is None:
+            symbols = self.stock_frame.store.symbols
+
+        results = {symbol: self.run_symbol(symbol=symbol) for symbol in symbols}
+        return pd.DataFrame.from_dict(results, orient='index').rename_axis('symbol')
@@ -0,0 +1,155 @@
+import asyncio
+import csv
+import json
+import time as time
+
+from typing import List, Dict, Optional, AsyncIterator
+
+def parse_tick(record: dict) -> Optional[dict]:
+    # Accepts our own tick format or the field names of a TD quote
+    symbol = record.get('symbol') or record.get('key')
+    price = record.get('price', record.get('lastPrice'))
+    timestamp = record.get('timestamp', record.get('tradeTimeInLong', record.get('quoteTimeInLong')))
+
+    if symbol is None or price is None or timestamp is None:
+        return None
+
+    return {
+        'symbol': symbol,
+        'price': float(price),
+        'size': int(float(record.get('size', record.get('lastSize', 0)) or 0)),
+        'timestamp': int(float(timestamp))
+    }
+
+async def replay_ticks(path: str, speed: Optional[float] = None) -> AsyncIterator[dict]:
+    """Ticks from a JSON lines or CSV file, as fast as possible or paced at speed times real time."""
+
+    first_tick = None
+    started = time.monotonic()
+
+    with open(path, 'r', newline='') as tick_file:
+        if path.endswith('.csv'):
+            records = csv.DictReader(tick_file)
+        else:
+            records = (json.loads(line) for line in tick_file if line.strip())
+
+        for record in records:
+            tick = parse_tick(record)
+            if tick is None:
+                continue
+
+            if speed:
+                if first_tick is None:
+                    first_tick = tick['timestamp']
+                delay = (tick['timestamp'] - first_tick) / 1000 / speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            else:
+                # Let the consumer run between ticks
+                await asyncio.sleep(0)
+
+            yield tick
+
+async def socket_ticks(host: str, port: int) -> AsyncIterator[dict]:
+    """Ticks sent as one JSON object per line over a TCP connection, until it closes."""
+
+    reader, writer = await asyncio.open_connection(host=host, port=port)
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+
+            try:
+                tick = parse_tick(json.loads(line))
+            except ValueError:
+                continue
+
+            if tick is not None:
+                yield tick
+    finally:
+        writer.close()
+
+class BarAggregator():
+    # Builds OHLCV bars per symbol from ticks. Tick timestamps drive the clock:
+    # once it passes a bar's end (plus the grace period for stragglers) every
+    # symbol's bar for that period is finished, in the same format as the candles
+    # from get_latest_bar. Ticks for a bar that was already finished are dropped.
+    def __init__(self, bar_milliseconds: int = 60_000, grace_milliseconds: int = 0) -> None:
+        self.bar_milliseconds = bar_milliseconds
+        self.grace_milliseconds = grace_milliseconds
+        self.clock = 0                                  # newest tick timestamp seen
+        self.late_ticks = 0
+
+        self._open: Dict[str, dict] = {}                # symbol -> bar being built
+        self._closed_until: Dict[str, int] = {}         # symbol -> end of its last finished bar
+        self._due: Optional[int] = None                 # no open bar is due before this, so ticks skip the scan
+
+    def add_tick(self, symbol: str, price: float, timestamp: int, size: int = 0) -> List[dict]:
+        """Add one tick, returning the bars it finished."""
+
+        start = timestamp - timestamp % self.bar_milliseconds
+        bar = self._open.get(symbol)
+
+        if start < self._closed_until.get(symbol, 0) or (bar is not None and start < bar['datetime']):
+            self.late_ticks += 1
+            return []
+
+        finished = []
+        if bar is not None and start > bar['datetime']:
+            finished.append(self._finish(symbol=symbol))
+            bar = None
+
+        if bar is None:
+            due = start + self.bar_milliseconds + self.grace_milliseconds
+            self._due = due if self._due is None else min(self._due, due)
+            self._open[symbol] = {
+                'symbol': symbol,
+                'open': price,
+                'close': price,
+                'high': price,
+                'low': price,
+                'volume': size,
+                'datetime': start
+            }
+        else:
+            bar['close'] = price
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            bar['volume'] += size
+
+        if timestamp > self.clock:
+            self.clock = timestamp
+            finished.extend(self.close_bars(now=timestamp))
+        return finished
+
+    def _finish(self, symbol: str) -> dict:
+        bar = self._open.pop(symbol)
+        self._closed_until[symbol] = bar['datetime'] + self.bar_milliseconds
+        return bar
+
+    def close_bars(self, now: int) -> List[dict]:
+        """Finish every bar that ended before now, e.g. when no tick came in after the close."""
+
+        if self._due is None or now < self._due:
+            return []
+
+        finished = [
+            self._finish(symbol=symbol)
+            for symbol, bar in list(self._open.items())
+            if bar['datetime'] + self.bar_milliseconds + self.grace_milliseconds <= now
+        ]
+
+        starts = [bar['datetime'] for bar in self._open.values()]
+        self._due = min(starts) + self.bar_milliseconds + self.grace_milliseconds if starts else None
+        return finished
+
+    def next_close(self) -> Optional[int]:
+        # When the oldest open bar is due, in tick time (may be early, never late)
+        return self._due
+
+    def flush(self) -> List[dict]:
+        """Finish every open bar, when the tick stream ends."""
+
+        self._due = None
+        return [self._finish(symbol=symbol) for symbol in list(self._open)]
@@ -0,0 +1,169 @@
+import os
+import pathlib
+import numpy as np
+
+from typing import List, Dict, Optional, Tuple
+
+from pyRobot.column_store import PRICE_COLUMNS
+
+BAR_MILLISECONDS = {'minute': 60_000, 'daily': 86_400_000, 'weekly': 604_800_000}
+
+class BarCache():
+    # One folder per bar type/size and symbol, one .npy file per column, so a
+    # symbol's history can be memory mapped straight into the StockFrame.
+    def __init__(self, folder: Optional[pathlib.Path] = None, bar_type: str = 'minute', bar_size: int = 1) -> None:
+        if folder is None:
+            folder = pathlib.Path(__file__).parents[1].joinpath('data', 'bars')
+
+        self.bar_type = bar_type
+        self.bar_size = bar_size
+        self.bar_milliseconds = BAR_MILLISECONDS.get(bar_type, 60_000) * bar_size
+        self.folder = pathlib.Path(folder).joinpath('{bar_type}_{bar_size}'.format(bar_type=bar_type, bar_size=bar_size))
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def _symbol_folder(self, symbol: str) -> pathlib.Path:
+        return self.folder.joinpath(symbol.replace('/', '_'))
+
+    def load(self, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        folder = self._symbol_folder(symbol)
+        names = ['datetime'] + list(PRICE_COLUMNS)
+
+        if not all(folder.joinpath(name + '.npy').exists() for name in names):
+            return None
+
+        # Copy on write maps, pages are only read when touched and edits never reach the file
+        arrays = {name: np.load(folder.joinpath(name + '.npy'), mmap_mode='c') for name in names}
+
+        # A crash between two column writes leaves them out of step, treat it as a miss
+        if len({len(array) for array in arrays.values()}) != 1:
+            return None
+
+        return arrays
+
+    def fetched_ranges(self, symbol: str) -> np.ndarray:
+        # Ranges already fetched as an (n, 2) array, with or without bars in them
+        path = self._symbol_folder(symbol).joinpath('fetched.npy')
+        if not path.exists():
+            return np.empty((0, 2), dtype=np.int64)
+        return np.load(path)
+
+    def missing_ranges(self, symbol: str, start: int, end: int) -> List[Tuple[int, int]]:
+        # Millisecond ranges still to be fetched for [start, end], interior gaps included
+        arrays = self.load(symbol=symbol)
+        timestamps = arrays['datetime'] if arrays is not None else np.empty(0, dtype=np.int64)
+        covered = self.fetched_ranges(symbol=symbol)
+
+        if len(timestamps):
+            # Runs of back to back bars are covered too, for caches written before ranges were recorded
+            breaks = np.flatnonzero(np.diff(timestamps) > self.bar_milliseconds)
+            runs = np.column_stack((timestamps[np.append(0, breaks + 1)], timestamps[np.append(breaks, len(timestamps) - 1)]))
+
+            # Always re-fetch from the last cached bar, it may have been stored before it closed
+            last = int(timestamps[-1])
+            covered = np.minimum(np.concatenate((covered, runs)), last)
+
+        ranges = []
+        cursor = start
+        for range_start, range_end in covered[np.argsort(covered[:, 0], kind='stable')].tolist():
+            if cursor >= end:
+                break
+            if range_start > cursor:
+                ranges.append((cursor, min(range_start, end)))
+            cursor = max(cursor, range_end)
+
+        if cursor < end:
+            ranges.append((cursor, end))
+
+        return ranges
+
+    def update(self, symbol: str, candles: List[dict], fetched: Optional[List[Tuple[int, int]]] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Merge the candles into the cache, fetched is the ranges they came from, kept even if they were empty."""
+
+        if fetched:
+            self._record_fetched(symbol=symbol, ranges=fetched)
+
+        cached = self.load(symbol=symbol)
+        if not candles:
+            return cached
+
+        new_arrays = {'datetime': np.array([candle['datetime'] for candle in candles], dtype=np.int64)}
+        for name, dtype in PRICE_COLUMNS.items():
+            new_arrays[name] = np.array([candle[name] for candle in candles], dtype=dtype)
+
+        if cached is not None:
+            merged = {name: np.concatenate((cached[name], new_arrays[name])) for name in new_arrays}
+        else:
+            merged = new_arrays
+
+        # Drop the maps before replacing the files underneath them
+        del cached
+
+        # Sort by time and keep the newest copy of every bar
+        order = np.argsort(merged['datetime'], kind='stable')
+        timestamps = merged['datetime'][order]
+        keep = np.ones(len(timestamps), dtype=bool)
+        keep[:-1] = timestamps[1:] != timestamps[:-1]
+        merged = {name: values[order][keep] for name, values in merged.items()}
+
+        self._save(symbol=symbol, arrays=merged)
+        return self.load(symbol=symbol)
+
+    def _record_fetched(self, symbol: str, ranges: List[Tuple[int, int]]) -> None:
+        # Merge the new ranges into the ones on file, overlapping or touching ranges become one
+        ranges = np.concatenate((self.fetched_ranges(symbol=symbol), np.array(ranges, dtype=np.int64).reshape(-1, 2)))
+        ranges = ranges[np.argsort(ranges[:, 0], kind='stable')]
+
+        merged = [ranges[0].tolist()]
+        for range_start, range_end in ranges[1:].tolist():
+            if range_start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], range_end)
+            else:
+                merged.append([range_start, range_end])
+
+        self._save(symbol=symbol, arrays={'fetched': np.array(merged, dtype=np.int64)})
+
+    def _save(self, symbol: str, arrays: Dict[str, np.ndarray]) -> None:
+        folder = self._symbol_folder(symbol)
+        folder.mkdir(parents=True, exist_ok=True)
+
+        # Write next to the target and swap it in, so readers never see half a file
+        for name, values in arrays.items():
+            temp_path = folder.joinpath(name + '.tmp.npy')
+            np.save(temp_path, np.ascontiguousarray(values))
+            os.replace(temp_path, folder.joinpath(name + '.npy'))
+
+class BarSpill():
+    # Append only file of fixed size records per symbol for bars evicted from a
+    # StockFrame, so spilling costs the same however much was spilled before.
+    def __init__(self, folder: Optional[pathlib.Path] = None) -> None:
+        if folder is None:
+            folder = pathlib.Path(__file__).parents[1].joinpath('data', 'spill')
+
+        self.folder = pathlib.Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype([('datetime', np.int64)] + [(name, dtype) for name, dtype in PRICE_COLUMNS.items()])
+
+    def _path(self, symbol: str) -> pathlib.Path:
+        return self.folder.joinpath(symbol.replace('/', '_') + '.bars')
+
+    def append(self, symbol: str, timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+        records = np.zeros(len(timestamps), dtype=self.dtype)
+        records['datetime'] = timestamps
+        for name in PRICE_COLUMNS:
+            records[name] = columns[name]
+
+        with open(self._path(symbol), mode='ab') as spill_file:
+            records.tofile(spill_file)
+
+    def load(self, symbol: str) -> Optional[Dict[str, np.ndarray]]:
+        path = self._path(symbol)
+        if not path.exists():
+            return None
+
+        # A record cut short by a crash is ignored
+        count = path.stat().st_size // self.dtype.itemsize
+        if not count:
+            return None
+
+        records = np.memmap(path, dtype=self.dtype, mode='r', shape=(count,))
+        return {name: records[name] for name in self.dtype.names}
@@ -0,0 +1,306 @@
+import numpy as np
+import pandas as pd
+
+from typing import List, Dict, Iterable, Optional, Tuple
+
+# Default layout of a price bar, in the same order the API returns them.
+PRICE_COLUMNS = {
+    'open': np.float64,
+    'close': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'volume': np.int64
+}
+
+# Compact layout, prices in float32 (about 7 significant digits) when cents survive the cast
+COMPACT_PRICE_COLUMNS = {
+    'open': np.float32,
+    'close': np.float32,
+    'high': np.float32,
+    'low': np.float32,
+    'volume': np.int64
+}
+
+def compact_columns(columns: Dict[str, np.ndarray]) -> Dict[str, np.dtype]:
+    # float32 for the prices if none of them move by half a cent or more, float64 otherwise
+    prices = [values for name, values in columns.items() if COMPACT_PRICE_COLUMNS.get(name) == np.float32 and len(values)]
+    fits = all(
+        np.nanmax(np.abs(values.astype(np.float32).astype(np.float64) - values), initial=0.0) < 0.005
+        for values in prices
+    )
+    return COMPACT_PRICE_COLUMNS if fits else PRICE_COLUMNS
+
+def _missing(dtype: np.dtype):
+    # What an empty cell holds, NaN for floats and zero for everything else
+    return np.nan if np.issubdtype(dtype, np.floating) else 0
+
+class SymbolSegment():
+    def __init__(self, columns: Dict[str, np.dtype], capacity: int) -> None:
+        self.length = 0
+        self.timestamps = np.empty(capacity, dtype=np.int64)     # milliseconds since epoch
+        self.columns = {
+            name: np.empty(capacity, dtype=dtype) for name, dtype in columns.items()
+        }
+
+    @property
+    def capacity(self) -> int:
+        return self.timestamps.shape[0]
+
+    def reserve(self, size: int) -> None:
+        if size <= self.capacity:
+            return
+
+        # Double the buffers so appends stay amortized O(1)
+        new_capacity = max(size, self.capacity * 2, 16)
+
+        self.timestamps = self._grow(self.timestamps, new_capacity)
+        for name in self.columns:
+            self.columns[name] = self._grow(self.columns[name], new_capacity)
+
+    def _grow(self, array: np.ndarray, capacity: int) -> np.ndarray:
+        new_array = np.empty(capacity, dtype=array.dtype)
+        new_array[:self.length] = array[:self.length]
+        return new_array
+
+    def add_column(self, name: str, dtype: np.dtype) -> np.ndarray:
+        array = np.empty(self.capacity, dtype=dtype)
+        array[:self.length] = _missing(dtype)
+        self.columns[name] = array
+        return array
+
+    def shrink(self, headroom: int = 0) -> None:
+        # Size the buffers to the rows plus headroom, so the next appends don't double them.
+        # Memory mapped buffers are left alone.
+        capacity = self.length + headroom
+        if capacity == self.capacity:
+            return
+
+        if not isinstance(self.timestamps, np.memmap):
+            self.timestamps = self._grow(self.timestamps, capacity)
+        for name, array in self.columns.items():
+            if not isinstance(array, np.memmap):
+                self.columns[name] = self._grow(array, capacity)
+
+    def drop_front(self, count: int, headroom: int = 0) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        # Move the rows we keep into fresh buffers (mapped ones included), returning the dropped rows
+        count = min(count, self.length)
+        capacity = self.length - count + headroom
+
+        dropped_timestamps = self.timestamps[:count].copy()
+        dropped_columns = {name: array[:count].copy() for name, array in self.columns.items()}
+
+        timestamps = np.empty(capacity, dtype=self.timestamps.dtype)
+        timestamps[:self.length - count] = self.timestamps[count:self.length]
+        self.timestamps = timestamps
+
+        for name, array in self.columns.items():
+            kept = np.empty(capacity, dtype=array.dtype)
+            kept[:self.length - count] = array[count:self.length]
+            self.columns[name] = kept
+
+        self.length -= count
+        return dropped_timestamps, dropped_columns
+
+    def upsert(self, timestamp: int, values: Dict[str, float]) -> int:
+        n = self.length
+
+        # Fast path, the bar is newer than anything we hold (or replaces the last one)
+        if n == 0 or timestamp > self.timestamps[n - 1]:
+            position = n
+        elif timestamp == self.timestamps[n - 1]:
+            position = n - 1
+        else:
+            position = int(np.searchsorted(self.timestamps[:n], timestamp))
+
+        if position == n or self.timestamps[position] != timestamp:
+            # Shift everything after the position one slot to the right
+            self.reserve(n + 1)
+            self.timestamps[position + 1:n + 1] = self.timestamps[position:n]
+            for array in self.columns.values():
+                array[position + 1:n + 1] = array[position:n]
+                array[position] = _missing(array.dtype)
+            self.length = n + 1
+
+        self.timestamps[position] = timestamp
+        for name, value in values.items():
+            self.columns[name][position] = value
+
+        return position
+
+class ColumnStore():
+    def __init__(self, columns: Optional[Dict[str, np.dtype]] = None, capacity: int = 1024, float_dtype: np.dtype = np.float64) -> None:
+        self._columns: Dict[str, np.dtype] = dict(columns or PRICE_COLUMNS)
+        self._capacity = capacity
+        self.float_dtype = float_dtype          # for added columns, e.g. the indicators
+        self._segments: Dict[str, SymbolSegment] = {}
+
+    @property
+    def symbols(self) -> List[str]:
+        return sorted(self._segments)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def dtypes(self) -> Dict[str, np.dtype]:
+        return {name: np.dtype(dtype) for name, dtype in self._columns.items()}
+
+    def __len__(self) -> int:
+        return sum(segment.length for segment in self._segments.values())
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._segments
+
+    def segment(self, symbol: str) -> SymbolSegment:
+        if symbol not in self._segments:
+            self._segments[symbol] = SymbolSegment(columns=self._columns, capacity=self._capacity)
+        return self._segments[symbol]
+
+    def length(self, symbol: str) -> int:
+        return self._segments[symbol].length if symbol in self._segments else 0
+
+    def timestamps(self, symbol: str) -> np.ndarray:
+        segment = self._segments[symbol]
+        return segment.timestamps[:segment.length]
+
+    def column(self, symbol: str, name: str) -> np.ndarray:
+        # A view over the used part of the buffer, writes go straight into the store
+        segment = self._segments[symbol]
+        return segment.columns[name][:segment.length]
+
+    def add_column(self, name: str, dtype: Optional[np.dtype] = None) -> None:
+        if name in self._columns:
+            return
+
+        if dtype is None:
+            dtype = self.float_dtype
+
+        self._columns[name] = dtype
+        for segment in self._segments.values():
+            segment.add_column(name=name, dtype=dtype)
+
+    def adopt(self, symbol: str, timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+        # Use the arrays as the symbol's buffers without copying them, the
+        # first append that needs more room moves them into fresh buffers.
+        segment = SymbolSegment(columns={}, capacity=0)
+        segment.length = len(timestamps)
+        segment.timestamps = timestamps
+
+        for name, dtype in self._columns.items():
+            if name in columns and columns[name].dtype == dtype:
+                segment.columns[name] = columns[name]
+            elif name in columns:
+                segment.columns[name] = columns[name].astype(dtype)
+            else:
+                segment.add_column(name=name, dtype=dtype)
+
+        self._segments[symbol] = segment
+
+    def upsert(self, symbol: str, timestamp: int, values: Dict[str, float]) -> int:
+        return self.segment(symbol).upsert(timestamp=timestamp, values=values)
+
+    def extend(self, symbols: np.ndarray, timestamps: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+        if len(symbols) == 0:
+            return
+
+        # Sort the whole batch by symbol then time, so every symbol is one contiguous slice
+        symbols = np.asarray(symbols, dtype=str)
+        order = np.lexsort((timestamps, symbols))
+        symbols = symbols[order]
+        timestamps = timestamps[order]
+        columns = {name: values[order] for name, values in columns.items()}
+
+        boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(symbols)]))
+
+        for start, end in zip(starts, ends):
+            symbol = str(symbols[start])
+            segment = self.segment(symbol)
+
+            if segment.length and timestamps[start] <= segment.timestamps[segment.length - 1]:
+                # Overlaps what we already hold, fall back to row by row upserts
+                for i in range(start, end):
+                    segment.upsert(
+                        timestamp=int(timestamps[i]),
+                        values={name: values[i] for name, values in columns.items()}
+                    )
+                continue
+
+            n = segment.length
+            segment.reserve(n + end - start)
+            segment.timestamps[n:n + end - start] = timestamps[start:end]
+            for name, array in segment.columns.items():
+                array[n:n + end - start] = columns[name][start:end] if name in columns else _missing(array.dtype)
+            segment.length = n + end - start
+
+    def shrink(self, headroom: int = 512) -> None:
+        """Size every symbol's buffers to its rows plus headroom (a day of minute bars by default)."""
+
+        for segment in self._segments.values():
+            segment.shrink(headroom=headroom)
+
+    def memory_usage(self) -> Dict[str, Dict[str, int]]:
+        # Bytes per column: holding rows, allocated in total, and mapped from files (not counted as allocated)
+        usage = {name: {'used': 0, 'allocated': 0, 'mapped': 0} for name in ['datetime'] + list(self._columns)}
+
+        for segment in self._segments.values():
+            arrays = [('datetime', segment.timestamps)] + list(segment.columns.items())
+            for name, array in arrays:
+                usage[name]['used'] += segment.length * array.itemsize
+                usage[name]['mapped' if isinstance(array, np.memmap) else 'allocated'] += array.nbytes
+
+        return usage
+
+    def offsets(self) -> Tuple[List[str], np.ndarray]:
+        symbols = self.symbols
+        lengths = [self._segments[symbol].length for symbol in symbols]
+        return symbols, np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+
+    def to_frame(self) -> pd.DataFrame:
+        symbols, offsets = self.offsets()
+        lengths = np.diff(offsets)
+
+        if symbols:
+            timestamps = np.concatenate([self.timestamps(symbol) for symbol in symbols])
+            data = {
+                name: np.concatenate([self.column(symbol, name) for symbol in symbols])
+                for name in self._columns
+            }
+        else:
+            timestamps = np.empty(0, dtype=np.int64)
+            data = {name: np.empty(0, dtype=dtype) for name, dtype in self._columns.items()}
+
+        # Build the index from codes, factorizing millions of repeated symbols is the slow part
+        unique_timestamps, timestamp_codes = np.unique(timestamps, return_inverse=True)
+        index = pd.MultiIndex(
+            levels=[
+                pd.Index(symbols, dtype=object),
+                pd.to_datetime(unique_timestamps, unit='ms', origin='unix')
+            ],
+            codes=[
+                np.repeat(np.arange(len(symbols)), lengths),
+                timestamp_codes.reshape(-1)
+            ],
+            names=['symbol', 'datetime'],
+            verify_integrity=False
+        )
+
+        return pd.DataFrame(data=data, index=index)
+
+    def set_column(self, name: str, values: Iterable[float]) -> None:
+        # Values are laid out like to_frame(), symbol by symbol in sorted order
+        values = np.asarray(values)
+        symbols, offsets = self.offsets()
+
+        if len(values) != offsets[-1]:
+            raise ValueError("Column {name} has {count} values, the store holds {rows} rows.".format(
+                name=name,
+                count=len(values),
+                rows=offsets[-1]
+            ))
+
+        self.add_column(name=name, dtype=self.float_dtype if values.dtype.kind in 'fb' else values.dtype)
+        for symbol, start, end in zip(symbols, offsets[:-1], offsets[1:]):
+            self.column(symbol, name)[:] = values[start:end]
@@ -0,0 +1,180 @@
+import json
+import random
+import threading
+import time as time
+import zlib
+import pathlib
+import numpy as np
+
+from typing import List, Dict, Any, Optional
+
+from pyRobot.fetcher import TokenBucket
+from pyRobot.bar_cache import BAR_MILLISECONDS
+
+class FakeSession():
+    # A local stand-in for TDClient, serving the calls PyRobot makes
+    # (get_price_history, get_quotes, place_order) from a recording or from
+    # a deterministic synthetic price series, with optional latency, errors and
+    # a request rate limit so the robot can be load tested offline.
+    def __init__(self, recording: Optional[str] = None, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 requests_per_second: Optional[float] = None, seed: int = 0) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+
+        self.calls: Dict[str, int] = {}
+        self.orders: List[dict] = []
+        self._recording: Dict[str, Dict[str, Any]] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(rate=requests_per_second, capacity=requests_per_second) if requests_per_second else None
+
+        if recording:
+            with open(recording, 'r') as recording_file:
+                self._recording = json.load(recording_file)
+
+    def login(self) -> bool:
+        return True
+
+    def _request(self, method: str) -> Optional[dict]:
+        # Count the call, then apply the rate limit, the latency and the injected errors
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            failed = self._random.random() < self.error_rate
+            delay = self.latency + self._random.uniform(0, self.jitter)
+
+        if self._bucket is not None and self._bucket.try_acquire():
+            return {'error': 'Rate limit exceeded'}
+
+        if delay:
+            time.sleep(delay)
+
+        if failed:
+            return {'error': 'Simulated failure'}
+
+        return None
+
+    def _synthetic_candles(self, symbol: str, start: int, end: int, bar_milliseconds: int) -> List[dict]:
+        # Prices are a pure function of symbol and bar time, so overlapping requests agree
+        first = -(-start // bar_milliseconds)
+        bars = np.arange(first, end // bar_milliseconds + 1, dtype=np.int64)
+
+        base = 20.0 + zlib.crc32(symbol.encode()) % 500
+        phase = (zlib.crc32(symbol.encode()) + self.seed) % 1000
+        noise = np.modf(np.abs(np.sin(bars * 12.9898 + phase) * 43758.5453))[0] - 0.5
+
+        close = base * (1.0 + 0.05 * np.sin(bars / 390.0 + phase) + 0.002 * noise)
+        open_ = close * (1.0 - 0.001 * noise)
+        high = np.maximum(open_, close) * 1.001
+        low = np.minimum(open_, close) * 0.999
+        volume = 1000 + (np.abs(noise) * 10_000).astype(np.int64)
+
+        return [
+            {
+                'open': float(open_[i]),
+                'high': float(high[i]),
+                'low': float(low[i]),
+                'close': float(close[i]),
+                'volume': int(volume[i]),
+                'datetime': int(bars[i] * bar_milliseconds)
+            }
+            for i in range(len(bars))
+        ]
+
+    def get_price_history(self, symbol: str, period_type: str = None, start_date: str = None, end_date: str = None,
+                          frequency_type: str = 'minute', frequency: int = 1, extended_hours: bool = True, **kwargs) -> dict:
+        error = self._request(method='get_price_history')
+        if error:
+            return error
+
+        start = int(start_date)
+        end = int(end_date)
+
+        recorded = self._recording.get('get_price_history', {})
+        if recorded:
+            candles = [
+                candle for candle in recorded.get(symbol, [])
+                if start <= candle['datetime'] <= end
+            ]
+        else:
+            bar_milliseconds = BAR_MILLISECONDS.get(frequency_type, 60_000) * int(frequency)
+            candles = self._synthetic_candles(symbol=symbol, start=start, end=end, bar_milliseconds=bar_milliseconds)
+
+        return {'candles': candles, 'symbol': symbol, 'empty': not candles}
+
+    def get_quotes(self, instruments: List[str]) -> dict:
+        error = self._request(method='get_quotes')
+        if error:
+            return error
+
+        recorded = self._recording.get('get_quotes', {})
+        now = int(time.time() * 1000)
+        quotes = {}
+
+        for symbol in instruments:
+            if symbol in recorded:
+                quotes[symbol] = recorded[symbol]
+                continue
+
+            candle = self._synthetic_candles(symbol=symbol, start=now - 60_000, end=now, bar_milliseconds=60_000)[-1]
+            quotes[symbol] = {
+                'symbol': symbol,
+                'lastPrice': candle['close'],
+                'bidPrice': candle['low'],
+                'askPrice': candle['high'],
+                'totalVolume': candle['volume'],
+                'quoteTimeInLong': now
+            }
+
+        return quotes
+
+    def place_order(self, account: str, order: dict) -> dict:
+        error = self._request(method='place_order')
+        if error:
+            return error
+
+        with self._lock:
+            order_id = str(len(self.orders) + 1)
+            self.orders.append({'account': account, 'order_id': order_id, 'order': order})
+
+        return {'order_id': order_id, 'headers': {}, 'request_body': order}
+
+class SessionRecorder():
+    # Wraps a live session and writes what it returns in the format FakeSession replays
+    def __init__(self, session: Any, path: str) -> None:
+        self.session = session
+        self.path = pathlib.Path(path)
+        self._recording: Dict[str, Dict[str, Any]] = {'get_price_history': {}, 'get_quotes': {}}
+        self._lock = threading.Lock()
+
+    def login(self) -> bool:
+        return self.session.login()
+
+    def get_price_history(self, symbol: str, **kwargs) -> dict:
+        response = self.session.get_price_history(symbol=symbol, **kwargs)
+
+        if response and 'candles' in response:
+            with self._lock:
+                candles = {candle['datetime']: candle for candle in self._recording['get_price_history'].get(symbol, [])}
+                candles.update({candle['datetime']: candle for candle in response['candles']})
+                self._recording['get_price_history'][symbol] = [candles[key] for key in sorted(candles)]
+
+        return response
+
+    def get_quotes(self, instruments: List[str]) -> dict:
+        response = self.session.get_quotes(instruments=instruments)
+
+        if response and 'error' not in response:
+            with self._lock:
+                self._recording['get_quotes'].update(response)
+
+        return response
+
+    def place_order(self, account: str, order: dict) -> dict:
+        return self.session.place_order(account=account, order=order)
+
+    def save(self) -> None:
+        with self._lock:
+            with open(self.path, mode='w') as recording_file:
+                json.dump(self._recording, recording_file)
@@ -0,0 +1,214 @@
+import random
+import threading
+import time as time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, Tuple, Optional, List, Set, Callable
+
+from pyRobot.metrics import Metrics
+
+class TokenBucket():
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate                # tokens added per second
+        self.capacity = capacity        # how big a burst can get
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        # Take a token, or return how long to wait until the next one is available
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while True:
+            wait_time = self.try_acquire()
+            if wait_time == 0.0:
+                return
+            time.sleep(wait_time)
+
+class RequestWindow():
+    # At most limit requests in any window of seconds. A token bucket alone lets a full
+    # burst through on top of a window's worth of refill, this caps the total.
+    def __init__(self, limit: int, seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.limit = limit
+        self.seconds = seconds
+        self._clock = clock
+        self._admitted: deque = deque()
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        # How long until another request fits in the window, 0 if it fits now
+        with self._lock:
+            now = self._clock()
+            while self._admitted and self._admitted[0] <= now - self.seconds:
+                self._admitted.popleft()
+            if len(self._admitted) < self.limit:
+                return 0.0
+            return self._admitted[0] + self.seconds - now
+
+    def record(self) -> None:
+        with self._lock:
+            self._admitted.append(self._clock())
+
+class PriceFetcher():
+    # TD Ameritrade allows 120 non-order requests a minute, so that is the default budget: bursts
+    # up to burst, refilled at requests_per_second, never more than requests_per_window a minute.
+    def __init__(self, session: Any, max_workers: int = 8, requests_per_second: float = 2.0, burst: int = 120,
+                 requests_per_window: Optional[int] = 120, window_seconds: float = 60.0, timeout: float = 10.0,
+                 max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 8.0, metrics: Optional[Metrics] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.session = session
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures: Dict[str, Any] = {}
+
+        # Calls given up on after their timeout still hold a worker until they return
+        self._abandoned: Set[Future] = set()
+
+        self._bucket = TokenBucket(rate=requests_per_second, capacity=burst, clock=clock)
+        self._window = RequestWindow(limit=requests_per_window, seconds=window_seconds, clock=clock) if requests_per_window else None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='price_fetcher')
+
+    def _backoff_time(self, attempt: int) -> float:
+        # Exponential backoff with full jitter, so retries don't all land together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _try_acquire(self) -> float:
+        # A token and a place in the window, or how long to wait for both
+        if self._window is not None:
+            wait_time = self._window.wait_time()
+            if wait_time:
+                return wait_time
+
+        wait_time = self._bucket.try_acquire()
+        if not wait_time and self._window is not None:
+            self._window.record()
+        return wait_time
+
+    @property
+    def abandoned(self) -> int:
+        """How many timed out calls are still running on a worker."""
+
+        self._abandoned = {future for future in self._abandoned if not future.done()}
+        return len(self._abandoned)
+
+    def _call(self, kwargs: dict, started: List[float]) -> dict:
+        # The timeout runs from here, not from the submit, so a call is never charged for its wait
+        started.append(time.monotonic())
+        with self.metrics.stage('get_price_history'):
+            return self.session.get_price_history(**kwargs)
+
+    def fetch(self, requests: Dict[str, dict]) -> Dict[str, dict]:
+        """Run get_price_history for every symbol concurrently, keyed by symbol."""
+
+        responses = {}
+        self.failures = {}
+
+        # (ready at, symbol, attempt), in the order they can be started
+        pending: deque = deque((0.0, symbol, 0) for symbol in requests)
+        in_flight: Dict[Future, Tuple[str, int, List[float]]] = {}
+
+        def deadline(started: List[float], now: float) -> float:
+            # Not picked up by its worker yet, it can't time out before now + timeout
+            return (started[0] if started else now) + self.timeout
+
+        def retry(symbol: str, attempt: int, error: Any) -> None:
+            if attempt + 1 > self.max_retries:
+                self.failures[symbol] = error
+                self.metrics.increment('get_price_history.failures')
+                return
+            self.metrics.increment('get_price_history.retries')
+            pending.append((time.monotonic() + self._backoff_time(attempt), symbol, attempt + 1))
+
+        while pending or in_flight:
+            now = time.monotonic()
+
+            # Only as many calls as there are free workers, so none of them waits in the executor's queue
+            free_workers = self.max_workers - len(in_flight) - self.abandoned
+            if pending and not in_flight and free_workers <= 0:
+                # Every worker is stuck on an abandoned call, give them a timeout to come back
+                wait(list(self._abandoned), timeout=self.timeout, return_when=FIRST_COMPLETED)
+                if self.abandoned >= self.max_workers:
+                    for _, symbol, _ in pending:
+                        self.failures[symbol] = TimeoutError('no free workers for {}'.format(symbol))
+                        self.metrics.increment('get_price_history.failures')
+                    break
+                continue
+
+            # Start whatever is ready, as long as there are free workers and tokens
+            token_wait = 0.0
+            for _ in range(len(pending)):
+                if free_workers <= 0:
+                    break
+
+                ready_at, symbol, attempt = pending[0]
+                if ready_at > now:
+                    pending.rotate(-1)
+                    continue
+
+                token_wait = self._try_acquire()
+                if token_wait:
+                    break
+
+                pending.popleft()
+                self.metrics.increment('get_price_history.calls')
+                started = []
+                future = self._executor.submit(self._call, requests[symbol], started)
+                in_flight[future] = (symbol, attempt, started)
+                free_workers -= 1
+
+            # Sleep until something finishes, times out, or can be started
+            wake_times = [deadline(started, now) for _, _, started in in_flight.values()]
+            if free_workers > 0:
+                wake_times += [max(ready_at, now + token_wait) for ready_at, _, _ in pending]
+            timeout = max(0.0, min(wake_times) - time.monotonic()) if wake_times else None
+
+            if in_flight:
+                done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                time.sleep(timeout or 0.0)
+
+            for future in done:
+                symbol, attempt, _ = in_flight.pop(future)
+                try:
+                    response = future.result()
+                except Exception as error:
+                    retry(symbol=symbol, attempt=attempt, error=error)
+                    continue
+
+                if not response or 'error' in response:
+                    retry(symbol=symbol, attempt=attempt, error=response)
+                else:
+                    responses[symbol] = response
+
+            # Give up on calls that ran past their timeout, the worker finishes in the background
+            # and stays out of the pool until it does
+            now = time.monotonic()
+            for future, (symbol, attempt, started) in list(in_flight.items()):
+                if started and deadline(started, now) <= now:
+                    del in_flight[future]
+                    self._abandoned.add(future)
+                    self.metrics.increment('get_price_history.timeouts')
+                    retry(symbol=symbol, attempt=attempt, error=TimeoutError(symbol))
+
+        return responses
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,199 @@
+import numpy as np
+
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Any, Optional, Union
+
+# A node is identified by what it computes: its state class, inputs and parameters
+NodeKey = Tuple[str, tuple, tuple]
+
+class IndicatorNode():
+    def __init__(self, key: NodeKey, state_class: type, inputs: List[Union[str, NodeKey]], params: Dict[str, Any]) -> None:
+        self.key = key
+        self.state_class = state_class
+        self.inputs = inputs        # price column names or the keys of other nodes
+        self.params = params
+
+class IndicatorGraph():
+    # The indicators as a graph of small streaming nodes. Nodes computing the
+    # same thing share a key, so rsi and change_in_price read one diff of the
+    # closes, and every node runs once per bar however many indicators use it.
+    # Only the published nodes end up in the store, the intermediate ones keep
+    # their running state and a bounded cache of their last full history.
+    def __init__(self, cache_bytes: int = 64 * 2 ** 20) -> None:
+        self.cache_bytes = cache_bytes
+
+        self._nodes: Dict[NodeKey, IndicatorNode] = {}      # insertion order is a topological order
+        self._outputs: Dict[str, NodeKey] = {}              # store column -> node
+        self._states: Dict[str, Dict[NodeKey, Any]] = {}
+        self._counts: Dict[str, int] = {}
+        self._cache: OrderedDict = OrderedDict()            # symbol -> {key: full history}, least recently used first
+        self._cached_bytes = 0
+
+    @property
+    def nodes(self) -> Dict[NodeKey, IndicatorNode]:
+        return self._nodes
+
+    @property
+    def outputs(self) -> Dict[str, NodeKey]:
+        return self._outputs
+
+    def add(self, state_class: type, inputs: List[Union[str, NodeKey]], **params) -> NodeKey:
+        for input_key in inputs:
+            if isinstance(input_key, tuple) and input_key not in self._nodes:
+                raise KeyError('Unknown input node {}'.format(input_key))
+
+        key = (state_class.__name__, tuple(inputs), tuple(sorted(params.items())))
+        if key not in self._nodes:
+            self._nodes[key] = IndicatorNode(key=key, state_class=state_class, inputs=list(inputs), params=params)
+        return key
+
+    def publish(self, columns: Dict[str, NodeKey]) -> None:
+        # Columns registered together are published together, pruning runs once they are all in
+        self._outputs.update(columns)
+        self._prune()
+
+    def lookback(self) -> int:
+        """Bars of price history the published columns need to be seeded again."""
+
+        lookbacks = {}
+        for key, node in self._nodes.items():
+            upstream = max((lookbacks[input_key] for input_key in node.inputs if isinstance(input_key, tuple)), default=1)
+            lookbacks[key] = upstream + node.state_class.lookback(**node.params) - 1
+
+        return max((lookbacks[key] for key in self._outputs.values()), default=0)
+
+    def shift(self, symbol: str, rows: int) -> None:
+        # The symbol's oldest rows were evicted, the running state is unaffected
+        self._counts[symbol] = max(0, self._counts.get(symbol, 0) - rows)
+        self._invalidate(symbol=symbol)
+
+    def _prune(self) -> None:
+        # Drop the nodes no published column depends on anymore, e.g. after sma moved to another period
+        needed = set(self._outputs.values())
+        for key in reversed(list(self._nodes)):
+            if key in needed:
+                needed.update(input_key for input_key in self._nodes[key].inputs if isinstance(input_key, tuple))
+
+        for key in [key for key in self._nodes if key not in needed]:
+            del self._nodes[key]
+            for states in self._states.values():
+                states.pop(key, None)
+
+        for symbol in list(self._cache):
+            self._invalidate(symbol=symbol)
+
+    def _invalidate(self, symbol: str) -> None:
+        arrays = self._cache.pop(symbol, None)
+        if arrays:
+            self._cached_bytes -= sum(array.nbytes for array in arrays.values())
+
+    def _remember(self, symbol: str, arrays: Dict[NodeKey, np.ndarray]) -> None:
+        self._invalidate(symbol=symbol)
+        self._cache[symbol] = arrays
+        self._cached_bytes += sum(array.nbytes for array in arrays.values())
+
+        while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+            self._invalidate(symbol=next(iter(self._cache)))
+
+    def _resolve(self, key: Union[str, NodeKey], base: Dict[str, np.ndarray], arrays: Dict[NodeKey, np.ndarray],
+                 states: Optional[Dict[NodeKey, Any]]) -> np.ndarray:
+        if not isinstance(key, tuple):
+            return base[key]
+
+        if key not in arrays:
+            node = self._nodes[key]
+            inputs = [self._resolve(key=input_key, base=base, arrays=arrays, states=states) for input_key in node.inputs]
+            state, arrays[key] = node.state_class.seed(*inputs, **node.params)
+            if states is not None:
+                states[key] = state
+
+        return arrays[key]
+
+    def compute(self, base: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Every published column over a whole history, without touching the running state."""
+
+        arrays = {}
+        return {
+            column_name: self._resolve(key=key, base=base, arrays=arrays, states=None)
+            for column_name, key in self._outputs.items()
+        }
+
+    def evaluate(self, base: Dict[str, np.ndarray], offsets: np.ndarray, column_names: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """The published columns (all of them by default) for every symbol at once.
+
+        base holds the price columns of all the symbols back to back, split by
+        offsets. Each node runs once however many columns read it, and its output
+        is dropped as soon as the last node reading it is done.
+        """
+
+        column_names = list(self._outputs) if column_names is None else column_names
+        wanted = {self._outputs[column_name] for column_name in column_names}
+
+        needed = set(wanted)
+        for key in reversed(list(self._nodes)):
+            if key in needed:
+                needed.update(input_key for input_key in self._nodes[key].inputs if isinstance(input_key, tuple))
+
+        readers = {}
+        for key in needed:
+            for input_key in self._nodes[key].inputs:
+                readers[input_key] = readers.get(input_key, 0) + 1
+
+        arrays: Dict[Union[str, NodeKey], np.ndarray] = dict(base)
+        for key, node in self._nodes.items():
+            if key not in needed:
+                continue
+
+            arrays[key] = node.state_class.segmented(*[arrays[input_key] for input_key in node.inputs], offsets=offsets, **node.params)
+            for input_key in node.inputs:
+                readers[input_key] -= 1
+                if not readers[input_key] and isinstance(input_key, tuple) and input_key not in wanted:
+                    del arrays[input_key]
+
+        return {column_name: arrays[self._outputs[column_name]] for column_name in column_names}
+
+    def seed(self, symbol: str, base: Dict[str, np.ndarray], outputs: Dict[str, np.ndarray], keys: Optional[List[NodeKey]] = None) -> None:
+        # Start the nodes (all of them by default) over from the symbol's full history.
+        # Inputs already computed for this history come out of the cache.
+        arrays = dict(self._cache.get(symbol, {}))
+        states = self._states.setdefault(symbol, {})
+
+        for key in (self._nodes if keys is None else keys):
+            self._resolve(key=key, base=base, arrays=arrays, states=states)
+
+        for column_name, output in outputs.items():
+            key = self._outputs[column_name]
+            if key in arrays:
+                output[:] = arrays[key]
+
+        self._counts[symbol] = len(next(iter(base.values())))
+        self._remember(symbol=symbol, arrays=arrays)
+
+    def update(self, symbol: str, base: Dict[str, np.ndarray], outputs: Dict[str, np.ndarray], first_row: int) -> None:
+        # Run the rows from first_row on through the nodes, in dependency order
+        length = len(next(iter(base.values())))
+        states = self._states.get(symbol, {})
+        count = self._counts.get(symbol, 0)
+        self._invalidate(symbol=symbol)
+
+        # A new symbol, a new node or a bar inserted in the past, start that symbol over
+        if len(states) < len(self._nodes) or first_row < count - 1:
+            self.seed(symbol=symbol, base=base, outputs=outputs)
+            return
+
+        steps = [(node.key, states[node.key], node.inputs) for node in self._nodes.values()]
+        published = [(outputs[column_name], key) for column_name, key in self._outputs.items() if column_name in outputs]
+
+        for row in range(min(first_row, count), length):
+            # The last bar we saw was updated
+            replace = row < count
+            values = {}
+
+            for key, state, inputs in steps:
+                args = [values[input_key] if isinstance(input_key, tuple) else base[input_key][row] for input_key in inputs]
+                values[key] = state.replace(*args) if replace else state.push(*args)
+
+            for output, key in published:
+                output[row] = values[key]
+
+        self._counts[symbol] = length
@@ -5,27 +5,54 @@ import pandas as pd
 from typing import List, Dict, Union, Optional, Tuple, Any
 
 from pyRobot.stock_frame import StockFrame
+from pyRobot.column_store import PRICE_COLUMNS
+from pyRobot.streaming import (
+    DiffState, PreviousState, CumulativeSumState, MissingCountState, WindowMeanState, WindowMaxState, WindowMinState,
+    EwmState, WilderState, GainState, LossState, RsiState, DifferenceState, ProductState, RatioState,
+    StandardDeviationState, BandState, TypicalPriceState, TrueRangeState, StochasticState, SignedVolumeState
+)
+from pyRobot.indicator_graph import IndicatorGraph, NodeKey
+from pyRobot.signals import SignalPlan
 
 class Indicators():
-    def __init__(self, price_data_frame: StockFrame) -> None:
+    def __init__(self, price_data_frame: StockFrame, streaming: bool = True, timeframe: Optional[str] = None) -> None:
+        # With a timeframe the indicators run on the longer bars the StockFrame builds (see add_timeframe)
+        if timeframe is not None:
+            price_data_frame = price_data_frame.timeframe(timeframe)
+
         self._stock_frame: StockFrame = price_data_frame
-        self._price_groups = price_data_frame.symbol_groups
+        self._streaming = streaming
+
+        # Only the full recompute works on the pandas view (through the segment kernels), streaming reads the store directly
+        self._offsets = price_data_frame.symbol_offsets if not streaming else None
+        self._graph = IndicatorGraph()
         self._current_indicators = {}
         self._indicator_signals = {}
         self._indicators_comp_key = []
         self._indicators_key = []
-        self._frame = self._stock_frame.frame
+        self._signal_plan: SignalPlan = None
+        self._frame = self._stock_frame.frame if not streaming else None
+
+        # Symbols with a new or updated bar since the last signal check, only those get checked again
+        self._unchecked: Dict[str, int] = self._stock_frame.track_changes()
+
+        # Streaming keeps its own logs of the rows changed and evicted since the last refresh,
+        # so any number of Indicators can follow the same StockFrame
+        self._modified: Dict[str, int] = self._stock_frame.track_changes(shift=True) if streaming else {}
+        self._evicted: Dict[str, int] = self._stock_frame.track_evictions() if streaming else {}
 
     def set_indicator_signals(self, indicator: str, buy: float, sell: float, condition_buy: Any, condition_sell: Any) -> None:
         # if there is no signal for that indicator set a template
         if indicator not in self._indicator_signals:
             self._indicator_signals[indicator] = {}
+            self._indicators_key.append(indicator)
 
         # Modify the signal
         self._indicator_signals[indicator]['buy'] = buy
         self._indicator_signals[indicator]['sell'] = sell
         self._indicator_signals[indicator]['buy_operator'] = condition_buy
         self._indicator_signals[indicator]['sell_operator'] = condition_sell
+        self._signal_plan = None
 
     def get_indicator_signals(self, indicator: Optional[str]) -> Dict:
         if indicator and indicator in self._indicator_signals:
@@ -53,9 +80,13 @@ class Indicators():
         indicator_dict['indicator_2'] = indicator_2
         indicator_dict['buy_operator'] = condition_buy
         indicator_dict['sell_operator'] = condition_sell
+        self._signal_plan = None
 
     @property
     def price_data_frame(self) -> pd.DataFrame:
+        # In streaming mode the indicator columns live in the StockFrame's store
+        if self._streaming:
+            return self._stock_frame.frame
         return self._frame
     
     @price_data_frame.setter
@@ -71,10 +102,12 @@ class Indicators():
         self._current_indicators[column_name] = {}
         self._current_indicators[column_name]['args'] = locals_data
         self._current_indicators[column_name]['func'] = self.change_in_price
+        self._publish(columns={column_name: self._graph.add(DiffState, inputs=['close'])})
 
-        self._frame[column_name] = self._price_groups['close'].transform(
-            lambda x : x.diff()
-        )
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=[column_name])
 
     def rsi(self, period: int, method: str = 'wilders') -> pd.DataFrame:
         locals_data = locals()
@@ -85,89 +118,381 @@ class Indicators():
         self._current_indicators[column_name]['args'] = locals_data
         self._current_indicators[column_name]['func'] = self.rsi
 
-        if 'change_in_price' not in self._frame.columns:
-            self.change_in_price()
+        # The diff is shared with change_in_price, the averages with any other RSI of the same period
+        change = self._graph.add(DiffState, inputs=['close'])
+        ewma_up = self._graph.add(EwmState, inputs=[self._graph.add(GainState, inputs=[change])], period=period)
+        ewma_down = self._graph.add(EwmState, inputs=[self._graph.add(LossState, inputs=[change])], period=period)
+        self._publish(columns={column_name: self._graph.add(RsiState, inputs=[ewma_up, ewma_down])})
 
-        # Define the up days
-        self._frame['up_day'] = self._price_groups['change_in_price'].transform(
-            lambda x : np.where(x >= 0, x, 0)
-        )
+        if self._streaming:
+            return self.price_data_frame
 
-        # Define the down days
-        self._frame['down_day'] = self._price_groups['change_in_price'].transform(
-            lambda x : np.where(x < 0, x.abs(), 0)
-        )
-
-        # exponential weighted moving average
-        self._frame['ewma_up'] = self._price_groups['up_day'].transform(
-            lambda x : x.ewm(span=period).mean()
-        )
-
-        self._frame['ewma_down'] = self._price_groups['down_day'].transform(
-            lambda x : x.ewm(span=period).mean()
-        )
-
-        relative_strength = self._frame['ewma_up'] / self._frame['ewma_down']
-        relative_strength_index = 100.0 - (100.0 / (1.0 + relative_strength))
-        
         # Add the RSI indicator to the data frame
-        self._frame['rsi'] = np.where(relative_strength_index == 0, 100, 100.0 - (100.0 / (1.0 + relative_strength)))
-
-        # clean up before sending back
-        self._frame.drop(
-            labels=['ewma_up', 'ewma_down', 'down_day', 'up_day', 'change_in_price'],
-            axis=1,
-            inplace=True
-        )
+        self._compute_batch(column_names=[column_name])
         return self._frame
     
     # simple moving average
-    def sma(self, period: int) -> pd.DataFrame:
+    def sma(self, period: int, column_name: str = 'sma') -> pd.DataFrame:
         locals_data = locals()
         del locals_data['self']
         
-        column_name = "sma"
         self._current_indicators[column_name] = {}
         self._current_indicators[column_name]['args'] = locals_data
         self._current_indicators[column_name]['func'] = self.sma
+        self._publish(columns={column_name: self._sma_node(period=period)})
+
+        if self._streaming:
+            return self.price_data_frame
 
         # Add the SMA
-        self._frame[column_name] = self._price_groups['close'].transform(
-            lambda x : x.rolling(window=period).mean()
-        )
+        self._compute_batch(column_names=[column_name])
         return self._frame
     
-    def ema(self, period: int, alpha: float = 0.0) -> pd.DataFrame:
+    def ema(self, period: int, alpha: float = 0.0, column_name: str = 'ema') -> pd.DataFrame:
         locals_data = locals()
         del locals_data['self']
         
-        column_name = "ema"
         self._current_indicators[column_name] = {}
         self._current_indicators[column_name]['args'] = locals_data
         self._current_indicators[column_name]['func'] = self.ema
+        self._publish(columns={column_name: self._ema_node(period=period)})
+
+        if self._streaming:
+            return self.price_data_frame
 
         # Add the EMA
-        self._frame[column_name] = self._price_groups['close'].transform(
-            lambda x : x.ewm(span=period).mean()
-        )
+        self._compute_batch(column_names=[column_name])
         return self._frame
 
+    def moving_averages(self, periods: List[int], kind: str = 'sma', column_names: Optional[List[str]] = None) -> pd.DataFrame:
+        """Register one moving average per period, named like sma_50 unless column_names are given.
+
+        All the SMA windows read the same running totals of the closes, so ten
+        windows cost about one cumulative sum, and every window is seeded in one pass.
+        """
+
+        if kind not in ('sma', 'ema'):
+            raise ValueError('kind must be sma or ema, got {}'.format(kind))
+
+        if column_names is None:
+            column_names = ['{kind}_{period}'.format(kind=kind, period=period) for period in periods]
+
+        if len(column_names) != len(periods):
+            raise ValueError('Need one column name per period.')
+
+        method = getattr(self, kind)
+        node = self._sma_node if kind == 'sma' else self._ema_node
+        columns = {}
+
+        for period, column_name in zip(periods, column_names):
+            self._current_indicators[column_name] = {}
+            self._current_indicators[column_name]['args'] = {'period': period, 'column_name': column_name}
+            self._current_indicators[column_name]['func'] = method
+            columns[column_name] = node(period=period)
+
+        self._publish(columns=columns)
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=list(columns))
+        return self._frame
+
+    def macd(self, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9, column_name: str = 'macd') -> pd.DataFrame:
+        """MACD line (fast EMA minus slow EMA), its signal line and the histogram.
+
+        Adds column_name, column_name_signal and column_name_histogram. The EMAs
+        are the same nodes ema() uses, so an EMA of either period comes for free.
+        """
+
+        locals_data = locals()
+        del locals_data['self']
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = locals_data
+        self._current_indicators[column_name]['func'] = self.macd
+
+        line = self._graph.add(DifferenceState, inputs=[self._ema_node(period=fast_period), self._ema_node(period=slow_period)])
+        signal = self._ema_node(period=signal_period, source=line)
+        columns = {
+            column_name: line,
+            column_name + '_signal': signal,
+            column_name + '_histogram': self._graph.add(DifferenceState, inputs=[line, signal])
+        }
+        self._publish(columns=columns)
+
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=list(columns))
+        return self._frame
+
+    def bollinger_bands(self, period: int = 20, num_std: float = 2.0, column_name: str = 'bollinger') -> pd.DataFrame:
+        """Bands num_std sample standard deviations above and below the SMA of the closes.
+
+        Adds column_name_upper, column_name_middle and column_name_lower. The middle
+        band is the SMA node, the deviation is taken over the window itself
+        rather than from running totals, which lose the spread on long histories.
+        """
+
+        locals_data = locals()
+        del locals_data['self']
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = locals_data
+        self._current_indicators[column_name]['func'] = self.bollinger_bands
+
+        middle = self._sma_node(period=period)
+        deviation = self._graph.add(StandardDeviationState, inputs=['close'], period=period)
+        columns = {
+            column_name + '_upper': self._graph.add(BandState, inputs=[middle, deviation], width=float(num_std)),
+            column_name + '_middle': middle,
+            column_name + '_lower': self._graph.add(BandState, inputs=[middle, deviation], width=-float(num_std))
+        }
+        self._publish(columns=columns)
+
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=list(columns))
+        return self._frame
+
+    def atr(self, period: int = 14, column_name: str = 'atr') -> pd.DataFrame:
+        """Average true range, the true range smoothed the way Wilder did."""
+
+        locals_data = locals()
+        del locals_data['self']
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = locals_data
+        self._current_indicators[column_name]['func'] = self.atr
+        self._publish(columns={column_name: self._graph.add(WilderState, inputs=[self._true_range_node()], period=period)})
+
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=[column_name])
+        return self._frame
+
+    def vwap(self, period: int = 20, column_name: str = 'vwap') -> pd.DataFrame:
+        """Volume weighted average of the typical price over the last period bars.
+
+        Both sums come from running totals, the volume one is shared with every
+        other indicator reading the cumulative volume.
+        """
+
+        locals_data = locals()
+        del locals_data['self']
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = locals_data
+        self._current_indicators[column_name]['func'] = self.vwap
+
+        typical_price = self._graph.add(TypicalPriceState, inputs=['high', 'low', 'close'])
+        traded_value = self._sma_node(period=period, source=self._graph.add(ProductState, inputs=[typical_price, 'volume']))
+        volume = self._sma_node(period=period, source='volume')
+        self._publish(columns={column_name: self._graph.add(RatioState, inputs=[traded_value, volume])})
+
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=[column_name])
+        return self._frame
+
+    def stochastic_oscillator(self, period: int = 14, smooth: int = 3, column_name: str = 'stochastic') -> pd.DataFrame:
+        """%K (where the close sits between the period's lowest low and highest high) and %D, its SMA over smooth bars.
+
+        Adds column_name_k and column_name_d.
+        """
+
+        locals_data = locals()
+        del locals_data['self']
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = locals_data
+        self._current_indicators[column_name]['func'] = self.stochastic_oscillator
+
+        highest = self._graph.add(WindowMaxState, inputs=['high'], period=period)
+        lowest = self._graph.add(WindowMinState, inputs=['low'], period=period)
+        percent_k = self._graph.add(StochasticState, inputs=['close', highest, lowest])
+        columns = {
+            column_name + '_k': percent_k,
+            column_name + '_d': self._sma_node(period=smooth, source=percent_k)
+        }
+        self._publish(columns=columns)
+
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=list(columns))
+        return self._frame
+
+    def obv(self, column_name: str = 'obv') -> pd.DataFrame:
+        """On balance volume, the running total of the volume signed by the change in price.
+
+        Like any cumulative indicator it starts from zero at the oldest bar held,
+        so only its moves (not its level) mean anything once history is evicted.
+        """
+
+        locals_data = locals()
+        del locals_data['self']
+
+        self._current_indicators[column_name] = {}
+        self._current_indicators[column_name]['args'] = locals_data
+        self._current_indicators[column_name]['func'] = self.obv
+
+        change = self._graph.add(DiffState, inputs=['close'])
+        signed_volume = self._graph.add(SignedVolumeState, inputs=[change, 'volume'])
+        self._publish(columns={column_name: self._graph.add(CumulativeSumState, inputs=[signed_volume])})
+
+        if self._streaming:
+            return self.price_data_frame
+
+        self._compute_batch(column_names=[column_name])
+        return self._frame
+
+    def _sma_node(self, period: int, source: Union[str, NodeKey] = 'close') -> NodeKey:
+        totals = self._graph.add(CumulativeSumState, inputs=[source])
+        missing = self._graph.add(MissingCountState, inputs=[source])
+        return self._graph.add(WindowMeanState, inputs=[totals, missing], period=period)
+
+    def _ema_node(self, period: int, source: Union[str, NodeKey] = 'close') -> NodeKey:
+        return self._graph.add(EwmState, inputs=[source], period=period)
+
+    def _true_range_node(self) -> NodeKey:
+        previous_close = self._graph.add(PreviousState, inputs=['close'])
+        return self._graph.add(TrueRangeState, inputs=['high', 'low', previous_close])
+
+    def _publish(self, columns: Dict[str, NodeKey]) -> None:
+        # A column computed again (e.g. sma with another period) changes every symbol's values, check them all
+        self._signal_plan = None
+
+        if not self._streaming:
+            self._graph.publish(columns=columns)
+            self._stock_frame.require_history(bars=self._graph.lookback())
+            return
+
+        # Bring what is already registered up to date first, so the new nodes start level with it
+        self._refresh_streaming()
+        self._graph.publish(columns=columns)
+        self._stock_frame.require_history(bars=self._graph.lookback())
+        self._seed_indicators(column_names=list(columns))
+
+    def _compute_batch(self, column_names: Optional[List[str]] = None) -> None:
+        # Every symbol at once through the segment kernels, all the published columns by default
+        base = {name: self._frame[name].to_numpy() for name in PRICE_COLUMNS if name in self._frame.columns}
+        columns = self._graph.evaluate(base=base, offsets=self._offsets, column_names=column_names)
+        for column_name, values in columns.items():
+            self._frame[column_name] = values
+
+    def _price_columns(self, symbol: str) -> Dict[str, np.ndarray]:
+        store = self._stock_frame.store
+        return {name: store.column(symbol, name) for name in PRICE_COLUMNS if name in store.columns}
+
+    def _seed_indicators(self, column_names: List[str]) -> None:
+        store = self._stock_frame.store
+        for column_name in column_names:
+            store.add_column(name=column_name)
+
+        # Only the new nodes and whatever they need that isn't cached get computed
+        keys = [self._graph.outputs[column_name] for column_name in column_names]
+        for symbol in store.symbols:
+            self._graph.seed(
+                symbol=symbol,
+                base=self._price_columns(symbol=symbol),
+                outputs={column_name: store.column(symbol, column_name) for column_name in column_names},
+                keys=keys
+            )
+
+        self._stock_frame._reset_views()
+
+    def _refresh_streaming(self) -> None:
+        for symbol, rows in self._evicted.items():
+            self._graph.shift(symbol=symbol, rows=rows)
+        self._evicted.clear()
+
+        modified = dict(self._modified)
+        self._modified.clear()
+        if not modified or not self._graph.outputs:
+            return
+
+        # A check that ran between the new bars and this refresh saw the old values
+        self._unchecked.update(modified)
+
+        store = self._stock_frame.store
+        for symbol, first_row in modified.items():
+            self._graph.update(
+                symbol=symbol,
+                base=self._price_columns(symbol=symbol),
+                outputs={column_name: store.column(symbol, column_name) for column_name in self._graph.outputs},
+                first_row=first_row
+            )
+
+        self._stock_frame._reset_views()
+
     def refresh(self):
-        # First Update the groups
-        self._price_groups = self._stock_frame.symbol_groups
-
-        # Loop through all the stored indicators
-        for indicator in self._current_indicators:
-            indicator_args = self._current_indicators[indicator]['args']
-            indicator_func = self._current_indicators[indicator]['func']
-
-            # Update the columns
-            indicator_func(**indicator_args)
-
-    def check_signals(self) -> Union[pd.DataFrame, None]:
-        signals_df = self._stock_frame._check_signals(
-            indicators=self._indicator_signals,
-            indciators_comp_key=self._indicators_comp_key,
-            indicators_key=self._indicators_key
+        if self._streaming:
+            self._refresh_streaming()
+            return
+
+        # First grab the latest frame and update the groups
+        self._frame = self._stock_frame.frame
+        self._offsets = self._stock_frame.symbol_offsets
+
+        # Then every indicator in one pass over the graph, so the nodes they share run once
+        self._compute_batch()
+
+    @property
+    def signal_plan(self) -> SignalPlan:
+        # Compile the signals once, they only change when a new one is registered
+        if self._signal_plan is None:
+            self._signal_plan = SignalPlan.compile(
+                indicators=self._indicator_signals,
+                indicators_key=self._indicators_key,
+                indicators_comp_key=self._indicators_comp_key
             )
-        return signals_df
\ No newline at end of file
+        return self._signal_plan
+
+    @property
+    def graph(self) -> IndicatorGraph:
+        return self._graph
+
+    @property
+    def current_indicators(self) -> Dict[str, dict]:
+        return self._current_indicators
+
+    def setup(self) -> Dict[str, Any]:
+        # The registered indicators and signals as plain data, to build the same Indicators elsewhere
+        return {
+            'indicators': [(indicator['func'].__name__, dict(indicator['args'])) for indicator in self._current_indicators.values()],
+            'signals': {name: dict(signal) for name, signal in self._indicator_signals.items()}
+        }
+
+    def apply_setup(self, setup: Dict[str, Any]) -> None:
+        for method_name, method_args in setup['indicators']:
+            getattr(self, method_name)(**method_args)
+
+        for indicator, signal in setup['signals'].items():
+            if signal.get('type') == 'comparison':
+                self.set_indicator_signal_compare(
+                    indicator_1=signal['indicator_1'],
+                    indicator_2=signal['indicator_2'],
+                    condition_buy=signal['buy_operator'],
+                    condition_sell=signal['sell_operator']
+                )
+            else:
+                self.set_indicator_signals(
+                    indicator=indicator,
+                    buy=signal['buy'],
+                    sell=signal['sell'],
+                    condition_buy=signal['buy_operator'],
+                    condition_sell=signal['sell_operator']
+                )
+
+    def check_signals(self) -> Union[Dict[str, pd.Series], None]:
+        # Streaming indicators only change for the symbols that got a bar, the plan remembers
+        # the hits of the rest. A new plan or a full recompute checks every symbol.
+        symbols = list(self._unchecked) if self._streaming and self._signal_plan is not None else None
+        self._unchecked.clear()
+
+        signals_df = self._stock_frame._check_signals(plan=self.signal_plan, symbols=symbols)
+        return signals_df
@@ -0,0 +1,224 @@
+import numpy as np
+
+from typing import Callable, Sequence
+
+# Indicator math over many symbols at once. The values of every symbol sit
+# back to back in one array (like the StockFrame's store and its pandas view),
+# offsets[i]:offsets[i + 1] being symbol i, so no kernel calls Python per symbol.
+
+# Largest power of the inverse decay used in one EWM block, far from overflowing a float64
+_MAX_SCALE = 1e100
+
+def segment_lengths(offsets: Sequence[int]) -> np.ndarray:
+    return np.diff(np.asarray(offsets, dtype=np.int64))
+
+def _by_rows(values: np.ndarray, offsets: Sequence[int], kernel: Callable[[np.ndarray, np.ndarray], np.ndarray]) -> np.ndarray:
+    # Lay the segments out as the rows of a matrix, padded with NaN on the right,
+    # and run the kernel along the rows. When one long symbol would make the
+    # padding blow up, the segments go through one at a time instead.
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = segment_lengths(offsets)
+    if not len(values):
+        return np.full(0, np.nan)
+
+    # Symbols of the same length already are the rows of a matrix
+    widest = int(lengths.max())
+    if int(lengths.min()) == widest:
+        return kernel(values.reshape(len(lengths), widest), lengths).reshape(-1)
+
+    output = np.full(len(values), np.nan)
+    if len(lengths) * widest <= 2 * len(values) + 1024:
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        columns = np.arange(len(values)) - np.repeat(offsets[:-1], lengths)
+
+        matrix = np.full((len(lengths), widest), np.nan)
+        matrix[rows, columns] = values
+        output[:] = kernel(matrix, lengths)[rows, columns]
+    else:
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            if end > start:
+                output[start:end] = kernel(values[None, start:end].astype(np.float64), np.array([end - start]))[0]
+
+    return output
+
+def segment_positions(offsets: Sequence[int]) -> np.ndarray:
+    """Row number of every value within its own symbol."""
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = segment_lengths(offsets)
+    return np.arange(offsets[-1] - offsets[0]) - np.repeat(offsets[:-1] - offsets[0], lengths)
+
+def segment_shift(values: np.ndarray, offsets: Sequence[int]) -> np.ndarray:
+    """The previous value, NaN on the first bar of every symbol."""
+
+    values = np.asarray(values, dtype=np.float64)
+    output = np.empty(len(values))
+    output[1:] = values[:-1]
+
+    starts = np.asarray(offsets[:-1], dtype=np.int64)
+    output[starts[starts < len(values)]] = np.nan
+    return output
+
+def segment_diff(values: np.ndarray, offsets: Sequence[int]) -> np.ndarray:
+    """Change from the previous value, NaN on the first bar of every symbol."""
+
+    values = np.asarray(values, dtype=np.float64)
+    output = np.empty(len(values))
+    output[1:] = values[1:] - values[:-1]
+
+    starts = np.asarray(offsets[:-1], dtype=np.int64)
+    output[starts[starts < len(values)]] = np.nan
+    return output
+
+def segment_cumsum(values: np.ndarray, offsets: Sequence[int]) -> np.ndarray:
+    """Running total per symbol, missing values add nothing."""
+
+    def kernel(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        return np.cumsum(np.nan_to_num(matrix, nan=0.0), axis=1)
+
+    return _by_rows(values=np.asarray(values, dtype=np.float64), offsets=offsets, kernel=kernel)
+
+def segment_rolling_max(values: np.ndarray, offsets: Sequence[int], window: int) -> np.ndarray:
+    """Largest of the last window values, like rolling(window).max(): NaN until the window is full or while it holds a NaN."""
+
+    def kernel(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        rows, width = matrix.shape
+        output = np.full(matrix.shape, np.nan)
+        if width < window:
+            return output
+
+        missing = np.zeros((rows, width + 1), dtype=np.int64)
+        np.cumsum(np.isnan(matrix), axis=1, out=missing[:, 1:])
+
+        # Running maxima from the start and from the end of blocks of window bars. A window
+        # spans at most two blocks, so its maximum is the larger of the one from its first
+        # bar to the end of that block and the one from the start of the next to its last bar.
+        blocks = -(-width // window)
+        filled = np.full((rows, blocks * window), -np.inf)
+        filled[:, :width] = np.where(np.isnan(matrix), -np.inf, matrix)
+        filled = filled.reshape(rows, blocks, window)
+
+        forward = np.maximum.accumulate(filled, axis=2).reshape(rows, -1)
+        backward = np.maximum.accumulate(filled[:, :, ::-1], axis=2)[:, :, ::-1].reshape(rows, -1)
+
+        complete = missing[:, window:] == missing[:, :-window]
+        output[:, window - 1:] = np.where(complete, np.maximum(backward[:, :width - window + 1], forward[:, window - 1:width]), np.nan)
+        return output
+
+    return _by_rows(values=np.asarray(values, dtype=np.float64), offsets=offsets, kernel=kernel)
+
+def segment_rolling_min(values: np.ndarray, offsets: Sequence[int], window: int) -> np.ndarray:
+    """Smallest of the last window values, like rolling(window).min()."""
+
+    return -segment_rolling_max(values=-np.asarray(values, dtype=np.float64), offsets=offsets, window=window)
+
+def segment_rolling_std(values: np.ndarray, offsets: Sequence[int], window: int) -> np.ndarray:
+    """Sample standard deviation of the last window values, like rolling(window).std().
+
+    Sums are only ever taken over one block of window bars, relative to the
+    block's own mean, so long series at high prices don't cancel away the spread.
+    """
+
+    def kernel(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        rows, width = matrix.shape
+        output = np.full(matrix.shape, np.nan)
+        if width < window or window < 2:
+            return output
+
+        missing = np.zeros((rows, width + 1), dtype=np.int64)
+        np.cumsum(np.isnan(matrix), axis=1, out=missing[:, 1:])
+
+        # Deviations from the block mean, missing values count as the mean (their windows come out NaN anyway)
+        blocks = -(-width // window)
+        filled = np.full((rows, blocks * window), np.nan)
+        filled[:, :width] = matrix
+        filled = filled.reshape(rows, blocks, window)
+        present = ~np.isnan(filled)
+        counts = present.sum(axis=2, keepdims=True)
+        with np.errstate(invalid='ignore'):
+            reference = np.where(counts > 0, np.nansum(filled, axis=2, keepdims=True) / np.maximum(counts, 1), 0.0)
+        deviations = np.where(present, filled - reference, 0.0)
+
+        # Sums from the start and from the end of every block, as for the rolling max a window is
+        # the end of one block and the start of the next, or exactly one block
+        reference = np.broadcast_to(reference, filled.shape).reshape(rows, -1)
+        forward = np.cumsum(deviations, axis=2).reshape(rows, -1)
+        forward_squares = np.cumsum(np.square(deviations), axis=2).reshape(rows, -1)
+        backward = np.cumsum(deviations[:, :, ::-1], axis=2)[:, :, ::-1].reshape(rows, -1)
+        backward_squares = np.cumsum(np.square(deviations[:, :, ::-1]), axis=2)[:, :, ::-1].reshape(rows, -1)
+
+        starts = np.arange(width - window + 1)
+        ends = starts + window - 1
+        head = window - starts % window                         # bars taken from the end of the first block
+        tail = window - head                                     # and from the start of the next one
+
+        # Each part's mean and sum of squared deviations from it
+        head_mean = backward[:, starts] / head
+        head_squares = backward_squares[:, starts] - backward[:, starts] * head_mean
+        tail_sum = np.where(tail > 0, forward[:, ends], 0.0)
+        tail_mean = tail_sum / np.maximum(tail, 1)
+        tail_squares = np.where(tail > 0, forward_squares[:, ends], 0.0) - tail_sum * tail_mean
+
+        # Put the two parts together (Chan et al.), the means differ by the gap between the block references
+        gap = (reference[:, ends] + tail_mean) - (reference[:, starts] + head_mean)
+        squares = head_squares + tail_squares + np.square(gap) * head * tail / window
+
+        complete = missing[:, window:] == missing[:, :-window]
+        output[:, window - 1:] = np.where(complete, np.sqrt(np.maximum(squares, 0.0) / (window - 1)), np.nan)
+        return output
+
+    return _by_rows(values=np.asarray(values, dtype=np.float64), offsets=offsets, kernel=kernel)
+
+def segment_ewm(values: np.ndarray, offsets: Sequence[int], span: float = None, alpha: float = None, adjust: bool = True) -> np.ndarray:
+    """Exponentially weighted mean per symbol, the same as pandas' ewm(span=...) or ewm(alpha=...).mean().
+
+    Missing values are skipped but still age the older ones (ignore_na=False).
+    The recursion runs in closed form over blocks of bars, so a block costs a
+    handful of array operations for every symbol together.
+    """
+
+    if alpha is None:
+        alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+
+    def kernel(matrix: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        valid = ~np.isnan(matrix)
+
+        # Nothing carries over, the mean is the last value seen
+        if decay <= 0.0:
+            last = np.maximum.accumulate(np.where(valid, np.arange(matrix.shape[1]), -1), axis=1)
+            return np.where(last >= 0, np.take_along_axis(matrix, np.maximum(last, 0), axis=1), np.nan)
+
+        # Every observation weighs one with adjust, without it the first one weighs one and the rest alpha
+        weights = valid.astype(np.float64)
+        if not adjust:
+            first = valid & (np.cumsum(valid, axis=1) == 1)
+            weights = np.where(first, 1.0, weights * alpha)
+
+        weighted = np.where(valid, matrix, 0.0) * weights
+        numerator = np.empty(matrix.shape)
+        denominator = np.empty(matrix.shape)
+
+        # numerator[t] = sum of decay ** (t - j) * weighted[j], per block as decay ** k * cumsum(weighted / decay ** k)
+        block = max(1, int(np.log(_MAX_SCALE) / -np.log(decay))) if decay < 1.0 else matrix.shape[1]
+        carry_numerator = np.zeros(matrix.shape[0])
+        carry_denominator = np.zeros(matrix.shape[0])
+
+        for start in range(0, matrix.shape[1], block):
+            end = min(start + block, matrix.shape[1])
+            powers = decay ** np.arange(end - start)
+            numerator[:, start:end] = powers * (np.cumsum(weighted[:, start:end] / powers, axis=1) + decay * carry_numerator[:, None])
+            denominator[:, start:end] = powers * (np.cumsum(weights[:, start:end] / powers, axis=1) + decay * carry_denominator[:, None])
+
+            carry_numerator = numerator[:, end - 1]
+            carry_denominator = denominator[:, end - 1]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denominator > 0.0, numerator / denominator, np.nan)
+
+    return _by_rows(values=np.asarray(values, dtype=np.float64), offsets=offsets, kernel=kernel)
+
+def segment_wilder(values: np.ndarray, offsets: Sequence[int], period: int) -> np.ndarray:
+    """Wilder's smoothing, an EWM with alpha 1 / period started from the first value."""
+
+    return segment_ewm(values=values, offsets=offsets, alpha=1.0 / period, adjust=False)
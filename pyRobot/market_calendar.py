@@ -0,0 +1,222 @@
+import math
+import numpy as np
+
+from datetime import date, datetime, time, timedelta
+from typing import List, Dict, Optional, Iterable, Tuple
+from zoneinfo import ZoneInfo
+
+# Seconds in a day, and how far the sessions' day is shifted from UTC (UTC-5, the
+# exchange's standard time), so every session falls inside one shifted day all year.
+DAY = 86400
+DAY_OFFSET = -5 * 3600
+
+def _observed(day: date) -> date:
+    # A holiday on a Saturday is taken the Friday before, on a Sunday the Monday after
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    # n = 1 for the first such weekday of the month, -1 for the last one
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def nyse_holidays(year: int) -> Tuple[List[date], List[date]]:
+    """Full closures and 1 pm early closes of the NYSE for a year, by the exchange's standing rules."""
+
+    holidays = [
+        _nth_weekday(year, 1, 0, 3),                    # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),                    # Washington's Birthday
+        _easter(year) - timedelta(days=2),              # Good Friday
+        _nth_weekday(year, 5, 0, -1),                   # Memorial Day
+        _observed(date(year, 7, 4)),                    # Independence Day
+        _nth_weekday(year, 9, 0, 1),                    # Labor Day
+        _nth_weekday(year, 11, 3, 4),                   # Thanksgiving
+        _observed(date(year, 12, 25))                   # Christmas
+    ]
+
+    # New Year's Day on a Saturday isn't made up on the Friday, that one belongs to the year before
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.append(_observed(new_year))
+
+    if year >= 2022:
+        holidays.append(_observed(date(year, 6, 19)))   # Juneteenth
+
+    early_closes = [_nth_weekday(year, 11, 3, 4) + timedelta(days=1)]
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 5 and day not in holidays:
+            early_closes.append(day)
+
+    return sorted(holidays), sorted(early_closes)
+
+class MarketCalendar():
+    # Session boundaries for every day of a year, computed once in the exchange's
+    # timezone (so DST, weekends and holidays are in there) and looked up by day
+    # index, so "is it open" and "when does the next bar close" cost O(1).
+
+    def __init__(self, timezone: str = 'America/New_York', pre_market: Tuple[time, time] = (time(8, 0), time(9, 30)),
+                 regular_market: Tuple[time, time] = (time(9, 30), time(16, 0)), post_market: Tuple[time, time] = (time(16, 0), time(18, 30)),
+                 early_close: time = time(13, 0), holidays: Optional[Iterable[date]] = None) -> None:
+        self.timezone = ZoneInfo(timezone)
+        self.pre_market = pre_market
+        self.regular_market = regular_market
+        self.post_market = post_market
+        self.early_close = early_close
+        self.extra_holidays = set(holidays or [])
+
+        # year -> (first day's epoch, boundaries per day: pre start, open, close, post end)
+        self._years: Dict[int, Tuple[int, np.ndarray]] = {}
+
+    def _year(self, year: int) -> Tuple[int, np.ndarray]:
+        if year in self._years:
+            return self._years[year]
+
+        holidays, early_closes = nyse_holidays(year)
+        closed = set(holidays) | {day for day in self.extra_holidays if day.year == year}
+        early = set(early_closes)
+
+        first = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - first).days
+        boundaries = np.zeros((days, 4), dtype=np.float64)
+
+        def at(day: date, moment: time) -> float:
+            return datetime.combine(day, moment, tzinfo=self.timezone).timestamp()
+
+        for offset in range(days):
+            day = first + timedelta(days=offset)
+            if day.weekday() >= 5 or day in closed:
+                continue
+
+            close = at(day, self.early_close) if day in early else at(day, self.regular_market[1])
+            post_length = at(day, self.post_market[1]) - at(day, self.post_market[0])
+            boundaries[offset] = (at(day, self.pre_market[0]), at(day, self.regular_market[0]), close, close + post_length)
+
+        start = int((datetime(year, 1, 1) - datetime(1970, 1, 1)).total_seconds()) - DAY_OFFSET
+        self._years[year] = (start, boundaries)
+        return self._years[year]
+
+    def _day(self, timestamp: float) -> Tuple[int, int, np.ndarray]:
+        # The year, the day within it and that year's table, for a timestamp in seconds
+        local_day = date(1970, 1, 1) + timedelta(days=int((timestamp + DAY_OFFSET) // DAY))
+        start, boundaries = self._year(local_day.year)
+        return local_day.year, int((timestamp - start) // DAY), boundaries
+
+    def _boundaries(self, year: int, day: int) -> np.ndarray:
+        # Walks over the end of the year into the next one's table
+        while day >= len(self._year(year)[1]):
+            day -= len(self._year(year)[1])
+            year += 1
+        return self._year(year)[1][day]
+
+    def session(self, timestamp: float) -> Optional[str]:
+        """'pre', 'regular', 'post' or None when the market is closed."""
+
+        _, day, boundaries = self._day(timestamp)
+        pre_start, market_open, market_close, post_end = boundaries[day]
+
+        if not pre_start or timestamp < pre_start or timestamp >= post_end:
+            return None
+        if timestamp < market_open:
+            return 'pre'
+        if timestamp < market_close:
+            return 'regular'
+        return 'post'
+
+    def is_open(self, timestamp: float, session: str = 'regular') -> bool:
+        current = self.session(timestamp)
+        if session == 'extended':
+            return current is not None
+        return current == session
+
+    def is_trading_day(self, day: date) -> bool:
+        start, boundaries = self._year(day.year)
+        return bool(boundaries[day.timetuple().tm_yday - 1][0])
+
+    def _session_bounds(self, boundaries: np.ndarray, session: str) -> Tuple[float, float]:
+        pre_start, market_open, market_close, post_end = boundaries
+        if session == 'extended':
+            return pre_start, post_end
+        return {
+            'pre': (pre_start, market_open),
+            'regular': (market_open, market_close),
+            'post': (market_close, post_end)
+        }[session]
+
+    def next_bar_boundary(self, timestamp: float, bar_size: int = 1, bar_type: str = 'minute', session: str = 'regular') -> float:
+        """When the next bar after timestamp closes, in seconds since epoch.
+
+        Minute bars are counted from the session's open and the last one closes
+        with the session. Daily bars close with the regular session, weekly ones
+        with the last trading day of the week. Closed days are skipped.
+        """
+
+        year, day, _ = self._day(timestamp)
+
+        # Closed days in a row are bounded by the longest holiday weekend, a week covers them
+        for ahead in range(14):
+            boundaries = self._boundaries(year=year, day=day + ahead)
+            if not boundaries[0]:
+                continue
+
+            if bar_type == 'minute':
+                start, end = self._session_bounds(boundaries=boundaries, session=session)
+                if timestamp >= end:
+                    continue
+
+                bar_seconds = 60 * bar_size
+                bars = max(1, math.floor((timestamp - start) / bar_seconds) + 1) if timestamp >= start else 1
+                return min(start + bars * bar_seconds, end)
+
+            market_close = boundaries[2]
+            if timestamp >= market_close:
+                continue
+
+            if bar_type == 'weekly':
+                # The week's bar closes on its last trading day
+                week_day = (date(year, 1, 1) + timedelta(days=day + ahead)).weekday()
+                for later in range(4 - week_day, 0, -1):
+                    later_boundaries = self._boundaries(year=year, day=day + ahead + later)
+                    if later_boundaries[0]:
+                        return later_boundaries[2]
+
+            return market_close
+
+        raise ValueError('No trading session in the two weeks after {}'.format(timestamp))
+
+    def next_open(self, timestamp: float, session: str = 'regular') -> float:
+        """When the session next opens, or timestamp itself while it is open."""
+
+        year, day, _ = self._day(timestamp)
+        for ahead in range(14):
+            boundaries = self._boundaries(year=year, day=day + ahead)
+            if not boundaries[0]:
+                continue
+
+            start, end = self._session_bounds(boundaries=boundaries, session=session)
+            if timestamp < start:
+                return start
+            if timestamp < end:
+                return timestamp
+
+        raise ValueError('No trading session in the two weeks after {}'.format(timestamp))
@@ -0,0 +1,139 @@
+import os
+import json
+import math
+import pathlib
+import threading
+import time as time
+
+from contextlib import contextmanager
+from typing import List, Dict, Iterator, Optional
+
+class LatencyHistogram():
+    # Log spaced buckets from 100 ns to 1000 s, 20 per decade (about 12% wide),
+    # so recording is one log10 and one increment whatever the sample count.
+    BUCKETS_PER_DECADE = 20
+    SMALLEST = -7                               # 10 ** -7 seconds
+    DECADES = 10
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (self.BUCKETS_PER_DECADE * self.DECADES + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        if seconds > 0.0:
+            bucket = int((math.log10(seconds) - self.SMALLEST) * self.BUCKETS_PER_DECADE)
+            bucket = min(max(bucket, 0), len(self.counts) - 1)
+        else:
+            bucket = 0
+
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        # Upper edge of the bucket holding the sample, clipped to what was actually seen
+        if not self.count:
+            return 0.0
+
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                upper = 10 ** (self.SMALLEST + (bucket + 1) / self.BUCKETS_PER_DECADE)
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max
+        }
+
+class Metrics():
+    # Wall and CPU time per stage of the trading loop plus API call counters.
+    # Stages run on worker threads, so the CPU time is the thread's own.
+    def __init__(self, path: Optional[str] = None, dump_interval: float = 60.0) -> None:
+        self.path = pathlib.Path(path) if path else None
+        self.dump_interval = dump_interval
+
+        self.wall: Dict[str, LatencyHistogram] = {}
+        self.cpu: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, int] = {}
+
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._last_dump = time.monotonic()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name=name, wall=time.perf_counter() - wall, cpu=time.thread_time() - cpu)
+
+    def record(self, name: str, wall: float, cpu: Optional[float] = None) -> None:
+        with self._lock:
+            if name not in self.wall:
+                self.wall[name] = LatencyHistogram()
+                self.cpu[name] = LatencyHistogram()
+
+            self.wall[name].record(wall)
+            if cpu is not None:
+                self.cpu[name].record(cpu)
+
+    def increment(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def snapshot(self) -> dict:
+        """Percentiles per stage and the counters, as plain data."""
+
+        with self._lock:
+            return {
+                'started': self._started,
+                'timestamp': time.time(),
+                'stages': {
+                    name: {'wall': self.wall[name].summary(), 'cpu': self.cpu[name].summary()}
+                    for name in self.wall
+                },
+                'counters': dict(self.counters)
+            }
+
+    def dump(self, path: Optional[str] = None) -> None:
+        # Write next to the target and swap it in, a reader never sees half a file
+        path = pathlib.Path(path) if path else self.path
+        if path is None:
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(temp_path, mode='w') as metrics_file:
+            json.dump(self.snapshot(), metrics_file, indent=4)
+        os.replace(temp_path, path)
+        self._last_dump = time.monotonic()
+
+    def maybe_dump(self) -> None:
+        # Cheap enough to call every bar, only writes once the interval went by
+        if self.path is not None and time.monotonic() - self._last_dump >= self.dump_interval:
+            self.dump()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.wall = {}
+            self.cpu = {}
+            self.counters = {}
+            self._started = time.time()
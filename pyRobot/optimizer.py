@@ -0,0 +1,148 @@
+import itertools
+import os
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Optional, Tuple
+
+from pyRobot.column_store import PRICE_COLUMNS
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+from pyRobot.backtest import Backtest
+
+# Set once per worker process by _attach_worker
+_worker_frame: StockFrame = None
+_worker_blocks: List[shared_memory.SharedMemory] = []
+
+def _attach_worker(layout: Dict[str, Tuple[str, str, int]], symbols: List[str], offsets: List[int]) -> None:
+    global _worker_frame
+
+    # Map every shared column and slice it per symbol, nothing gets copied
+    columns = {}
+    for name, (block_name, dtype, length) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        columns[name] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=block.buf)
+
+    arrays = {
+        symbol: {name: values[start:end] for name, values in columns.items()}
+        for symbol, start, end in zip(symbols, offsets[:-1], offsets[1:])
+    }
+    # float32 prices come from a compact frame, a compact one here adopts them without upcasting
+    _worker_frame = StockFrame.from_arrays(arrays=arrays, compact=np.dtype(layout['close'][1]) == np.float32)
+
+def _run_combination(setup: Dict[str, Any], quantity: int, commission: float) -> Dict[str, float]:
+    # Register the indicators on an empty frame, the Backtest computes them on the shared one
+    indicators = Indicators(price_data_frame=StockFrame(data=[]))
+    indicators.apply_setup(setup=setup)
+
+    results = Backtest(stock_frame=_worker_frame, indicators=indicators, quantity=quantity, commission=commission).run()
+
+    return {
+        'profit_loss': float(results['profit_loss'].sum()),
+        'max_drawdown': float(results['max_drawdown'].max()) if len(results) else 0.0,
+        'trades': int(results['trades'].sum()),
+        'exposure': float(results['exposure'].mean()) if len(results) else 0.0,
+        'profitable_symbols': int((results['profit_loss'] > 0).sum())
+    }
+
+class ParameterSweep():
+    def __init__(self, stock_frame: StockFrame, indicators: Indicators, indicator_grid: Optional[Dict[str, Dict[str, list]]] = None,
+                 signal_grid: Optional[Dict[str, Dict[str, list]]] = None, processes: Optional[int] = None, quantity: int = 1, commission: float = 0.0) -> None:
+        # The Indicators object is the template: its indicators and signals are
+        # used as they are, except for the arguments the grids override.
+        #   indicator_grid = {'sma': {'period': [50, 100, 200]}}
+        #   signal_grid = {'rsi': {'buy': [30.0, 40.0], 'sell': [70.0, 80.0]}}
+        self.stock_frame = stock_frame
+        self.indicators = indicators
+        self.indicator_grid = indicator_grid or {}
+        self.signal_grid = signal_grid or {}
+        self.processes = processes or os.cpu_count()
+        self.quantity = quantity
+        self.commission = commission
+
+    def combinations(self) -> List[Dict[str, Any]]:
+        keys = []
+        choices = []
+        for section, grid in (('indicators', self.indicator_grid), ('signals', self.signal_grid)):
+            for name, arguments in grid.items():
+                for argument, values in arguments.items():
+                    keys.append((section, name, argument))
+                    choices.append(values)
+
+        combinations = []
+        for values in itertools.product(*choices):
+            params = dict(zip(keys, values))
+
+            setup_indicators = []
+            for column_name, indicator in self.indicators.current_indicators.items():
+                method_args = dict(indicator['args'])
+                for (section, name, argument), value in params.items():
+                    if section == 'indicators' and name == column_name:
+                        method_args[argument] = value
+                setup_indicators.append((indicator['func'].__name__, method_args))
+
+            setup_signals = {}
+            for name, signal in self.indicators.get_indicator_signals(indicator=None).items():
+                setup_signals[name] = dict(signal)
+                for (section, signal_name, argument), value in params.items():
+                    if section == 'signals' and signal_name == name:
+                        setup_signals[name][argument] = value
+
+            combinations.append({
+                'params': {'{}.{}'.format(name, argument): value for (_, name, argument), value in params.items()},
+                'indicators': setup_indicators,
+                'signals': setup_signals
+            })
+
+        return combinations
+
+    def _share_columns(self) -> Tuple[List[shared_memory.SharedMemory], Dict[str, Tuple[str, str, int]], List[str], List[int]]:
+        # Copy the price columns into shared memory once, workers map them instead of unpickling.
+        # They keep the store's dtypes, a compact frame's float32 prices stay float32.
+        store = self.stock_frame.store
+        symbols, offsets = store.offsets()
+        total = int(offsets[-1])
+
+        blocks = []
+        layout = {}
+        columns = {'datetime': np.int64, **{name: store.dtypes[name] for name in PRICE_COLUMNS}}
+
+        for name, dtype in columns.items():
+            dtype = np.dtype(dtype)
+            block = shared_memory.SharedMemory(create=True, size=max(1, total * dtype.itemsize))
+            shared = np.ndarray((total,), dtype=dtype, buffer=block.buf)
+
+            for symbol, start, end in zip(symbols, offsets[:-1], offsets[1:]):
+                shared[start:end] = store.timestamps(symbol) if name == 'datetime' else store.column(symbol, name)
+
+            blocks.append(block)
+            layout[name] = (block.name, dtype.str, total)
+
+        return blocks, layout, symbols, offsets.tolist()
+
+    def run(self, sort_by: str = 'profit_loss') -> pd.DataFrame:
+        """Backtest every combination of the grids across a process pool, best first."""
+
+        combinations = self.combinations()
+        blocks, layout, symbols, offsets = self._share_columns()
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_attach_worker, initargs=(layout, symbols, offsets)) as executor:
+                results = list(executor.map(
+                    _run_combination,
+                    combinations,
+                    itertools.repeat(self.quantity),
+                    itertools.repeat(self.commission)
+                ))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        rows = [{**combination['params'], **result} for combination, result in zip(combinations, results)]
+        ranked = pd.DataFrame(rows).sort_values(by=sort_by, ascending=False, ignore_index=True)
+        ranked.index.name = 'rank'
+        return ranked
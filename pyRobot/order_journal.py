@@ -0,0 +1,224 @@
+import os
+import json
+import bisect
+import time as time
+import pathlib
+
+from typing import List, Dict, Iterator, Optional
+
+def _default(obj):
+    if isinstance(obj, bytes):
+        return str(obj)
+
+class OrderJournal():
+    # One JSON order per line. Appends only ever write at the end of the file,
+    # a torn last line (crash mid-write) is cut off when the journal is opened.
+    def __init__(self, path: Optional[pathlib.Path] = None, sync_every: int = 16, sync_interval: float = 1.0, compact_after: int = 10000) -> None:
+        if path is None:
+            path = pathlib.Path(__file__).parents[1].joinpath('data', 'orders.jsonl')
+
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.sync_every = sync_every            # fsync after this many unsynced orders
+        self.sync_interval = sync_interval      # or once this many seconds went by
+        self.compact_after = compact_after      # superseded lines tolerated before rewriting
+
+        self._index: Dict[str, int] = {}        # order id -> offset of its latest line
+        self._symbols: Dict[str, Dict[str, int]] = {}   # symbol -> order id -> offset of a line with that symbol
+        self._timestamps: List[str] = []        # timestamp of every stamped line, appended in time order
+        self._stamped: List[tuple] = []         # (offset, order id) of those lines
+        self._lines = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        self._import_legacy()
+        self._repair_tail()
+        self._build_index()
+        self._file = open(self.path, mode='ab')
+
+    def _import_legacy(self) -> None:
+        # Carry over the orders saved by the old read-modify-write orders.json
+        legacy_path = self.path.with_name('orders.json')
+        if self.path.exists() or not legacy_path.exists():
+            return
+
+        with open(legacy_path, 'r') as order_json:
+            orders_list = json.load(order_json)
+
+        with open(self.path, mode='wb') as journal:
+            for order in orders_list:
+                journal.write(self._encode(order))
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def _repair_tail(self) -> None:
+        # Cut off a line that was only half written, otherwise the next append would be glued onto it
+        if not self.path.exists():
+            return
+
+        with open(self.path, mode='rb+') as journal:
+            journal.seek(0, os.SEEK_END)
+            size = journal.tell()
+            end = size
+
+            while end > 0:
+                journal.seek(max(0, end - 4096))
+                chunk = journal.read(end - max(0, end - 4096))
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    end = max(0, end - 4096) + newline + 1
+                    break
+                end = max(0, end - 4096)
+
+            if end != size:
+                journal.truncate(end)
+
+    def _encode(self, order: dict) -> bytes:
+        return (json.dumps(order, default=_default, separators=(',', ':')) + '\n').encode('utf-8')
+
+    def _scan(self) -> Iterator[tuple]:
+        if not self.path.exists():
+            return
+
+        with open(self.path, mode='rb') as journal:
+            offset = 0
+            for line in journal:
+                start = offset
+                offset += len(line)
+                try:
+                    yield start, json.loads(line)
+                except ValueError:
+                    continue
+
+    def _build_index(self) -> None:
+        self._index = {}
+        self._symbols = {}
+        self._timestamps = []
+        self._stamped = []
+        self._lines = 0
+        for offset, order in self._scan():
+            self._lines += 1
+            self._track(order_id=str(order.get('order_id', self._lines)), offset=offset, order=order)
+
+    def _track(self, order_id: str, offset: int, order: dict) -> None:
+        # A line only counts while it's still the latest of its order, find checks that against _index
+        self._index[order_id] = offset
+
+        for leg in order.get('request_body', {}).get('orderLegCollection', []):
+            symbol = leg.get('instrument', {}).get('symbol')
+            if symbol:
+                self._symbols.setdefault(symbol, {})[order_id] = offset
+
+        timestamp = order.get('timestamp')
+        if timestamp:
+            self._timestamps.append(timestamp)
+            self._stamped.append((offset, order_id))
+
+    def append(self, orders: List[dict]) -> None:
+        # Closed at shutdown, a late order still gets written
+        if self._file.closed:
+            self._file = open(self.path, mode='ab')
+
+        for order in orders:
+            offset = self._file.tell()
+            self._file.write(self._encode(order))
+            self._track(order_id=str(order.get('order_id', self._lines + 1)), offset=offset, order=order)
+            self._lines += 1
+            self._unsynced += 1
+
+        self._file.flush()
+
+        # Batch the fsyncs, they cost far more than the writes themselves
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+        if self._lines - len(self._index) > self.compact_after:
+            self.compact()
+
+    def sync(self) -> None:
+        if self._unsynced and not self._file.closed:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def compact(self) -> None:
+        # Rewrite the journal keeping only the latest line of every order, then swap it in
+        self.sync()
+        temp_path = self.path.with_suffix('.jsonl.tmp')
+
+        with open(temp_path, mode='wb') as journal:
+            for order in self:
+                journal.write(self._encode(order))
+            journal.flush()
+            os.fsync(journal.fileno())
+
+        self._file.close()
+        os.replace(temp_path, self.path)
+        self._build_index()
+        self._file = open(self.path, mode='ab')
+
+    def get(self, order_id: str) -> Optional[dict]:
+        offset = self._index.get(str(order_id))
+        if offset is None:
+            return None
+
+        if not self._file.closed:
+            self._file.flush()
+        with open(self.path, mode='rb') as journal:
+            journal.seek(offset)
+            return json.loads(journal.readline())
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[dict]:
+        # Latest version of every order, in the order they were last written
+        if not self._file.closed:
+            self._file.flush()
+        latest = set(self._index.values())
+        for offset, order in self._scan():
+            if offset in latest:
+                yield order
+
+    def find(self, symbol: Optional[str] = None, since: Optional[str] = None) -> List[dict]:
+        # Narrow down the lines with the indexes, only the matching orders are read
+        if not symbol and not since:
+            return list(self)
+
+        offsets = None
+        if symbol:
+            offsets = {
+                offset for order_id, offset in self._symbols.get(symbol, {}).items()
+                if self._index.get(order_id) == offset
+            }
+
+        if since:
+            first = bisect.bisect_left(self._timestamps, since)
+            recent = {offset for offset, order_id in self._stamped[first:] if self._index.get(order_id) == offset}
+            offsets = recent if offsets is None else offsets & recent
+
+        if not self._file.closed:
+            self._file.flush()
+
+        orders = []
+        with open(self.path, mode='rb') as journal:
+            for offset in sorted(offsets):
+                journal.seek(offset)
+                orders.append(json.loads(journal.readline()))
+        return orders
+
+    def close(self) -> None:
+        # Sync whatever the batching held back, safe to call more than once
+        if self._file.closed:
+            return
+
+        self._file.flush()
+        self.sync()
+        self._file.close()
+
+    def __enter__(self) -> 'OrderJournal':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
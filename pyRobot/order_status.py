@@ -1,4 +1,3 @@
-from pyRobot.trades import Trade
 from td.client import TDClient
 
 class OrderStatus():
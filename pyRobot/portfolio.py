@@ -1,33 +1,109 @@
-from typing import List, Dict, Union, Optional, Tuple
+import numpy as np
+
+from collections.abc import Mapping
+from typing import List, Dict, Union, Optional, Tuple, Iterator
 from td.client import TDClient
 from pyRobot.stock_frame import StockFrame
 
+class Positions(Mapping):
+    # Read only dict view of the portfolio's positions, one dict per symbol built on access
+    def __init__(self, portfolio: 'Portfolio') -> None:
+        self._portfolio = portfolio
+
+    def __getitem__(self, symbol: str) -> dict:
+        return self._portfolio._position(symbol=symbol)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._portfolio._index)
+
+    def __len__(self) -> int:
+        return len(self._portfolio._index)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
 class Portfolio():
+    # Positions live in a columnar table: a row per symbol with its quantity,
+    # cost basis (purchase price per share) and last price, so valuing and
+    # marking the whole book to market are single array operations.
     def __init__(self, account_number: Optional[str]):
         self.account_number = account_number
-        self.positions = {}
         self.positions_count = 0
         self.market_value = 0.0
         self.profit_loss = 0.0
         self.risk_tolerance = 0.0
-        
+
+        self._index: Dict[str, int] = {}                # symbol -> row
+        self._symbols: List[str] = []
+        self._details: List[dict] = []                  # purchase date and ownership status per row
+        self._asset_types: Dict[str, int] = {}          # asset type -> code
+        self._quantity = np.zeros(64)
+        self._cost_basis = np.zeros(64)
+        self._last_price = np.full(64, np.nan)
+        self._asset_codes = np.zeros(64, dtype=np.int64)
+
+        # Rows of the StockFrame's latest closes for our rows, rebuilt when either side changes
+        self._gather: Optional[np.ndarray] = None
+        self._gather_key: Optional[Tuple[int, int]] = None
+
         self._td_client: TDClient = None
         self._stock_frame: StockFrame = None
         self._historical_prices = []
 
+    @property
+    def positions(self) -> Positions:
+        return Positions(portfolio=self)
+
+    @property
+    def symbols(self) -> List[str]:
+        return self._symbols
+
+    def _position(self, symbol: str) -> dict:
+        row = self._index[symbol]
+        position = {
+            'symbol': symbol,
+            'quantity': self._quantity[row].item(),
+            'purchase_price': self._cost_basis[row].item(),
+            'purchase_date': self._details[row]['purchase_date'],
+            'asset_type': self._details[row]['asset_type']
+        }
+        if 'ownership_status' in self._details[row]:
+            position['ownership_status'] = self._details[row]['ownership_status']
+        return position
+
+    def _reserve(self, size: int) -> None:
+        if size <= len(self._quantity):
+            return
+
+        capacity = max(size, 2 * len(self._quantity))
+        for name, fill in [('_quantity', 0.0), ('_cost_basis', 0.0), ('_last_price', np.nan), ('_asset_codes', 0)]:
+            array = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
     # to add one position
-    def add_position(self, symbol: str, asset_type: str, purchase_date: Optional[str], quantity: int = 0, purchase_price: float = 0.0) -> dict:
-        self.positions[symbol] = {}
-        self.positions[symbol]['symbol'] = symbol
-        self.positions[symbol]['quantity'] = quantity
-        self.positions[symbol]['purchase_price'] = purchase_price
-        self.positions[symbol]['purchase_date'] = purchase_date
-        self.positions[symbol]['asset_type'] = asset_type
+    def add_position(self, symbol: str, asset_type: str, purchase_date: Optional[str], quantity: int = 0, purchase_price: float = 0.0) -> Positions:
+        row = self._index.get(symbol)
+        if row is None:
+            row = len(self._symbols)
+            self._reserve(size=row + 1)
+            self._index[symbol] = row
+            self._symbols.append(symbol)
+            self._details.append({})
+            self._last_price[row] = np.nan
+            self._gather = None
+
+        self._quantity[row] = quantity
+        self._cost_basis[row] = purchase_price
+        self._asset_codes[row] = self._asset_types.setdefault(asset_type, len(self._asset_types))
+        self._details[row] = {'purchase_date': purchase_date, 'asset_type': asset_type}
+        self.positions_count = len(self._symbols)
 
         return self.positions
-    
+
     # to add multiple positions
-    def add_positions(self, positions: List[dict]) -> dict:
+    def add_positions(self, positions: List[dict]) -> Positions:
         if isinstance(positions, list):
             for position in positions:
                 self.add_position(
@@ -35,26 +111,40 @@ class Portfolio():
                     asset_type = position['asset_type'],
                     purchase_date = position.get('purchase_date', None),
                     purchase_price = position.get('purchase_price', 0.0),
-                    quantity = position.get('quantity', 0) 
+                    quantity = position.get('quantity', 0)
                 )
-                return self.positions
+            return self.positions
         else:
             raise TypeError("Positions must be a list of dictionary")
-    
+
     def remove_position(self, symbol: str) -> Tuple[bool, str]:
-        if symbol in self.positions:
-            del self.positions[symbol]
-            return (True, "{Symbol} was successfully removed.".format(symbol=symbol))
+        if symbol in self._index:
+            # Move the last row into the freed one, the table stays dense
+            row = self._index.pop(symbol)
+            last = len(self._symbols) - 1
+            if row != last:
+                moved = self._symbols[last]
+                self._index[moved] = row
+                self._symbols[row] = moved
+                self._details[row] = self._details[last]
+                for array in (self._quantity, self._cost_basis, self._last_price, self._asset_codes):
+                    array[row] = array[last]
+
+            self._symbols.pop()
+            self._details.pop()
+            self._gather = None
+            self.positions_count = len(self._symbols)
+            return (True, "{symbol} was successfully removed.".format(symbol=symbol))
         else:
-            return (False, "{Symbol} did not exist in the portfolio.".format(symbol=symbol))
+            return (False, "{symbol} did not exist in the portfolio.".format(symbol=symbol))
 
 
     def in_portfolio(self, symbol: str) -> bool:
-        return True if symbol in self.positions else False
-    
+        return True if symbol in self._index else False
+
     def is_profitable(self, symbol: str, current_price: float) -> bool:
         "get the pruchase price"
-        purchase_price = self.positions[symbol]['purchase_price']
+        purchase_price = self._cost_basis[self._index[symbol]]
         return True if purchase_price <= current_price else False
 
     @property
@@ -68,24 +158,112 @@ class Portfolio():
     @property
     def historical_prices(self) -> List[dict]:
         return self._historical_prices
-    
+
+    @historical_prices.setter
+    def historical_prices(self, historical_prices: List[dict]) -> None:
+        self._historical_prices = historical_prices
+
     @property
     def stock_frame(self) -> StockFrame:
         return self._stock_frame
 
+    @stock_frame.setter
+    def stock_frame(self, stock_frame: StockFrame) -> None:
+        self._stock_frame = stock_frame
+        self._gather = None
+
     def set_ownership_status(self, symbol: str, ownership: bool) -> None:
         if self.in_portfolio(symbol=symbol):
-            self.positions[symbol]['ownership_status'] = ownership
+            self._details[self._index[symbol]]['ownership_status'] = ownership
         else:
             raise KeyError(
                 "Can't set ownership status, as you do not have the symbol in your portfolio."
             )
-    
-    def total_allocation(self):
-        pass
-
-    def risk_exposure(self):
-        pass
-    
-    def total_market_value(self):
-        pass
\ No newline at end of file
+
+    def update_prices(self, prices: Dict[str, float]) -> None:
+        # E.g. from get_quotes, for symbols the StockFrame doesn't hold
+        for symbol, price in prices.items():
+            if symbol in self._index:
+                self._last_price[self._index[symbol]] = price
+
+    def mark_to_market(self, stock_frame: Optional[StockFrame] = None) -> float:
+        """Take every position's last price from the StockFrame's newest closes, returns the market value."""
+
+        stock_frame = stock_frame if stock_frame is not None else self._stock_frame
+        if stock_frame is None:
+            raise ValueError("No StockFrame to mark the portfolio against.")
+
+        slots, closes = stock_frame.latest_closes()
+        count = len(self._symbols)
+
+        # The gather index only changes with our positions or the frame's symbols
+        gather_key = (id(stock_frame), len(slots))
+        if self._gather is None or self._gather_key != gather_key:
+            self._gather = np.array([slots.get(symbol, -1) for symbol in self._symbols], dtype=np.int64)
+            self._gather_key = gather_key
+
+        if len(closes):
+            latest = closes[np.maximum(self._gather, 0)]
+            np.copyto(self._last_price[:count], latest, where=(self._gather >= 0) & ~np.isnan(latest))
+
+        return self.revalue()
+
+    def revalue(self) -> float:
+        # Profit and loss and market value at the last prices we have
+        self.profit_loss = float(self.unrealized_profit_loss().sum())
+        return self.total_market_value()
+
+    def _prices(self) -> np.ndarray:
+        # Positions without a price yet are valued at cost
+        count = len(self._symbols)
+        prices = self._last_price[:count]
+        return np.where(np.isnan(prices), self._cost_basis[:count], prices)
+
+    def market_values(self) -> np.ndarray:
+        """Market value per position, in the order of symbols."""
+
+        return self._quantity[:len(self._symbols)] * self._prices()
+
+    def unrealized_profit_loss(self) -> np.ndarray:
+        count = len(self._symbols)
+        return self._quantity[:count] * (self._prices() - self._cost_basis[:count])
+
+    def allocation_weights(self) -> np.ndarray:
+        """Each position's share of the gross market value (short positions count negative)."""
+
+        values = self.market_values()
+        gross = np.abs(values).sum()
+        return values / gross if gross else np.zeros_like(values)
+
+    def total_allocation(self) -> Dict[str, float]:
+        """Share of the gross market value per asset type."""
+
+        values = np.abs(self.market_values())
+        gross = values.sum()
+        totals = np.bincount(self._asset_codes[:len(self._symbols)], weights=values, minlength=len(self._asset_types))
+
+        return {
+            asset_type: float(totals[code] / gross) if gross else 0.0
+            for asset_type, code in self._asset_types.items()
+        }
+
+    def risk_exposure(self) -> Dict[str, float]:
+        """Long, short, gross and net exposure, and the largest single position's weight."""
+
+        values = self.market_values()
+        long_exposure = float(values[values > 0].sum())
+        short_exposure = float(-values[values < 0].sum())
+        gross = long_exposure + short_exposure
+
+        return {
+            'long': long_exposure,
+            'short': short_exposure,
+            'gross': gross,
+            'net': long_exposure - short_exposure,
+            'net_fraction': (long_exposure - short_exposure) / gross if gross else 0.0,
+            'largest_weight': float(np.abs(values).max() / gross) if gross else 0.0
+        }
+
+    def total_market_value(self) -> float:
+        self.market_value = float(self.market_values().sum())
+        return self.market_value
@@ -1,28 +1,60 @@
+import numpy as np
 import pandas as pd
 from td.client import TDClient
 from td.utils import milliseconds_since_epoch
 
 from datetime import datetime, time, timezone, timedelta
 import time as time
-import pathlib
-import json
+import asyncio
+import statistics
+import sys
 
-from typing import List, Dict, Union, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Union, Optional, AsyncIterator
 from pyRobot.portfolio import Portfolio
 from pyRobot.stock_frame import StockFrame
 from pyRobot.trades import Trade
+from pyRobot.fetcher import PriceFetcher
+from pyRobot.indicators import Indicators
+from pyRobot.bar_cache import BarCache
+from pyRobot.order_journal import OrderJournal
+from pyRobot.bar_aggregator import BarAggregator
+from pyRobot.metrics import Metrics
+from pyRobot.market_calendar import MarketCalendar
+from pyRobot.sharding import ShardPool
+from pyRobot.shared_frame import SharedFramePublisher
+
+def _candles_size(candles: List[dict]) -> int:
+    # Estimated from the first candle, they all carry the same keys
+    if not candles:
+        return 0
+    first = candles[0]
+    per_candle = sys.getsizeof(first) + sum(sys.getsizeof(value) for value in first.values())
+    return sys.getsizeof(candles) + len(candles) * per_candle
 
 class PyRobot():
-    def __init__(self, client_id: str, redirect_uri: str, credentials_path: str = None, trading_account: str = None, paper_trading: bool = True) -> None:
+    def __init__(self, client_id: str, redirect_uri: str, credentials_path: str = None, trading_account: str = None, paper_trading: bool = True, session: Optional[TDClient] = None, compact: bool = False) -> None:
         self.trading_account: str = trading_account     
         self.client_id: str = client_id
         self.credentials_path: str = credentials_path
         self.redirect_uri: str = redirect_uri
-        self.session: TDClient = self._create_session()     # called from different function (private)
+        # Any object with TDClient's get_price_history/get_quotes/place_order works (e.g. FakeSession)
+        self.session: TDClient = session if session is not None else self._create_session()
+        self.metrics: Metrics = Metrics()
+        self.fetcher: PriceFetcher = PriceFetcher(session=self.session, metrics=self.metrics)
         self.trades: dict = {}
         self.historical_prices: dict = {}
         self.stock_frame = None
+        self.portfolio: Portfolio = None
         self.paper_trading = paper_trading
+        self.compact = compact                          # compact StockFrames, raw candles dropped once ingested
+        self.bar_latencies: List[float] = []
+        self.order_journal: OrderJournal = None
+        self.calendar: MarketCalendar = MarketCalendar()
+        self.shards: ShardPool = None
+        self.shared_frame: SharedFramePublisher = None
+        self._bar_size = 1
+        self._bar_type = 'minute'
 
 
     def _create_session(self) -> TDClient:
@@ -38,30 +70,18 @@ class PyRobot():
         td_client.login()
         return td_client
     
-    # is the market open or not (check for weekends/holidies/closed day) (this is US market)
+    # is the market open or not, weekends, holidays and early closes included (this is US market)
     @property
     def pre_market_open(self) -> bool:
-        pre_market_start_time = datetime.utcnow().replace(hour=12, minute=00, second=00).timestamp()  # current local date and time in tzinfo (returns float)
-        market_start_time = datetime.utcnow().replace(hour=13, minute=30, second=00).timestamp()
-        now = datetime.utcnow().timestamp()
-
-        return True if market_start_time >= now >= pre_market_start_time else False 
+        return self.calendar.is_open(timestamp=time.time(), session='pre')
 
     @property
     def post_market_open(self) -> bool:
-        post_market_end_time = datetime.utcnow().replace(hour=22, minute=30, second=00).timestamp()  # current local date and time in tzinfo (returns float)
-        market_end_time = datetime.utcnow().replace(hour=20, minute=00, second=00).timestamp()
-        now = datetime.utcnow().timestamp()
-
-        return True if post_market_end_time >= now >= market_end_time else False
+        return self.calendar.is_open(timestamp=time.time(), session='post')
 
     @property
     def regular_market_open(self) -> bool:
-        market_start_time = datetime.utcnow().replace(hour=13, minute=30, second=00).timestamp()  # current local date and time in tzinfo (returns float)
-        market_end_time = datetime.utcnow().replace(hour=20, minute=00, second=00).timestamp()
-        now = datetime.utcnow().timestamp()
-
-        return True if market_end_time >= now >= market_start_time else False
+        return self.calendar.is_open(timestamp=time.time(), session='regular')
     
     
     def create_portfolio(self):
@@ -90,7 +110,16 @@ class PyRobot():
         return trade
 
     def create_stock_frame(self, data: List[dict]) -> StockFrame:
-        self.stock_frame = StockFrame(data=data)
+        self.stock_frame = StockFrame(data=data, compact=self.compact)
+        if self.portfolio is not None:
+            self.portfolio.stock_frame = self.stock_frame
+
+        # The StockFrame holds the bars now, the candle dicts take several times the memory
+        if self.compact:
+            self.historical_prices = {}
+            if self.portfolio is not None:
+                self.portfolio.historical_prices = []
+
         return self.stock_frame
 
     def grab_current_quotes(self) -> dict:
@@ -98,7 +127,9 @@ class PyRobot():
         symbols = self.portfolio.positions.keys()
 
         # Grab the quotes
-        quotes = self.session.get_quotes(instruments=list(symbols))
+        self.metrics.increment('get_quotes.calls')
+        with self.metrics.stage('get_quotes'):
+            quotes = self.session.get_quotes(instruments=list(symbols))
         return quotes
 
     def grab_historical_prices(self, start: datetime, end: datetime, bar_size: int = 1, bar_type: str = 'minute', symbols: Optional[List[str]] = None) -> List[Dict]:
@@ -113,16 +144,13 @@ class PyRobot():
         if not symbols:                         # if no symbols passed, then assume need historical prices of all symbols portfolio
             symbols= self.portfolio.positions
 
+        responses = self._fetch_price_history(symbols=symbols, start=start, end=end)
+
         for symbol in symbols:
-            historical_price_response = self.session.get_price_history(
-                symbol=symbol,
-                period_type='day',
-                start_date=start,
-                end_date=end,
-                frequency_type=bar_type,
-                frequency=bar_size,
-                extended_hours=True
-            )
+            if symbol not in responses:
+                continue
+
+            historical_price_response = responses[symbol]
 
             self.historical_prices[symbol] = {}
             self.historical_prices[symbol]['candles'] = historical_price_response['candles']
@@ -142,9 +170,6 @@ class PyRobot():
         return self.historical_prices
     
     def get_latest_bar(self) -> List[dict]:
-        bar_size = self._bar_size
-        bar_type = self._bar_type
-
         # Define our date range
         end_date = datetime.now()
         start_date = end_date - timedelta(minutes=15)               # 15 mins worth of data (should prob do 5 (15 too much maybe))
@@ -154,29 +179,11 @@ class PyRobot():
 
         latest_prices = []
 
-        for symbol in self.portfolio.positions:
-            historical_price_response = self.session.get_price_history(
-                symbol=symbol,
-                period_type='day',
-                start_date=start,
-                end_date=end,
-                frequency_type=bar_type,
-                frequency=bar_size,
-                extended_hours=True
-            )
-
-            if 'error' in historical_price_response:
-                time.sleep(2)       # sleep for 2 secs
-                historical_price_response = self.session.get_price_history(
-                    symbol=symbol,
-                    period_type='day',
-                    start_date=start,
-                    end_date=end,
-                    frequency_type=bar_type,
-                    frequency=bar_size,
-                    extended_hours=True
-                )
+        # Symbols that still fail after the retries are skipped for this bar
+        with self.metrics.stage('fetch'):
+            responses = self._fetch_price_history(symbols=self.portfolio.positions, start=start, end=end)
 
+        for symbol, historical_price_response in responses.items():
             for candle in historical_price_response['candles'][-1:]:
                 new_price_dict = {}
                 new_price_dict['symbol'] = symbol
@@ -189,21 +196,89 @@ class PyRobot():
                 latest_prices.append(new_price_dict)
 
         return latest_prices
-    
-    def wait_till_next_bar(self, last_bar_timestamp: pd.DatatimeIndex) -> None:
-        last_bar_time = last_bar_timestamp.to_pydatetime()[0].replace(tzinfo=timezone.utc)
-        next_bar_time = last_bar_time + timedelta(seconds=60)                               # everything is standardized to secs
-        curr_bar_time = datetime.now(tz=timezone.utc)
 
-        last_bar_timestamp = int(last_bar_time.timestamp())
-        next_bar_timestamp = int(next_bar_time.timestamp())
-        curr_bar_timestamp = int(curr_bar_time.timestamp())
+    def _price_history_request(self, symbol: str, start: str, end: str) -> dict:
+        return {
+            'symbol': symbol,
+            'period_type': 'day',
+            'start_date': start,
+            'end_date': end,
+            'frequency_type': self._bar_type,
+            'frequency': self._bar_size,
+            'extended_hours': True
+        }
+
+    def _fetch_price_history(self, symbols: List[str], start: str, end: str) -> Dict[str, dict]:
+        # Fire the requests concurrently, the fetcher handles rate limits and retries
+        requests = {
+            symbol: self._price_history_request(symbol=symbol, start=start, end=end)
+            for symbol in symbols
+        }
+
+        return self.fetcher.fetch(requests=requests)
+
+    def load_historical_prices(self, start: datetime, end: datetime, bar_size: int = 1, bar_type: str = 'minute', symbols: Optional[List[str]] = None, cache_folder: Optional[str] = None) -> StockFrame:
+        """Build the StockFrame from the on-disk bar cache, only fetching the ranges it is missing."""
+
+        self._bar_size = bar_size
+        self._bar_type = bar_type
+        cache = BarCache(folder=cache_folder, bar_type=bar_type, bar_size=bar_size)
+
+        start_ms = milliseconds_since_epoch(dt_object=start)
+        end_ms = milliseconds_since_epoch(dt_object=end)
+
+        if not symbols:
+            symbols = list(self.portfolio.positions)
+
+        # One request per symbol and missing range
+        requests = {}
+        for symbol in symbols:
+            for range_start, range_end in cache.missing_ranges(symbol=symbol, start=start_ms, end=end_ms):
+                requests[(symbol, range_start)] = self._price_history_request(
+                    symbol=symbol,
+                    start=str(range_start),
+                    end=str(range_end)
+                )
 
-        _time_to_wait_bar = next_bar_timestamp - last_bar_timestamp
-        time_to_wait_now = next_bar_timestamp - curr_bar_timestamp
+        responses = self.fetcher.fetch(requests=requests)
 
-        if time_to_wait_now < 0:
-            time_to_wait_now = 0
+        # Ranges that came back empty are recorded too, so they aren't asked for again
+        candles = {symbol: [] for symbol in symbols}
+        fetched = {symbol: [] for symbol in symbols}
+        for (symbol, range_start), response in responses.items():
+            candles[symbol].extend(response['candles'])
+            fetched[symbol].append((range_start, int(requests[(symbol, range_start)]['end_date'])))
+
+        # Write the new candles back, then map every symbol's history into the StockFrame
+        arrays = {}
+        for symbol in symbols:
+            symbol_arrays = cache.update(symbol=symbol, candles=candles[symbol], fetched=fetched[symbol])
+            if symbol_arrays is None:
+                continue
+
+            # Only keep the requested window, slicing a map doesn't copy it
+            first = np.searchsorted(symbol_arrays['datetime'], start_ms, side='left')
+            last = np.searchsorted(symbol_arrays['datetime'], end_ms, side='right')
+            arrays[symbol] = {name: values[first:last] for name, values in symbol_arrays.items()}
+
+        self.stock_frame = StockFrame.from_arrays(arrays=arrays, compact=self.compact)
+        if self.portfolio is not None:
+            self.portfolio.stock_frame = self.stock_frame
+        return self.stock_frame
+
+    def wait_till_next_bar(self, last_bar_timestamp: pd.DatetimeIndex) -> None:
+        # The bar holding last_bar_timestamp closes on the next boundary after it, nights,
+        # weekends and holidays are slept through in one go
+        last_bar_time = last_bar_timestamp.to_pydatetime()[0].replace(tzinfo=timezone.utc)
+        curr_bar_time = datetime.now(tz=timezone.utc)
+
+        next_bar_timestamp = self.calendar.next_bar_boundary(
+            timestamp=max(last_bar_time.timestamp(), curr_bar_time.timestamp()),
+            bar_size=self._bar_size,
+            bar_type=self._bar_type
+        )
+        next_bar_time = datetime.fromtimestamp(next_bar_timestamp, tz=timezone.utc)
+        time_to_wait_now = max(0.0, next_bar_timestamp - time.time())
 
         print("="*80)
         print("Pausing for the next bar")
@@ -214,13 +289,262 @@ class PyRobot():
         print("Next time: {time_next}".format(
             time_next=next_bar_time.strftime("%Y-%m-%d %H:%M:%S")
         ))
-        print("Sleep Time: {seconds}".format(seconds=time_to_wait_now))
+        print("Sleep Time: {seconds}".format(seconds=round(time_to_wait_now, 3)))
         print("-"*80)
         print("")
 
         time.sleep(time_to_wait_now)
 
     
+    @property
+    def bar_seconds(self) -> int:
+        bar_lengths = {'minute': 60, 'daily': 86400, 'weekly': 604800}
+        return bar_lengths.get(self._bar_type, 60) * self._bar_size
+
+    def create_shards(self, indicators: Indicators, shards: Optional[int] = None) -> ShardPool:
+        """Split the StockFrame's symbols and the indicators across worker processes.
+
+        From here on every bar is processed by the shards and the robot only
+        gathers their signals and places the orders. The robot's own StockFrame
+        is released, the shards hold the live bars.
+        """
+
+        self.shards = ShardPool(stock_frame=self.stock_frame, indicators=indicators, shards=shards)
+        self.stock_frame = None
+        if self.portfolio is not None:
+            self.portfolio.stock_frame = None
+        return self.shards
+
+    def share_stock_frame(self, name: str = 'pyrobot_frame') -> SharedFramePublisher:
+        """Publish the StockFrame to shared memory after every bar, for readers using attach_frame(name)."""
+
+        if self.stock_frame is None:
+            raise ValueError("No StockFrame to share, create one first (sharded robots hold none).")
+
+        self.shared_frame = SharedFramePublisher(stock_frame=self.stock_frame, name=name)
+        self.shared_frame.publish()
+        return self.shared_frame
+
+    def _publish_shared_frame(self) -> None:
+        with self.metrics.stage('publish_shared'):
+            self.shared_frame.publish()
+
+    def _process_bar(self, latest_bar: List[dict], indicators: Indicators) -> Dict[str, pd.Series]:
+        # Everything CPU bound for one bar, run off the event loop
+        if self.shards is not None:
+            return self._process_sharded_bar(latest_bar=latest_bar)
+
+        with self.metrics.stage('add_rows'):
+            self.stock_frame.add_rows(data=latest_bar)
+        if self.portfolio is not None and self.portfolio.positions_count:
+            with self.metrics.stage('mark_to_market'):
+                self.portfolio.mark_to_market(stock_frame=self.stock_frame)
+        with self.metrics.stage('refresh'):
+            indicators.refresh()
+        with self.metrics.stage('check_signals'):
+            return indicators.check_signals()
+
+    def _process_sharded_bar(self, latest_bar: List[dict]) -> Dict[str, pd.Series]:
+        with self.metrics.stage('shards'):
+            signals = self.shards.process_bar(latest_bar=latest_bar)
+
+        # No StockFrame here, the bar's closes mark the book
+        if self.portfolio is not None and self.portfolio.positions_count:
+            with self.metrics.stage('mark_to_market'):
+                self.portfolio.update_prices(prices={quote['symbol']: quote['close'] for quote in latest_bar})
+                self.portfolio.revalue()
+
+        return signals
+
+    def _execute_bar(self, signals: Dict[str, pd.Series], trades_to_execute: dict) -> List[dict]:
+        with self.metrics.stage('execute_signals'):
+            return self.execute_signals(signals=signals, trades_to_execute=trades_to_execute)
+
+    def _next_close(self, after: float) -> float:
+        return self.calendar.next_bar_boundary(timestamp=after, bar_size=self._bar_size, bar_type=self._bar_type)
+
+    async def _bar_producer(self, queue: asyncio.Queue, executor: ThreadPoolExecutor, max_bars: Optional[int], until_close: bool) -> None:
+        loop = asyncio.get_running_loop()
+        bar_seconds = self.bar_seconds
+        bars = 0
+
+        # The bar after the newest one we hold closes on the first boundary after the newest one's close
+        last_bar_start = self.stock_frame.last_timestamp / 1000 if self.stock_frame else 0
+        next_close = self._next_close(after=max(last_bar_start + bar_seconds, time.time()))
+
+        # Run through the session open now, or the next one when the market is closed
+        session_close = self.calendar.next_bar_boundary(timestamp=time.time(), bar_type='daily') if until_close else None
+
+        while max_bars is None or bars < max_bars:
+            if session_close is not None and next_close > session_close:
+                break
+
+            # Sleep on the event loop until the bar closes, then fetch it in the background
+            await asyncio.sleep(max(0.0, next_close - time.time()))
+            latest_bar = await loop.run_in_executor(executor, self.get_latest_bar)
+            await queue.put((next_close, latest_bar))
+
+            bars += 1
+
+            # Skip the boundaries we missed if the fetch took longer than a bar
+            next_close = self._next_close(after=max(next_close, time.time()))
+
+        await queue.put(None)
+
+    async def _tick_producer(self, queue: asyncio.Queue, ticks: AsyncIterator[dict], max_bars: Optional[int], until_close: bool, grace_milliseconds: int) -> None:
+        loop = asyncio.get_running_loop()
+        aggregator = BarAggregator(bar_milliseconds=self.bar_seconds * 1000, grace_milliseconds=grace_milliseconds)
+        tick_iterator = ticks.__aiter__()
+        next_tick = None
+        last_tick_received = loop.time()
+        bars = 0
+
+        while max_bars is None or bars < max_bars:
+            if until_close and not self.regular_market_open:
+                break
+
+            # Wait for a tick, but not past the next close, so a quiet symbol can't hold its bar back
+            if next_tick is None:
+                next_tick = asyncio.ensure_future(tick_iterator.__anext__())
+
+            due = aggregator.next_close()
+            timeout = None if due is None else max(0.0, (due - aggregator.clock) / 1000 - (loop.time() - last_tick_received))
+            await asyncio.wait({next_tick}, timeout=timeout)
+
+            if not next_tick.done():
+                # Tick time is assumed to run at wall clock speed since the last tick
+                finished = aggregator.close_bars(now=aggregator.clock + int((loop.time() - last_tick_received) * 1000))
+            else:
+                try:
+                    tick = next_tick.result()
+                except StopAsyncIteration:
+                    next_tick = None
+                    finished = aggregator.flush()
+                    if finished:
+                        await queue.put((time.time(), finished))
+                    break
+
+                next_tick = None
+                last_tick_received = loop.time()
+                finished = aggregator.add_tick(**tick)
+
+            # The bars of one period go into the StockFrame together, the bar close is when we saw it
+            if finished:
+                await queue.put((time.time(), finished))
+                bars += 1
+
+        if next_tick is not None:
+            next_tick.cancel()
+
+        await queue.put(None)
+
+    async def _bar_consumer(self, queue: asyncio.Queue, executor: ThreadPoolExecutor, indicators: Indicators, trades_to_execute: dict) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+
+            bar_close, latest_bar = item
+            signals = await loop.run_in_executor(executor, self._process_bar, latest_bar, indicators)
+            await loop.run_in_executor(executor, self._execute_bar, signals, trades_to_execute)
+
+            # Time from the bar closing to the orders going out
+            latency = time.time() - bar_close
+            self.bar_latencies.append(latency)
+            self.metrics.record(name='bar_close_to_orders', wall=latency)
+
+            # After the orders are out, readers and the metrics file never hold the loop up
+            if self.shared_frame is not None:
+                await loop.run_in_executor(executor, self._publish_shared_frame)
+            await loop.run_in_executor(executor, self.metrics.maybe_dump)
+
+            print("Bar {bar_time} processed, close to orders: {latency:.1f} ms".format(
+                bar_time=datetime.fromtimestamp(bar_close, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                latency=latency * 1000
+            ))
+
+    async def run(self, indicators: Indicators, trades_to_execute: dict, max_bars: Optional[int] = None, until_close: bool = False,
+                  ticks: Optional[AsyncIterator[dict]] = None, grace_milliseconds: int = 0) -> Dict[str, float]:
+        """Trade every bar until stopped, fetching the next bar while the last one is processed.
+
+        With ticks (e.g. replay_ticks or socket_ticks) the bars are built from the
+        tick stream instead of polling get_price_history after every close.
+        """
+
+        queue: asyncio.Queue = asyncio.Queue()
+
+        # One worker keeps the StockFrame single threaded, the other one does the network calls
+        compute_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bar_compute')
+        fetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='bar_fetch')
+
+        tasks = [
+            asyncio.ensure_future(
+                self._bar_producer(queue, fetch_executor, max_bars, until_close) if ticks is None
+                else self._tick_producer(queue, ticks, max_bars, until_close, grace_milliseconds)
+            ),
+            asyncio.ensure_future(self._bar_consumer(queue, compute_executor, indicators, trades_to_execute))
+        ]
+
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.result()
+        finally:
+            # Let a bar still being computed finish before its shards and shared memory go away
+            compute_executor.shutdown(wait=True)
+            fetch_executor.shutdown(wait=False)
+            self.metrics.dump()
+
+            # The journal batches its fsyncs, the orders of the last bars must reach the disk
+            if self.order_journal is not None:
+                self.order_journal.close()
+
+            # Worker processes, their pipes and the shared memory blocks don't outlive the run
+            if self.shards is not None:
+                self.shards.close()
+                self.shards = None
+            if self.shared_frame is not None:
+                self.shared_frame.close()
+                self.shared_frame = None
+
+        return self.latency_report()
+
+    def memory_report(self) -> Dict[str, Union[int, dict]]:
+        """Approximate bytes held by the StockFrame and the raw candle lists still around."""
+
+        candles = sum(
+            _candles_size(candles=prices['candles'])
+            for symbol, prices in self.historical_prices.items()
+            if symbol != 'aggregated'
+        )
+        aggregated = _candles_size(candles=self.historical_prices.get('aggregated', []))
+        portfolio = _candles_size(candles=self.portfolio.historical_prices) if self.portfolio is not None else 0
+        stock_frame = self.stock_frame.memory_report() if self.stock_frame is not None else {'total': 0}
+
+        return {
+            'stock_frame': stock_frame,
+            'historical_prices': candles + aggregated,
+            'portfolio_historical_prices': portfolio,
+            'total': stock_frame['total'] + candles + aggregated + portfolio
+        }
+
+    def latency_report(self) -> Dict[str, float]:
+        if not self.bar_latencies:
+            return {'bars': 0}
+
+        latencies = sorted(self.bar_latencies)
+        return {
+            'bars': len(latencies),
+            'mean': statistics.mean(latencies),
+            'p50': latencies[int(0.50 * (len(latencies) - 1))],
+            'p95': latencies[int(0.95 * (len(latencies) - 1))],
+            'max': latencies[-1]
+        }
+
     def execute_signals(self, signals: List[pd.Series], trades_to_execute: dict) -> List[dict]:        
         # Define the Buy and sells.
         buys: pd.Series = signals['buys']       # in reference had it signals[0][1] (caused errors...)
@@ -304,15 +628,18 @@ class PyRobot():
                     order_responses.append(order_response)
 
         # Save the response.
-        self.save_orders(order_response_dict=order_responses)
+        with self.metrics.stage('save_orders'):
+            self.save_orders(order_response_dict=order_responses)
         return order_responses
 
     def execute_orders(self, trade_obj: Trade) -> dict:
         # Execute the order. (calling the api)
-        order_dict = self.session.place_order(
-            account=self.trading_account,
-            order=trade_obj.order
-        )
+        self.metrics.increment('place_order.calls')
+        with self.metrics.stage('place_order'):
+            order_dict = self.session.place_order(
+                account=self.trading_account,
+                order=trade_obj.order
+            )
 
         # Store the order.
         trade_obj._order_response = order_dict
@@ -320,37 +647,10 @@ class PyRobot():
         trade_obj._process_order_response()
         return order_dict
     
-    def save_orders(self, order_response_dict: dict) -> bool:
-        def default(obj):
-            if isinstance(obj, bytes):
-                return str(obj)
-
-        # Define the folder.
-        folder: pathlib.PurePath = pathlib.Path(
-            __file__
-        ).parents[1].joinpath("data")
-
-        # See if it exist, if not create it.
-        if not folder.exists():
-            folder.mkdir()
-
-        # Define the file path.
-        file_path = folder.joinpath('orders.json')
-
-        # First check if the file alread exists.
-        if file_path.exists():
-            with open('data/orders.json', 'r') as order_json:
-                orders_list = json.load(order_json)
-        else:
-            orders_list = []
-
-        # Combine both lists.
-        orders_list = orders_list + order_response_dict
-
-        # Write the new data back.
-        with open(file='data/orders.json', mode='w+') as order_json:
-            json.dump(obj=orders_list, fp=order_json, indent=4, default=default)
+    def save_orders(self, order_response_dict: List[dict]) -> bool:
+        # Append to the order journal, it lives in the package's data folder whatever the working directory is
+        if self.order_journal is None:
+            self.order_journal = OrderJournal()
 
+        self.order_journal.append(orders=order_response_dict)
         return True
-
-    
\ No newline at end of file
@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import time as time
+import traceback
+import numpy as np
+import pandas as pd
+
+from multiprocessing.connection import Connection
+from typing import List, Dict, Any, Optional, Tuple
+
+from pyRobot.column_store import PRICE_COLUMNS
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+from pyRobot.bar_cache import BarSpill
+
+def _shard_worker(connection: Connection, arrays: Dict[str, Dict[str, np.ndarray]], setup: Dict[str, Any], retention: Optional[Tuple[Optional[int], Optional[int], Optional[BarSpill]]]) -> None:
+    # Owns its symbols' StockFrame and indicator state for the life of the pool,
+    # answering every batch of bars with the symbols that fired
+    try:
+        stock_frame = StockFrame.from_arrays(arrays=arrays)
+        if retention is not None:
+            max_bars, max_age_milliseconds, spill = retention
+            stock_frame.set_retention(max_bars=max_bars, max_age_milliseconds=max_age_milliseconds, spill=spill)
+
+        indicators = Indicators(price_data_frame=stock_frame)
+        indicators.apply_setup(setup=setup)
+        connection.send(('ready', None))
+    except Exception:
+        connection.send(('error', traceback.format_exc()))
+        return
+
+    while True:
+        message, payload = connection.recv()
+        if message == 'close':
+            break
+
+        try:
+            start = time.thread_time()
+            stock_frame.add_rows(data=payload)
+            indicators.refresh()
+            signals = indicators.check_signals()
+            connection.send(('signals', (
+                {side: hits.index.to_list() for side, hits in signals.items()},
+                time.thread_time() - start
+            )))
+        except Exception:
+            connection.send(('error', traceback.format_exc()))
+
+class ShardPool():
+    # Splits the symbols across worker processes, each running add_rows, the
+    # indicators and the signal check for its own slice, so the per bar work
+    # runs on as many cores as there are shards. The process that owns the pool
+    # (the robot) stays the only one with a session and places every order.
+    def __init__(self, stock_frame: StockFrame, indicators: Indicators, shards: Optional[int] = None) -> None:
+        self.shards = shards or os.cpu_count()
+        self.cpu_seconds: List[float] = [0.0] * self.shards   # time spent per shard, to spot an unbalanced split
+        self._setup = indicators.setup()
+        self._retention = None
+        if stock_frame._max_bars is not None or stock_frame._max_age is not None:
+            self._retention = (stock_frame._max_bars, stock_frame._max_age, stock_frame._spill)
+
+        # Round robin over the sorted symbols keeps the shards within one symbol of each other
+        store = stock_frame.store
+        self._assignment: Dict[str, int] = {symbol: number % self.shards for number, symbol in enumerate(store.symbols)}
+        self._counts = [0] * self.shards
+        for shard in self._assignment.values():
+            self._counts[shard] += 1
+
+        self._connections: List[Connection] = []
+        self._processes: List[multiprocessing.Process] = []
+
+        for shard in range(self.shards):
+            arrays = {
+                symbol: {
+                    'datetime': store.timestamps(symbol),
+                    **{name: store.column(symbol, name) for name in PRICE_COLUMNS}
+                }
+                for symbol, owner in self._assignment.items() if owner == shard
+            }
+            self._start(shard=shard, arrays=arrays)
+
+        # Seeding runs in every worker at once, wait for all of them
+        for connection in self._connections:
+            self._receive(connection=connection)
+
+    def _start(self, shard: int, arrays: Dict[str, Dict[str, np.ndarray]]) -> None:
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_shard_worker,
+            args=(child, arrays, self._setup, self._retention),
+            name='shard_{}'.format(shard),
+            daemon=True
+        )
+        process.start()
+        child.close()
+
+        self._connections.append(parent)
+        self._processes.append(process)
+
+    def _receive(self, connection: Connection) -> Any:
+        message, payload = connection.recv()
+        if message == 'error':
+            raise RuntimeError('Shard worker failed:\n{}'.format(payload))
+        return payload
+
+    def shard_of(self, symbol: str) -> int:
+        # Symbols first seen in a bar go to the shard with the fewest
+        if symbol not in self._assignment:
+            shard = self._counts.index(min(self._counts))
+            self._assignment[symbol] = shard
+            self._counts[shard] += 1
+        return self._assignment[symbol]
+
+    def process_bar(self, latest_bar: List[dict]) -> Dict[str, pd.Series]:
+        """Send every shard its bars, then gather the signals like check_signals returns them."""
+
+        batches: List[List[dict]] = [[] for _ in range(self.shards)]
+        for quote in latest_bar:
+            batches[self.shard_of(symbol=quote['symbol'])].append(quote)
+
+        # All shards get their bars before we wait on any, so they work in parallel
+        for connection, batch in zip(self._connections, batches):
+            connection.send(('bar', batch))
+
+        hits = {}
+        for shard, connection in enumerate(self._connections):
+            signals, cpu_seconds = self._receive(connection=connection)
+            self.cpu_seconds[shard] += cpu_seconds
+            for side, symbols in signals.items():
+                hits.setdefault(side, []).extend(symbols)
+
+        return {
+            side: pd.Series(data=True, index=pd.Index(sorted(symbols), name='symbol'), dtype=bool)
+            for side, symbols in hits.items()
+        }
+
+    def close(self) -> None:
+        for connection in self._connections:
+            try:
+                connection.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self) -> 'ShardPool':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
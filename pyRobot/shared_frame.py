@@ -0,0 +1,374 @@
+import json
+import sys
+import time as time
+import numpy as np
+import pandas as pd
+
+from multiprocessing import shared_memory, resource_tracker
+from typing import List, Dict, Optional, Tuple
+
+from pyRobot.column_store import ColumnStore
+from pyRobot.stock_frame import StockFrame
+
+MAGIC = b'PYROBOT1'
+FORMAT = 1
+SLOTS = 3
+
+# The header block readers attach to by name. The data is published into a
+# ring of slots; slot_version is 0 while a slot is being written, and the
+# newest complete snapshot is the one in slot version % SLOTS.
+HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('format', '<u4'),
+    ('slots', '<u4'),
+    ('version', '<u8'),
+    ('published', '<f8'),
+    ('slot_version', '<u8', (SLOTS,)),
+    ('slot_name', 'S64', (SLOTS,))
+])
+
+ALIGNMENT = 64
+
+# Blocks this process published, their tracker registration is the publisher's to keep
+_published = set()
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _release(block: shared_memory.SharedMemory) -> None:
+    # Snapshots may still have views on the block, then the mapping goes with the last of them
+    try:
+        block.close()
+    except BufferError:
+        pass
+
+def _create(name: str, size: int) -> shared_memory.SharedMemory:
+    # A run that crashed leaves its blocks behind, a new publisher takes the name over
+    try:
+        block = shared_memory.SharedMemory(name=name, create=True, size=size)
+    except FileExistsError:
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+        block = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    _published.add(name)
+    return block
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Attach without handing the block to this process' resource tracker, which
+    # would otherwise unlink the publisher's memory when a reader exits
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    block = shared_memory.SharedMemory(name=name)
+    if name not in _published:
+        resource_tracker.unregister(block._name, 'shared_memory')
+    return block
+
+class _Layout():
+    # Where everything sits in a data block: a JSON description, the row count
+    # per symbol, then one array per column with a fixed region per symbol
+    def __init__(self, symbols: List[str], columns: Dict[str, np.dtype], capacities: List[int]) -> None:
+        self.symbols = symbols
+        self.columns = columns
+        self.starts = np.concatenate(([0], np.cumsum(capacities, dtype=np.int64)))
+        self.index = {symbol: number for number, symbol in enumerate(symbols)}
+
+        total = int(self.starts[-1])
+        description = {
+            'symbols': symbols,
+            'starts': self.starts.tolist(),
+            'lengths': 0,
+            'columns': [[name, np.dtype(dtype).str, 0] for name, dtype in columns.items()]
+        }
+
+        # The arrays start after the description, with room for its offsets to grow to 20 digits
+        offset = _align(8 + len(json.dumps(description)) + 20 * (len(columns) + 1))
+        self.lengths_offset = description['lengths'] = offset
+        offset = _align(offset + 8 * len(symbols))
+
+        self.offsets: Dict[str, int] = {}
+        for column, (name, dtype) in zip(description['columns'], columns.items()):
+            self.offsets[name] = column[2] = offset
+            offset = _align(offset + total * np.dtype(dtype).itemsize)
+
+        self.description = json.dumps(description).encode('utf-8')
+        self.size = max(offset, ALIGNMENT)
+
+    @classmethod
+    def read(cls, buffer: memoryview) -> Tuple[dict, Dict[str, Tuple[np.dtype, int]]]:
+        size = int(np.frombuffer(buffer, dtype='<u8', count=1)[0])
+        description = json.loads(bytes(buffer[8:8 + size]).decode('utf-8'))
+        return description, {name: (np.dtype(dtype), offset) for name, dtype, offset in description['columns']}
+
+    def write_description(self, buffer: memoryview) -> None:
+        np.frombuffer(buffer, dtype='<u8', count=1)[0] = len(self.description)
+        buffer[8:8 + len(self.description)] = self.description
+
+class SharedFramePublisher():
+    # Publishes a StockFrame's columns (prices and indicators) into shared
+    # memory after every bar. Readers never lock anything, so the trading loop
+    # never waits on them; a slot is only written again SLOTS - 1 publishes
+    # later, and only the rows changed since it was last written get copied.
+    def __init__(self, stock_frame: StockFrame, name: str = 'pyrobot_frame', headroom: int = 1024) -> None:
+        self.stock_frame = stock_frame
+        self.name = name
+        self.headroom = headroom
+        self.version = 0
+
+        self._header_block = _create(name=name, size=HEADER.itemsize)
+        self._header = np.ndarray((), dtype=HEADER, buffer=self._header_block.buf)
+        self._header['magic'] = MAGIC
+        self._header['format'] = FORMAT
+        self._header['slots'] = SLOTS
+        self._header['version'] = 0
+
+        self._changes = stock_frame.track_changes()
+        self._layout: Optional[_Layout] = None
+        self._generation = 0
+        self._blocks: List[Optional[shared_memory.SharedMemory]] = [None] * SLOTS
+        self._block_generation = [-1] * SLOTS
+        self._pending: List[Dict[str, int]] = [{} for _ in range(SLOTS)]    # rows each slot is behind on
+
+    def _needs_layout(self, store: ColumnStore) -> bool:
+        layout = self._layout
+        if layout is None or list(layout.columns) != ['datetime'] + store.columns or len(layout.symbols) != len(store.symbols):
+            return True
+
+        # A symbol outgrew its region or a new one showed up
+        for symbol in self._changes:
+            number = layout.index.get(symbol)
+            if number is None or store.length(symbol) > layout.starts[number + 1] - layout.starts[number]:
+                return True
+        return False
+
+    def publish(self) -> int:
+        """Publish the rows changed since the last call, returns the new version."""
+
+        store = self.stock_frame.store
+
+        if self._needs_layout(store=store):
+            symbols = store.symbols
+            columns = {'datetime': np.dtype(np.int64), **store.dtypes}
+            self._layout = _Layout(symbols=symbols, columns=columns, capacities=[store.length(symbol) + self.headroom for symbol in symbols])
+            self._generation += 1
+
+        for pending in self._pending:
+            for symbol, row in self._changes.items():
+                pending[symbol] = min(row, pending.get(symbol, row))
+        self._changes.clear()
+
+        version = self.version + 1
+        slot = version % SLOTS
+        self._header['slot_version'][slot] = 0
+
+        if self._block_generation[slot] != self._generation:
+            self._new_block(slot=slot)
+            self._write(slot=slot, symbols={symbol: 0 for symbol in self._layout.symbols})
+        else:
+            self._write(slot=slot, symbols=self._pending[slot])
+        self._pending[slot] = {}
+
+        self._header['slot_version'][slot] = version
+        self._header['published'] = time.time()
+        self._header['version'] = version
+        self.version = version
+        return version
+
+    def _new_block(self, slot: int) -> None:
+        old_block = self._blocks[slot]
+        block_name = '{name}_{generation}_{slot}'.format(name=self.name, generation=self._generation, slot=slot)
+
+        block = _create(name=block_name, size=self._layout.size)
+        self._layout.write_description(buffer=block.buf)
+        self._blocks[slot] = block
+        self._block_generation[slot] = self._generation
+        self._header['slot_name'][slot] = block_name.encode('utf-8')
+
+        # Readers still holding the old block keep their mapping, the name just goes away
+        if old_block is not None:
+            old_block.close()
+            old_block.unlink()
+            _published.discard(old_block.name)
+
+    def _write(self, slot: int, symbols: Dict[str, int]) -> None:
+        layout = self._layout
+        buffer = self._blocks[slot].buf
+        store = self.stock_frame.store
+        total = int(layout.starts[-1])
+
+        lengths = np.ndarray((len(layout.symbols),), dtype=np.int64, buffer=buffer, offset=layout.lengths_offset)
+        arrays = {
+            name: np.ndarray((total,), dtype=dtype, buffer=buffer, offset=layout.offsets[name])
+            for name, dtype in layout.columns.items()
+        }
+
+        for symbol, first_row in symbols.items():
+            number = layout.index[symbol]
+            start = int(layout.starts[number])
+            length = store.length(symbol)
+            first_row = min(first_row, length)
+
+            arrays['datetime'][start + first_row:start + length] = store.timestamps(symbol)[first_row:]
+            for name in store.columns:
+                arrays[name][start + first_row:start + length] = store.column(symbol, name)[first_row:]
+            lengths[number] = length
+
+    def close(self) -> None:
+        if self._header_block is None:
+            return
+
+        self.stock_frame.untrack_changes(self._changes)
+        self._header = None
+        for block in self._blocks + [self._header_block]:
+            if block is not None:
+                block.close()
+                block.unlink()
+                _published.discard(block.name)
+        self._blocks = [None] * SLOTS
+        self._header_block = None
+
+class SharedSnapshot():
+    # One published version, the arrays are read only views straight into the
+    # shared memory. They hold still until the publisher comes back around to
+    # the slot (SLOTS - 1 publishes later), check valid or take a copy to keep them.
+    def __init__(self, reader: 'SharedFrameReader', version: int, slot: int, published: float, symbols: List[str],
+                 lengths: np.ndarray, starts: np.ndarray, arrays: Dict[str, np.ndarray]) -> None:
+        self.version = version
+        self.published = published
+        self.symbols = symbols
+        self._reader = reader
+        self._slot = slot
+        self._lengths = lengths
+        self._starts = starts
+        self._arrays = arrays
+        self._index = {symbol: number for number, symbol in enumerate(symbols)}
+
+    @property
+    def columns(self) -> List[str]:
+        return [name for name in self._arrays if name != 'datetime']
+
+    @property
+    def valid(self) -> bool:
+        # False once the publisher started writing over this slot
+        return self._reader._slot_version(self._slot) == self.version
+
+    def _rows(self, symbol: str) -> slice:
+        number = self._index[symbol]
+        start = int(self._starts[number])
+        return slice(start, start + int(self._lengths[number]))
+
+    def timestamps(self, symbol: str) -> np.ndarray:
+        return self._arrays['datetime'][self._rows(symbol)]
+
+    def column(self, symbol: str, name: str) -> np.ndarray:
+        return self._arrays[name][self._rows(symbol)]
+
+    def to_frame(self) -> pd.DataFrame:
+        """The snapshot as a StockFrame style DataFrame (a copy)."""
+
+        store = ColumnStore(columns={name: array.dtype for name, array in self._arrays.items() if name != 'datetime'})
+        for symbol in self.symbols:
+            store.adopt(
+                symbol=symbol,
+                timestamps=self.timestamps(symbol),
+                columns={name: self.column(symbol, name) for name in self.columns}
+            )
+        return store.to_frame()
+
+class SharedFrameReader():
+    # Read only access to a StockFrame published by another process
+    def __init__(self, name: str = 'pyrobot_frame') -> None:
+        self.name = name
+        self._header_block = _attach(name=name)
+        self._header = np.ndarray((), dtype=HEADER, buffer=self._header_block.buf)
+
+        if bytes(self._header['magic']) != MAGIC or int(self._header['format']) != FORMAT:
+            self.close()
+            raise ValueError('{name} is not a shared StockFrame of format {format}'.format(name=name, format=FORMAT))
+
+        self._blocks: Dict[str, Tuple[shared_memory.SharedMemory, dict, Dict[str, Tuple[np.dtype, int]]]] = {}
+
+    def _slot_version(self, slot: int) -> int:
+        return int(self._header['slot_version'][slot])
+
+    def _block(self, block_name: str) -> Tuple[shared_memory.SharedMemory, dict, Dict[str, Tuple[np.dtype, int]]]:
+        if block_name not in self._blocks:
+            # Blocks of older generations are gone from the publisher's side, let ours go too
+            for stale in [name for name in self._blocks if name.rsplit('_', 1)[0] != block_name.rsplit('_', 1)[0]]:
+                _release(block=self._blocks.pop(stale)[0])
+
+            block = _attach(name=block_name)
+            description, columns = _Layout.read(buffer=block.buf)
+            self._blocks[block_name] = (block, description, columns)
+        return self._blocks[block_name]
+
+    @property
+    def version(self) -> int:
+        return int(self._header['version'])
+
+    def snapshot(self, copy: bool = False, retries: int = 100) -> Optional[SharedSnapshot]:
+        """The newest complete version, None before the first publish.
+
+        With copy the arrays are copied out and checked to be from one version,
+        otherwise they are views that stay valid for SLOTS - 1 publishes.
+        """
+
+        for _ in range(retries):
+            version = self.version
+            if version == 0:
+                return None
+
+            slot = version % SLOTS
+            block_name = bytes(self._header['slot_name'][slot]).decode('utf-8')
+            if self._slot_version(slot) != version:
+                continue
+
+            try:
+                block, description, columns = self._block(block_name=block_name)
+            except FileNotFoundError:
+                # Replaced by a newer generation in between, try the newest again
+                continue
+
+            symbols = description['symbols']
+            starts = np.asarray(description['starts'], dtype=np.int64)
+            total = int(starts[-1])
+
+            lengths = np.ndarray((len(symbols),), dtype=np.int64, buffer=block.buf, offset=description['lengths']).copy()
+            arrays = {}
+            for name, (dtype, offset) in columns.items():
+                array = np.ndarray((total,), dtype=dtype, buffer=block.buf, offset=offset)
+                if copy:
+                    array = array.copy()
+                array.flags.writeable = False
+                arrays[name] = array
+
+            snapshot = SharedSnapshot(
+                reader=self,
+                version=version,
+                slot=slot,
+                published=float(self._header['published']),
+                symbols=symbols,
+                lengths=lengths,
+                starts=starts,
+                arrays=arrays
+            )
+
+            # The slot was not touched while we read it
+            if snapshot.valid:
+                return snapshot
+
+        raise TimeoutError('No consistent snapshot of {name} after {retries} tries'.format(name=self.name, retries=retries))
+
+    def close(self) -> None:
+        self._header = None
+        for block, _, _ in self._blocks.values():
+            _release(block=block)
+        self._blocks = {}
+        _release(block=self._header_block)
+
+def attach_frame(name: str = 'pyrobot_frame') -> SharedFrameReader:
+    """Attach to a StockFrame a robot publishes with SharedFramePublisher, read only."""
+
+    return SharedFrameReader(name=name)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from typing import List, Dict, Any, Tuple
+
+class SignalPlan():
+    # The registered signals compiled into index arrays, so every rule for every
+    # symbol is checked in a handful of NumPy operations over the latest values.
+    def __init__(self, columns: List[str], rules: Dict[str, List[Tuple[Any, int, int, float]]], how: str = 'any') -> None:
+        if how not in ('any', 'all'):
+            raise ValueError("how must be 'any' or 'all', got {how}".format(how=how))
+
+        self.columns = columns
+        self.how = how
+        self._rules = {
+            side: self._group_by_operator(side_rules) for side, side_rules in rules.items()
+        }
+
+        # The latest hits of every symbol checked so far, in the order they were first seen,
+        # so a check only needs to evaluate the symbols whose values changed since the last one
+        self._slots: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._hits: Dict[str, np.ndarray] = {side: np.zeros(0, dtype=bool) for side in self._rules}
+
+    @classmethod
+    def compile(cls, indicators: dict, indicators_key: List[str], indicators_comp_key: List[str], how: str = 'any') -> 'SignalPlan':
+        columns = []
+        rules = {'buys': [], 'sells': []}
+
+        def column_index(name: str) -> int:
+            if name not in columns:
+                columns.append(name)
+            return columns.index(name)
+
+        # Threshold signals, compare an indicator against a constant
+        for indicator in indicators_key:
+            signal = indicators[indicator]
+            column = column_index(indicator)
+            rules['buys'].append((signal['buy_operator'], column, -1, signal['buy']))
+            rules['sells'].append((signal['sell_operator'], column, -1, signal['sell']))
+
+        # Comparison signals, compare two indicators against each other
+        for key in indicators_comp_key:
+            signal = indicators[key]
+            column_1 = column_index(signal['indicator_1'])
+            column_2 = column_index(signal['indicator_2'])
+            rules['buys'].append((signal['buy_operator'], column_1, column_2, np.nan))
+            rules['sells'].append((signal['sell_operator'], column_1, column_2, np.nan))
+
+        return cls(columns=columns, rules=rules, how=how)
+
+    def _group_by_operator(self, rules: List[Tuple[Any, int, int, float]]) -> List[Tuple[Any, np.ndarray, np.ndarray, np.ndarray]]:
+        groups = {}
+        for condition, left, right, threshold in rules:
+            groups.setdefault(condition, []).append((left, right, threshold))
+
+        compiled = []
+        for condition, group in groups.items():
+            left, right, threshold = zip(*group)
+            compiled.append((
+                condition,
+                np.array(left, dtype=np.intp),
+                np.array(right, dtype=np.intp),
+                np.array(threshold, dtype=np.float64)
+            ))
+        return compiled
+
+    def evaluate(self, values: np.ndarray) -> Dict[str, np.ndarray]:
+        # values is a symbols x columns matrix, laid out like self.columns
+        signals = {}
+
+        for side, groups in self._rules.items():
+            hits = np.zeros(values.shape[0], dtype=bool) if self.how == 'any' else np.ones(values.shape[0], dtype=bool)
+
+            if not groups:
+                signals[side] = np.zeros(values.shape[0], dtype=bool)
+                continue
+
+            for condition, left, right, threshold in groups:
+                # Comparison rules read their right hand side from the matrix, thresholds from the constants
+                right_values = np.where(right >= 0, values[:, right], threshold)
+
+                with np.errstate(invalid='ignore'):
+                    matched = np.asarray(condition(values[:, left], right_values))
+
+                if self.how == 'any':
+                    hits |= matched.any(axis=1)
+                else:
+                    hits &= matched.all(axis=1)
+
+            signals[side] = hits
+
+        return signals
+
+    def update(self, symbols: List[str], values: np.ndarray) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """Evaluate the rows of these symbols and remember their hits.
+
+        Returns every symbol checked so far with its latest hits, the symbols
+        not passed in keep the hits from the check that last evaluated them.
+        """
+
+        for symbol in symbols:
+            if symbol not in self._slots:
+                self._slots[symbol] = len(self._symbols)
+                self._symbols.append(symbol)
+
+        rows = np.fromiter((self._slots[symbol] for symbol in symbols), dtype=np.intp, count=len(symbols))
+        for side, hits in self.evaluate(values=values).items():
+            if len(self._hits[side]) < len(self._symbols):
+                self._hits[side] = np.concatenate((self._hits[side], np.zeros(len(self._symbols) - len(self._hits[side]), dtype=bool)))
+            self._hits[side][rows] = hits
+
+        return self._symbols, self._hits
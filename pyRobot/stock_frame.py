@@ -5,112 +5,450 @@ from pandas.core.groupby import DataFrameGroupBy
 from pandas.core.window import RollingGroupby
 
 from datetime import time, datetime, timezone
-from typing import List, Dict, Union
+from typing import List, Dict, Union, Tuple, Optional
+
+from pyRobot.column_store import ColumnStore, PRICE_COLUMNS, COMPACT_PRICE_COLUMNS, compact_columns
+from pyRobot.signals import SignalPlan
+from pyRobot.bar_cache import BarSpill
+
+# Bar lengths in milliseconds for the named timeframes, any other length can be passed directly
+TIMEFRAMES = {
+    '5min': 300_000,
+    '15min': 900_000,
+    '30min': 1_800_000,
+    '1hour': 3_600_000,
+    'daily': 86_400_000
+}
+
+def resample_bars(timestamps: np.ndarray, columns: Dict[str, np.ndarray], milliseconds: int, offset_milliseconds: int = 0) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    # Sorted bars into longer ones, each stamped with the start of its period
+    if not len(timestamps):
+        return timestamps[:0], {name: columns[name][:0] for name in PRICE_COLUMNS}
+
+    periods = (timestamps - offset_milliseconds) // milliseconds
+    starts = np.flatnonzero(np.diff(periods, prepend=periods[0] - 1))
+    ends = np.append(starts[1:], len(timestamps)) - 1
+
+    return periods[starts] * milliseconds + offset_milliseconds, {
+        'open': columns['open'][starts],
+        'close': columns['close'][ends],
+        'high': np.fmax.reduceat(columns['high'], starts),
+        'low': np.fmin.reduceat(columns['low'], starts),
+        'volume': np.add.reduceat(columns['volume'], starts)
+    }
 
 class StockFrame():
-    def __init__(self, data: List[dict]) -> None:
-        self._data = data
-        self._frame = pd.DataFrame = self.create_frame()
+    def __init__(self, data: List[dict], compact: bool = False) -> None:
+        # Compact frames keep float32 prices when they fit and only build the pandas view when asked
+        self.compact = compact
+        self._store: ColumnStore = ColumnStore(columns=PRICE_COLUMNS)
         self._symbol_groups: DataFrameGroupBy = None
+        self._symbol_offsets: np.ndarray = None
         self._symbol_rolling_groups: RollingGroupby = None
+        self._change_logs: List[Tuple[Dict[str, int], bool]] = []      # (log, moves down with evictions)
+        self._eviction_logs: List[Dict[str, int]] = []
+        self._timeframes: Dict[str, Tuple['StockFrame', int, int]] = {}
+
+        # Retention, off unless set_retention is called
+        self._max_bars: Optional[int] = None
+        self._max_age: Optional[int] = None
+        self._min_bars = 0
+        self._spill: Optional[BarSpill] = None
+        self._retention_pending = False
+
+        # Newest close per symbol, at a slot that never moves, so a portfolio can gather them in one go
+        self._latest_slots: Dict[str, int] = {}
+        self._latest_close: np.ndarray = np.full(64, np.nan)
+
+        # The candles aren't kept around once they are in the store
+        self._ingest(data=data)
+        self._frame: pd.DataFrame = None if compact else self.create_frame()
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Dict[str, np.ndarray]], compact: bool = False) -> 'StockFrame':
+        # Build a StockFrame straight from per-symbol column arrays (e.g. memory mapped cache files),
+        # a compact frame copies them into float32 buffers instead of mapping them
+        stock_frame = cls(data=[], compact=compact)
+
+        # The empty data above can't tell whether the prices fit float32, the arrays adopted here can
+        if compact:
+            fits = all(compact_columns(columns) is COMPACT_PRICE_COLUMNS for columns in arrays.values())
+            stock_frame._store = ColumnStore(columns=COMPACT_PRICE_COLUMNS if fits else PRICE_COLUMNS, float_dtype=np.float32)
+
+        for symbol, columns in arrays.items():
+            stock_frame._store.adopt(
+                symbol=symbol,
+                timestamps=columns['datetime'],
+                columns={name: columns[name] for name in PRICE_COLUMNS}
+            )
+
+        stock_frame._reset_views()
+        stock_frame._note_latest(symbols=stock_frame._store.symbols)
+        return stock_frame
 
     @property
     def frame(self) -> pd.DataFrame:
+        # The pandas view is only rebuilt when the store changed since the last access
+        if self._frame is None:
+            self._frame = self._store.to_frame()
         return self._frame
-    
+
     @property
-    def symbol_groups(self) -> DataFrameGroupBy:
-        self._symbol_groups = self._frame.groupby(
-            by = 'symbol',
-            as_index = False,
-            sort = True         # very important
+    def store(self) -> ColumnStore:
+        return self._store
+
+    @property
+    def last_timestamp(self) -> int:
+        # Newest bar across all symbols, in milliseconds since epoch
+        return max(
+            (int(self._store.timestamps(symbol)[-1]) for symbol in self._store.symbols if self._store.length(symbol)),
+            default=0
         )
 
+    @property
+    def symbol_groups(self) -> DataFrameGroupBy:
+        # Kept until the frame changes, like the frame itself
+        if self._symbol_groups is None:
+            self._symbol_groups = self.frame.groupby(
+                by = 'symbol',
+                as_index = False,
+                sort = True         # very important
+            )
+
         return self._symbol_groups
+
+    @property
+    def symbol_offsets(self) -> np.ndarray:
+        # Where each symbol's rows start in the frame (sorted by symbol, then time), plus the end
+        if self._symbol_offsets is None:
+            self._symbol_offsets = self._store.offsets()[1]
+        return self._symbol_offsets
     
     def symbol_rolling_groups(self, size: int) -> RollingGroupby:
-        if not self._symbol_groups:
+        if self._symbol_groups is None:
             self.symbol_groups
 
         self._symbol_rolling_groups = self._symbol_groups.rolling(size)
         return self._symbol_rolling_groups
     
+    def _ingest(self, data: List[dict]) -> None:
+        # Load the candles column by column into the store
+        columns = {
+            name: np.array([quote[name] for quote in data], dtype=dtype)
+            for name, dtype in PRICE_COLUMNS.items()
+        }
+
+        if self.compact:
+            self._store = ColumnStore(columns=compact_columns(columns), float_dtype=np.float32)
+
+        self._store.extend(
+            symbols=np.array([quote['symbol'] for quote in data], dtype=str),
+            timestamps=np.array([quote['datetime'] for quote in data], dtype=np.int64),
+            columns=columns
+        )
+
+        if self.compact:
+            self._store.shrink()
+
+        self._note_latest(symbols=self._store.symbols)
+
     def create_frame(self) -> pd.DataFrame:
-        #make a data frame
-        price_df = pd.DataFrame(data=self._data)
-        price_df = self._parse_datatime_column(price_df=price_df)       # could merge with the seperate functions (prob not needed)
-        price_df = self._set_multi_index(price=price_df)
-        return price_df
-    
-    def _parse_datatime_column(self, price_df: pd.DataFrame) -> pd.DataFrame:
-        price_df['datetime'] = pd.to_datetime(price_df['datetime'], unit='ms', origin='unix')   # this will parse a timestamp from a epoch
-        return price_df
+        # The pandas view of the store
+        return self._store.to_frame()
     
-    def _set_multi_index(self, price_df: pd.DataFrame) -> pd.DataFrame:
-        price_df = price_df.set_index(keys=['symbol', 'datetime'])
-        return price_df
-    
-    def add_rows(self, data: dict) -> None:
-        column_names = ['open', 'close', 'high', 'low', 'volume']
-        
+    def add_rows(self, data: List[dict]) -> None:
+        column_names = list(PRICE_COLUMNS)
+
         for quote in data:
-            # parse the timestamp
-            time_stamp = pd.to_datetime(
-                quote['datetime'],
-                unit='ms',
-                origin='unix'
+            # Append (or overwrite) the bar in the symbol's buffers
+            length = self._store.length(quote['symbol']) if self._timeframes else 0
+            position = self._store.upsert(
+                symbol=quote['symbol'],
+                timestamp=int(quote['datetime']),
+                values={name: quote[name] for name in column_names}
+            )
+
+            # Remember the first row that changed, so indicators only update from there
+            symbol = quote['symbol']
+            self._mark_modified(symbol=symbol, row=position)
+            self._note_latest(symbols=[symbol])
+
+            for timeframe, milliseconds, offset_milliseconds in self._timeframes.values():
+                timeframe._update_timeframe(
+                    source=self,
+                    symbol=symbol,
+                    position=position,
+                    appended=position == length,
+                    milliseconds=milliseconds,
+                    offset_milliseconds=offset_milliseconds
+                )
+
+        if self._retention_pending:
+            # The first add_rows after set_retention trims every symbol, the indicators are registered by now
+            self._retention_pending = False
+            for symbol in self._store.symbols:
+                self._retain(symbol=symbol, slack=0)
+        elif self._max_bars is not None or self._max_age is not None:
+            for symbol in {quote['symbol'] for quote in data}:
+                self._retain(symbol=symbol)
+
+        if data:
+            self._reset_views()
+            for timeframe, _, _ in self._timeframes.values():
+                timeframe._reset_views()
+
+    def set_retention(self, max_bars: Optional[int] = None, max_age_milliseconds: Optional[int] = None, spill: Optional[BarSpill] = None) -> None:
+        """Keep only the last max_bars bars and/or the bars of the last max_age_milliseconds per symbol.
+
+        Never fewer than the indicators need (see require_history). Nothing is
+        dropped until the next add_rows, so indicators registered in between
+        still see the whole history. Older bars are dropped, or appended to the
+        spill file first. Eviction runs in chunks, so the cost per bar stays flat
+        however long the session runs.
+        """
+
+        self._max_bars = max_bars
+        self._max_age = max_age_milliseconds
+        self._spill = spill
+        self._retention_pending = max_bars is not None or max_age_milliseconds is not None
+
+    def require_history(self, bars: int) -> None:
+        # Retention never goes below this, the Indicators raise it to their longest lookback
+        self._min_bars = max(self._min_bars, bars)
+
+    def _retain(self, symbol: str, slack: Optional[int] = None) -> None:
+        segment = self._store.segment(symbol)
+        length = segment.length
+
+        keep = length
+        if self._max_bars is not None:
+            keep = min(keep, self._max_bars)
+        if self._max_age is not None and length:
+            cutoff = segment.timestamps[length - 1] - self._max_age
+            keep = min(keep, length - int(np.searchsorted(segment.timestamps[:length], cutoff)))
+        keep = max(keep, self._min_bars)
+
+        # Let a quarter of the kept size pile up before copying, so eviction is amortized O(1) per bar
+        if slack is None:
+            slack = max(64, keep // 4)
+        drop = length - keep
+        if drop <= 0 or drop < slack:
+            return
+
+        timestamps, columns = segment.drop_front(count=drop, headroom=slack + 1)
+        if self._spill is not None:
+            self._spill.append(symbol=symbol, timestamps=timestamps, columns=columns)
+
+        # Rows moved down, so do the positions other parts are keeping for this symbol
+        for evicted in self._eviction_logs:
+            evicted[symbol] = evicted.get(symbol, 0) + drop
+        for changes, shift in self._change_logs:
+            if not shift:
+                changes[symbol] = 0
+            elif symbol in changes:
+                changes[symbol] = max(0, changes[symbol] - drop)
+
+    def add_timeframe(self, name: str, milliseconds: Optional[int] = None, offset_milliseconds: int = 0) -> 'StockFrame':
+        """Keep a StockFrame of longer bars built from these ones, updated as new bars arrive.
+
+        Periods start at offset_milliseconds past the epoch, so daily bars on an
+        exchange's day need the offset of its timezone. Indicators work on the
+        returned frame like on any other, e.g. Indicators(price_data_frame=frame.timeframe('15min')).
+        """
+
+        if milliseconds is None:
+            milliseconds = TIMEFRAMES[name]
+
+        # Longer bars hold the same prices, so they keep this store's dtypes
+        timeframe = StockFrame(data=[], compact=self.compact)
+        timeframe._store = ColumnStore(
+            columns={name: dtype for name, dtype in self._store.dtypes.items() if name in PRICE_COLUMNS},
+            float_dtype=self._store.float_dtype
+        )
+
+        for symbol in self._store.symbols:
+            if not self._store.length(symbol):
+                continue
+
+            timestamps, columns = resample_bars(
+                timestamps=self._store.timestamps(symbol),
+                columns={column: self._store.column(symbol, column) for column in PRICE_COLUMNS},
+                milliseconds=milliseconds,
+                offset_milliseconds=offset_milliseconds
             )
+            timeframe._store.adopt(symbol=symbol, timestamps=timestamps, columns=columns)
+
+        timeframe._reset_views()
+        timeframe._note_latest(symbols=timeframe._store.symbols)
+        self._timeframes[name] = (timeframe, milliseconds, offset_milliseconds)
+        return timeframe
+
+    def memory_report(self) -> Dict[str, Union[int, dict]]:
+        """Bytes held by the store (per column), the cached pandas view and the timeframes."""
+
+        columns = self._store.memory_usage()
+        frame_bytes = int(self._frame.memory_usage(deep=True, index=True).sum()) if self._frame is not None else 0
+        timeframes = {name: timeframe.memory_report() for name, (timeframe, _, _) in self._timeframes.items()}
 
-            # Define our index
-            row_id = (quote['symbol'], time_stamp)
+        store_bytes = sum(usage['allocated'] for usage in columns.values())
+        return {
+            'symbols': len(self._store.symbols),
+            'rows': len(self._store),
+            'compact': self.compact,
+            'columns': columns,
+            'store': store_bytes,
+            'mapped': sum(usage['mapped'] for usage in columns.values()),
+            'frame': frame_bytes,
+            'timeframes': timeframes,
+            'total': store_bytes + frame_bytes + sum(report['total'] for report in timeframes.values())
+        }
 
-            # Define our values
-            row_values = [
-                quote['open'],
-                quote['close'],
-                quote['high'],
-                quote['low'],
-                quote['volume']
-            ]
+    def timeframe(self, name: str) -> 'StockFrame':
+        return self._timeframes[name][0]
 
-            # New row
-            new_row = pd.Series(data=row_values)
-            # Add row
-            self.frame.loc[row_id, column_names] = new_row.values
-            self.frame.sort_index(inplace=True)
+    @property
+    def timeframes(self) -> List[str]:
+        return list(self._timeframes)
+
+    def _update_timeframe(self, source: 'StockFrame', symbol: str, position: int, appended: bool, milliseconds: int, offset_milliseconds: int) -> None:
+        # Fold the bar the source just wrote at position into our bar for its period
+        timestamp = int(source._store.timestamps(symbol)[position])
+        period_start = (timestamp - offset_milliseconds) // milliseconds * milliseconds + offset_milliseconds
+        segment = self._store.segment(symbol)
+        last = segment.length - 1
+
+        if appended and (last < 0 or segment.timestamps[last] < period_start):
+            row = segment.upsert(
+                timestamp=period_start,
+                values={column: source._store.column(symbol, column)[position] for column in PRICE_COLUMNS}
+            )
+        elif appended and segment.timestamps[last] == period_start:
+            columns = segment.columns
+            columns['close'][last] = source._store.column(symbol, 'close')[position]
+            columns['high'][last] = np.fmax(columns['high'][last], source._store.column(symbol, 'high')[position])
+            columns['low'][last] = np.fmin(columns['low'][last], source._store.column(symbol, 'low')[position])
+            columns['volume'][last] += source._store.column(symbol, 'volume')[position]
+            row = last
+        else:
+            # An overwritten or back-filled bar, aggregate its period again
+            row = self._rebuild_period(source=source, symbol=symbol, period_start=period_start, milliseconds=milliseconds, offset_milliseconds=offset_milliseconds)
+
+        self._mark_modified(symbol=symbol, row=row)
+        self._note_latest(symbols=[symbol])
+
+    def _rebuild_period(self, source: 'StockFrame', symbol: str, period_start: int, milliseconds: int, offset_milliseconds: int) -> int:
+        timestamps = source._store.timestamps(symbol)
+        start = int(np.searchsorted(timestamps, period_start))
+        end = int(np.searchsorted(timestamps, period_start + milliseconds))
+
+        bar_timestamps, bar_columns = resample_bars(
+            timestamps=timestamps[start:end],
+            columns={column: source._store.column(symbol, column)[start:end] for column in PRICE_COLUMNS},
+            milliseconds=milliseconds,
+            offset_milliseconds=offset_milliseconds
+        )
+        return self._store.upsert(
+            symbol=symbol,
+            timestamp=int(bar_timestamps[0]),
+            values={column: values[0] for column, values in bar_columns.items()}
+        )
+
+    def _note_latest(self, symbols: List[str]) -> None:
+        for symbol in symbols:
+            slot = self._latest_slots.get(symbol)
+            if slot is None:
+                slot = self._latest_slots[symbol] = len(self._latest_slots)
+                if slot == len(self._latest_close):
+                    self._latest_close = np.concatenate((self._latest_close, np.full(slot, np.nan)))
+
+            segment = self._store.segment(symbol)
+            self._latest_close[slot] = segment.columns['close'][segment.length - 1] if segment.length else np.nan
+
+    def latest_closes(self) -> Tuple[Dict[str, int], np.ndarray]:
+        """Every symbol's newest close, as symbol -> slot and the closes by slot.
+
+        Slots are handed out once and never move, so a gather index built from
+        them stays valid until new symbols show up (the slot count grows).
+        """
+
+        return self._latest_slots, self._latest_close[:len(self._latest_slots)]
+
+    def _mark_modified(self, symbol: str, row: int) -> None:
+        for changes, _ in self._change_logs:
+            changes[symbol] = min(row, changes.get(symbol, row))
+
+    def track_changes(self, shift: bool = False) -> Dict[str, int]:
+        # A change log of its own for every consumer: symbol -> first row changed, filled as bars
+        # come in, the consumer empties it when it caught up. Evicting rows marks the symbol changed
+        # from row 0, unless shift is set for a consumer that follows the evictions (track_evictions),
+        # then the logged row moves down with the rows.
+        changes = {}
+        self._change_logs.append((changes, shift))
+        return changes
+
+    def untrack_changes(self, changes: Dict[str, int]) -> None:
+        self._change_logs = [(log, shift) for log, shift in self._change_logs if log is not changes]
+
+    def track_evictions(self) -> Dict[str, int]:
+        # Rows dropped from the front of each symbol, per consumer like track_changes
+        evicted = {}
+        self._eviction_logs.append(evicted)
+        return evicted
+
+    def untrack_evictions(self, evicted: Dict[str, int]) -> None:
+        self._eviction_logs = [log for log in self._eviction_logs if log is not evicted]
+
+    def _reset_views(self) -> None:
+        # Invalidate the pandas view, it gets rebuilt on the next access
+        self._frame = None
+        self._symbol_groups = None
+        self._symbol_offsets = None
 
     # defining buy and sell thresholds
     def do_indicators_exist(self, column_names: List[str]) -> bool:
-        if set(column_names).issubset(self._frame.columns):
+        available = set(self._store.columns)
+        if not set(column_names).issubset(available):
+            available.update(self.frame.columns)
+
+        if set(column_names).issubset(available):
             return True
         else:
             raise KeyError("The following indicator columns are missing the StockFrame: {missing_columns}".format (
-                missing_columns=set(column_names).difference(self._frame.columns)
+                missing_columns=set(column_names).difference(available)
             ))
 
-    def _check_signals(self, indicators: dict) -> Union[pd.Series, None]:
-        # Grab the last rows
-        last_rows = self._symbol_groups.tail(1)
+    def latest_values(self, column_names: List[str], symbols: Optional[List[str]] = None) -> Tuple[List[str], np.ndarray]:
+        # The last row of every symbol (or just of these symbols) as a symbols x columns matrix
+        if set(column_names).issubset(self._store.columns):
+            symbols = self._store.symbols if symbols is None else symbols
+            values = np.full((len(symbols), len(column_names)), np.nan)
 
-        conditions = []
+            # Reading must not create segments, unknown symbols keep a row of NaN
+            for row, symbol in enumerate(symbols):
+                last = self._store.length(symbol) - 1
+                if last >= 0:
+                    values[row] = [self._store.column(symbol, name)[last] for name in column_names]
 
-        # Check to see if all the columns exist
-        if self.do_indicators_exist(column_names=indicators.key()):
-            for indicator in indicators:
-                column = last_rows[indicator]
+            return list(symbols), values
 
-                buy_conditon_target = indicators[indicator]['buy']
-                sell_conditon_target = indicators[indicator]['sell']
+        # Columns that only exist on the pandas view (non-streaming indicators)
+        last_rows = self.symbol_groups.tail(1)[column_names]
+        last_rows.index = last_rows.index.get_level_values(0)
+        if symbols is not None:
+            last_rows = last_rows.reindex(symbols)
 
-                buy_conditon_operator = indicators[indicator]['buy_operator']
-                sell_conditon_operator = indicators[indicator]['sell_operator']
+        return last_rows.index.to_list(), last_rows.to_numpy(dtype=np.float64)
 
-                condition_1: pd.Series = buy_conditon_operator(column, buy_conditon_target)
-                condition_2: pd.Series = sell_conditon_operator(column, sell_conditon_target)
-
-                condition_1: condition_1.where(lambda x: x == True).dropna()
-                condition_2: condition_2.where(lambda x: x == True).dropna()
+    def _check_signals(self, plan: SignalPlan, symbols: Optional[List[str]] = None) -> Dict[str, pd.Series]:
+        # Check to see if all the columns exist
+        self.do_indicators_exist(column_names=plan.columns)
 
-                conditions.append(("buys", condition_1), ("sells", condition_2))
+        # Only the given symbols are evaluated, the others keep the hits the plan remembers for them
+        symbols, values = self.latest_values(column_names=plan.columns, symbols=symbols)
+        symbols, signals = plan.update(symbols=symbols, values=values)
 
-        return conditions
\ No newline at end of file
+        # Only keep the symbols that fired
+        return {
+            side: pd.Series(data=True, index=pd.Index([symbols[row] for row in np.flatnonzero(hits)], name='symbol'), dtype=bool)
+            for side, hits in signals.items()
+        }
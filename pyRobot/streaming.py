@@ -0,0 +1,589 @@
+import operator
+import numpy as np
+
+from collections import deque
+from typing import Tuple
+
+from pyRobot.kernels import (
+    segment_positions, segment_shift, segment_diff, segment_cumsum, segment_rolling_max, segment_rolling_min,
+    segment_rolling_std, segment_ewm, segment_wilder
+)
+
+# Running state for the indicators, so a new bar costs constant work per symbol.
+# Every state supports push (a new bar) and replace (the last bar got updated),
+# and seed builds the state plus the full output from a symbol's history.
+# segmented computes the full output for many symbols at once, their values
+# back to back with offsets like the kernels take (the batch indicators).
+# States take their inputs positionally, IndicatorGraph wires them together.
+# lookback is how many bars of input a seed needs to come out (nearly) the same.
+
+class DiffState():
+    @staticmethod
+    def lookback() -> int:
+        return 2
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._last = np.nan
+        self._before_last = np.nan
+
+    def push(self, value: float) -> float:
+        self._before_last = self._last
+        self._last = value
+        self.count += 1
+        return value - self._before_last
+
+    def replace(self, value: float) -> float:
+        self._last = value
+        return value - self._before_last
+
+    @classmethod
+    def seed(cls, values: np.ndarray) -> Tuple['DiffState', np.ndarray]:
+        state = cls()
+        state.count = len(values)
+        if len(values) >= 1:
+            state._last = values[-1]
+        if len(values) >= 2:
+            state._before_last = values[-2]
+
+        output = np.empty(len(values), dtype=np.float64)
+        output[:1] = np.nan
+        output[1:] = np.diff(values)
+        return state, output
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return segment_diff(values=values, offsets=offsets)
+
+class PreviousState(DiffState):
+    # The value one bar back, the same state as the diff
+    def push(self, value: float) -> float:
+        super().push(value)
+        return self._before_last
+
+    def replace(self, value: float) -> float:
+        self._last = value
+        return self._before_last
+
+    @classmethod
+    def seed(cls, values: np.ndarray) -> Tuple['PreviousState', np.ndarray]:
+        state, _ = super().seed(values)
+        return state, segment_shift(values=values, offsets=[0, len(values)])
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return segment_shift(values=values, offsets=offsets)
+
+class CumulativeSumState():
+    # Running total of the values seen so far, missing values add nothing.
+    # Every moving average window is a difference of two of these totals.
+    @staticmethod
+    def lookback() -> int:
+        return 1
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._total = 0.0
+        self._prev_total = 0.0
+
+    def push(self, value: float) -> float:
+        self._prev_total = self._total
+        self.count += 1
+        return self.replace(value)
+
+    def replace(self, value: float) -> float:
+        self._total = self._prev_total + (value if value == value else 0.0)
+        return self._total
+
+    @classmethod
+    def seed(cls, values: np.ndarray) -> Tuple['CumulativeSumState', np.ndarray]:
+        state = cls()
+        state.count = len(values)
+        output = np.nancumsum(values, dtype=np.float64)
+        if len(output) >= 1:
+            state._total = output[-1]
+        if len(output) >= 2:
+            state._prev_total = output[-2]
+        return state, output
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return segment_cumsum(values=values, offsets=offsets)
+
+class MissingCountState(CumulativeSumState):
+    # Running count of the missing values, a window is only complete if it didn't grow
+    def replace(self, value: float) -> float:
+        self._total = self._prev_total + (0.0 if value == value else 1.0)
+        return self._total
+
+    @classmethod
+    def seed(cls, values: np.ndarray) -> Tuple['MissingCountState', np.ndarray]:
+        return super().seed(np.isnan(values).astype(np.float64))
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        return segment_cumsum(values=np.isnan(values).astype(np.float64), offsets=offsets)
+
+class WindowMeanState():
+    # Mean of the last period values from the running total and missing count,
+    # so any number of windows share the two totals and each one costs a subtraction.
+    @staticmethod
+    def lookback(period: int) -> int:
+        return period
+
+    def __init__(self, period: int) -> None:
+        self.count = 0
+        self.period = period
+        self._totals = deque([(0.0, 0.0)], maxlen=period + 1)
+
+    def push(self, total: float, missing: float) -> float:
+        self._totals.append((total, missing))
+        self.count += 1
+        return self._value()
+
+    def replace(self, total: float, missing: float) -> float:
+        self._totals[-1] = (total, missing)
+        return self._value()
+
+    def _value(self) -> float:
+        if len(self._totals) <= self.period:
+            return np.nan
+
+        first_total, first_missing = self._totals[0]
+        last_total, last_missing = self._totals[-1]
+        if last_missing != first_missing:
+            return np.nan
+        return (last_total - first_total) / self.period
+
+    @classmethod
+    def seed(cls, totals: np.ndarray, missing: np.ndarray, period: int) -> Tuple['WindowMeanState', np.ndarray]:
+        state = cls(period=period)
+        state.count = len(totals)
+
+        # Totals with a zero in front, so the window ending on row i is totals[i + 1] - totals[i + 1 - period]
+        totals = np.concatenate(([0.0], totals))
+        missing = np.concatenate(([0.0], missing))
+        state._totals.clear()
+        state._totals.extend(zip(totals[-period - 1:].tolist(), missing[-period - 1:].tolist()))
+
+        output = np.full(state.count, np.nan)
+        if state.count >= period:
+            complete = missing[period:] == missing[:-period]
+            output[period - 1:] = np.where(complete, (totals[period:] - totals[:-period]) / period, np.nan)
+        return state, output
+
+    @staticmethod
+    def segmented(totals: np.ndarray, missing: np.ndarray, offsets: np.ndarray, period: int) -> np.ndarray:
+        # As in seed, with the zero in front of every symbol's first window
+        positions = segment_positions(offsets=offsets)
+        earlier_totals = np.zeros(len(totals))
+        earlier_missing = np.zeros(len(missing))
+        earlier_totals[period:] = totals[:-period]
+        earlier_missing[period:] = missing[:-period]
+        earlier_totals[positions == period - 1] = 0.0
+        earlier_missing[positions == period - 1] = 0.0
+
+        complete = (positions >= period - 1) & (missing == earlier_missing)
+        return np.where(complete, (totals - earlier_totals) / period, np.nan)
+
+class WindowMaxState():
+    # Largest of the last period values, NaN until period values are in or while one of them is missing.
+    # A monotonic deque of (bar, value) holds the candidates among the bars before the newest one, which
+    # is kept aside until the next push, so replacing it doesn't lose candidates it would have pushed out.
+    kernel = staticmethod(segment_rolling_max)
+    pick = staticmethod(max)
+    dominated = staticmethod(operator.le)       # an older value that can never be picked again
+
+    @staticmethod
+    def lookback(period: int) -> int:
+        return period
+
+    def __init__(self, period: int) -> None:
+        self.count = 0
+        self.period = period
+        self._candidates = deque()
+        self._missing = deque()                 # bars with a missing value, oldest first
+        self._last = np.nan
+
+    def push(self, value: float) -> float:
+        if self.count:
+            bar = self.count - 1
+            if self._last != self._last:
+                self._missing.append(bar)
+            else:
+                while self._candidates and self.dominated(self._candidates[-1][1], self._last):
+                    self._candidates.pop()
+                self._candidates.append((bar, self._last))
+
+        self.count += 1
+        self._last = value
+
+        # Drop what fell out of the window
+        first = self.count - self.period
+        while self._candidates and self._candidates[0][0] < first:
+            self._candidates.popleft()
+        while self._missing and self._missing[0] < first:
+            self._missing.popleft()
+        return self._value()
+
+    def replace(self, value: float) -> float:
+        self._last = value
+        return self._value()
+
+    def _value(self) -> float:
+        if self.count < self.period or self._missing or self._last != self._last:
+            return np.nan
+        return self.pick(self._candidates[0][1], self._last) if self._candidates else self._last
+
+    @classmethod
+    def seed(cls, values: np.ndarray, period: int) -> Tuple['WindowMaxState', np.ndarray]:
+        state = cls(period=period)
+        state.count = max(0, len(values) - period)
+        for value in values[-period:].tolist():
+            state.push(value)
+        return state, cls.kernel(values=values, offsets=[0, len(values)], window=period)
+
+    @classmethod
+    def segmented(cls, values: np.ndarray, offsets: np.ndarray, period: int) -> np.ndarray:
+        return cls.kernel(values=values, offsets=offsets, window=period)
+
+class WindowMinState(WindowMaxState):
+    kernel = staticmethod(segment_rolling_min)
+    pick = staticmethod(min)
+    dominated = staticmethod(operator.ge)
+
+class StandardDeviationState():
+    # Sample standard deviation of the last period values (like rolling(period).std()). Welford's
+    # running mean and sum of squared deviations, a value added and one removed per bar, work
+    # relative to the window's mean so high prices don't cancel the spread away. Once every
+    # period bars they are recomputed from the window, rounding never piles up.
+    kernel = staticmethod(segment_rolling_std)
+
+    @staticmethod
+    def lookback(period: int) -> int:
+        return period
+
+    def __init__(self, period: int) -> None:
+        self.count = 0
+        self.period = period
+        self._values = deque(maxlen=period)
+        self._size = 0                          # values in the window that aren't missing
+        self._mean = 0.0
+        self._squares = 0.0
+        self._missing = 0
+        self._pushes = 0                        # since the last recompute
+
+    def _add(self, value: float) -> None:
+        if value != value:
+            self._missing += 1
+            return
+
+        self._size += 1
+        delta = value - self._mean
+        self._mean += delta / self._size
+        self._squares += delta * (value - self._mean)
+
+    def _remove(self, value: float) -> None:
+        if value != value:
+            self._missing -= 1
+            return
+
+        if self._size == 1:
+            self._size, self._mean, self._squares = 0, 0.0, 0.0
+            return
+
+        self._size -= 1
+        delta = value - self._mean
+        self._mean -= delta / self._size
+        self._squares -= delta * (value - self._mean)
+
+    def _recompute(self) -> None:
+        present = [value for value in self._values if value == value]
+        self._size = len(present)
+        self._missing = len(self._values) - len(present)
+        self._mean = sum(present) / len(present) if present else 0.0
+        self._squares = sum((value - self._mean) ** 2 for value in present)
+        self._pushes = 0
+
+    def push(self, value: float) -> float:
+        if len(self._values) == self.period:
+            self._remove(self._values[0])
+        self._values.append(value)
+        self._add(value)
+        self.count += 1
+
+        self._pushes += 1
+        if self._pushes >= self.period:
+            self._recompute()
+        return self._value()
+
+    def replace(self, value: float) -> float:
+        self._remove(self._values[-1])
+        self._values[-1] = value
+        self._add(value)
+        return self._value()
+
+    def _value(self) -> float:
+        if len(self._values) < self.period or self._missing or self.period < 2:
+            return np.nan
+        return np.sqrt(max(self._squares, 0.0) / (self.period - 1))
+
+    @classmethod
+    def seed(cls, values: np.ndarray, period: int) -> Tuple['StandardDeviationState', np.ndarray]:
+        state = cls(period=period)
+        state.count = len(values)
+        state._values.extend(values[-period:].tolist())
+        state._recompute()
+        return state, cls.kernel(values=values, offsets=[0, len(values)], window=period)
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray, period: int) -> np.ndarray:
+        return segment_rolling_std(values=values, offsets=offsets, window=period)
+
+class EwmState():
+    # Same weighting as pandas' ewm(span=period).mean() with adjust=True,
+    # kept as a running numerator and denominator. Missing values add no
+    # weight but still age the ones before them.
+    @staticmethod
+    def lookback(period: int) -> int:
+        # Weights older than four spans are below 0.05% of the total
+        return 4 * period
+
+    def __init__(self, period: int) -> None:
+        self.count = 0
+        self.period = period
+        self._decay = 1.0 - 2.0 / (period + 1.0)
+        self._numerator = 0.0
+        self._denominator = 0.0
+        self._prev_numerator = 0.0
+        self._prev_denominator = 0.0
+
+    def push(self, value: float) -> float:
+        self._prev_numerator = self._numerator
+        self._prev_denominator = self._denominator
+        self.count += 1
+        return self.replace(value)
+
+    def replace(self, value: float) -> float:
+        weight = self._weight() if value == value else 0.0
+        self._numerator = (weight * value if weight else 0.0) + self._decay * self._prev_numerator
+        self._denominator = weight + self._decay * self._prev_denominator
+        return self._numerator / self._denominator if self._denominator > 0.0 else np.nan
+
+    def _weight(self) -> float:
+        # Weight of the value on the current bar
+        return 1.0
+
+    def _weights(self, valid: np.ndarray) -> np.ndarray:
+        return valid.astype(np.float64)
+
+    def _restore(self, values: np.ndarray, outputs: np.ndarray) -> None:
+        # The denominator only depends on which bars had a value, the numerator follows from the mean.
+        # Weights decayed below 1e-18 change neither, so only the recent bars are summed.
+        n = len(values)
+        weights = self._weights(valid=~np.isnan(values))
+        recent = n if self._decay <= 0.0 else min(n, int(np.log(1e-18) / np.log(self._decay)) + 2)
+        powers = self._decay ** np.arange(recent - 1, -1, -1)
+        self.count = n
+
+        for length, numerator, denominator in ((n, '_numerator', '_denominator'), (n - 1, '_prev_numerator', '_prev_denominator')):
+            if length >= 1:
+                window = weights[max(0, length - recent):length]
+                total = float(np.dot(window, powers[recent - len(window):]))
+                setattr(self, denominator, total)
+                setattr(self, numerator, outputs[length - 1] * total if total > 0.0 else 0.0)
+
+    @classmethod
+    def seed(cls, values: np.ndarray, period: int) -> Tuple['EwmState', np.ndarray]:
+        state = cls(period=period)
+        output = cls.segmented(values=values, offsets=[0, len(values)], period=period)
+        state._restore(values=values, outputs=output)
+        return state, output
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray, period: int) -> np.ndarray:
+        return segment_ewm(values=values, offsets=offsets, span=period)
+
+class WilderState(EwmState):
+    # Wilder's smoothing (ATR), pandas' ewm(alpha=1 / period, adjust=False).mean():
+    # the first value weighs one, every later one alpha.
+    @staticmethod
+    def lookback(period: int) -> int:
+        # Four spans, alpha 1 / period is the decay of a span of 2 * period - 1
+        return 4 * (2 * period - 1)
+
+    def __init__(self, period: int) -> None:
+        super().__init__(period=period)
+        self._decay = 1.0 - 1.0 / period
+
+    def _weight(self) -> float:
+        return 1.0 if self._prev_denominator == 0.0 else 1.0 - self._decay
+
+    def _weights(self, valid: np.ndarray) -> np.ndarray:
+        weights = np.where(valid, 1.0 - self._decay, 0.0)
+        if valid.any():
+            weights[np.argmax(valid)] = 1.0
+        return weights
+
+    @staticmethod
+    def segmented(values: np.ndarray, offsets: np.ndarray, period: int) -> np.ndarray:
+        return segment_wilder(values=values, offsets=offsets, period=period)
+
+class MapState():
+    # A node whose output only depends on its inputs on the same bar, it keeps no history.
+    # Parameters (e.g. the width of a band) are passed on to function and vectorized.
+    @staticmethod
+    def lookback(**params) -> int:
+        return 1
+
+    def __init__(self, **params) -> None:
+        self.count = 0
+        self.params = params
+
+    def push(self, *values: float) -> float:
+        self.count += 1
+        return self.function(*values, **self.params)
+
+    def replace(self, *values: float) -> float:
+        return self.function(*values, **self.params)
+
+    @staticmethod
+    def function(*values: float) -> float:
+        raise NotImplementedError
+
+    @staticmethod
+    def vectorized(*values: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    @classmethod
+    def seed(cls, *values: np.ndarray, **params) -> Tuple['MapState', np.ndarray]:
+        state = cls(**params)
+        state.count = len(values[0])
+        return state, cls.vectorized(*values, **params)
+
+    @classmethod
+    def segmented(cls, *values: np.ndarray, offsets: np.ndarray, **params) -> np.ndarray:
+        return cls.vectorized(*values, **params)
+
+class GainState(MapState):
+    @staticmethod
+    def function(change: float) -> float:
+        return change if change >= 0 else 0.0
+
+    @staticmethod
+    def vectorized(change: np.ndarray) -> np.ndarray:
+        return np.where(change >= 0, change, 0.0)
+
+class LossState(MapState):
+    @staticmethod
+    def function(change: float) -> float:
+        return -change if change < 0 else 0.0
+
+    @staticmethod
+    def vectorized(change: np.ndarray) -> np.ndarray:
+        return np.where(change < 0, np.abs(change), 0.0)
+
+class RsiState(MapState):
+    # RSI from the averaged gains and losses
+    @staticmethod
+    def function(up: float, down: float) -> float:
+        if down == 0.0:
+            return 100.0 if up > 0.0 else np.nan
+
+        relative_strength_index = 100.0 - (100.0 / (1.0 + up / down))
+        return 100.0 if relative_strength_index == 0 else relative_strength_index
+
+    @staticmethod
+    def vectorized(up: np.ndarray, down: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            relative_strength = up / down
+            relative_strength_index = 100.0 - (100.0 / (1.0 + relative_strength))
+
+        return np.where(relative_strength_index == 0, 100, relative_strength_index)
+
+class DifferenceState(MapState):
+    @staticmethod
+    def function(first: float, second: float) -> float:
+        return first - second
+
+    @staticmethod
+    def vectorized(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        return np.asarray(first, dtype=np.float64) - second
+
+class ProductState(MapState):
+    @staticmethod
+    def function(first: float, second: float) -> float:
+        return first * second
+
+    @staticmethod
+    def vectorized(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+        return np.asarray(first, dtype=np.float64) * second
+
+class RatioState(MapState):
+    # NaN rather than infinite when the denominator is zero
+    @staticmethod
+    def function(numerator: float, denominator: float) -> float:
+        return numerator / denominator if denominator != 0.0 else np.nan
+
+    @staticmethod
+    def vectorized(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denominator != 0.0, numerator / denominator, np.nan)
+
+class BandState(MapState):
+    # A Bollinger band, width standard deviations away from the mean
+    @staticmethod
+    def function(mean: float, deviation: float, width: float) -> float:
+        return mean + width * deviation
+
+    @staticmethod
+    def vectorized(mean: np.ndarray, deviation: np.ndarray, width: float) -> np.ndarray:
+        return mean + width * deviation
+
+class TypicalPriceState(MapState):
+    @staticmethod
+    def function(high: float, low: float, close: float) -> float:
+        return (high + low + close) / 3.0
+
+    @staticmethod
+    def vectorized(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        return (np.asarray(high, dtype=np.float64) + low + close) / 3.0
+
+class TrueRangeState(MapState):
+    # The bar's range stretched to the previous close, just the range on a symbol's first bar
+    @staticmethod
+    def function(high: float, low: float, previous_close: float) -> float:
+        if previous_close != previous_close:
+            return high - low
+        return max(high - low, abs(high - previous_close), abs(low - previous_close))
+
+    @staticmethod
+    def vectorized(high: np.ndarray, low: np.ndarray, previous_close: np.ndarray) -> np.ndarray:
+        high = np.asarray(high, dtype=np.float64)
+        gaps = np.maximum(np.abs(high - previous_close), np.abs(low - previous_close))
+        return np.where(np.isnan(previous_close), high - low, np.maximum(high - low, gaps))
+
+class StochasticState(MapState):
+    # %K, where the close sits in the range of the window, NaN while the range is flat
+    @staticmethod
+    def function(close: float, highest: float, lowest: float) -> float:
+        if not highest > lowest:
+            return np.nan
+        return 100.0 * (close - lowest) / (highest - lowest)
+
+    @staticmethod
+    def vectorized(close: np.ndarray, highest: np.ndarray, lowest: np.ndarray) -> np.ndarray:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(highest > lowest, 100.0 * (close - lowest) / (highest - lowest), np.nan)
+
+class SignedVolumeState(MapState):
+    # The bar's volume counted up on a rising close and down on a falling one (OBV)
+    @staticmethod
+    def function(change: float, volume: float) -> float:
+        if change > 0:
+            return float(volume)
+        return -float(volume) if change < 0 else 0.0
+
+    @staticmethod
+    def vectorized(change: np.ndarray, volume: np.ndarray) -> np.ndarray:
+        return np.sign(np.nan_to_num(change, nan=0.0)) * np.asarray(volume, dtype=np.float64)
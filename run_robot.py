@@ -1,4 +1,5 @@
 import time as true_time
+import asyncio
 import pprint
 import pathlib
 import operator
@@ -8,6 +9,7 @@ from configparser import ConfigParser
 
 from pyRobot.robot import PyRobot
 from pyRobot.indicators import Indicators
+from pyRobot.bar_cache import BarSpill
 
 # grab the config file values
 config = ConfigParser()
@@ -83,16 +85,16 @@ pprint.pprint(current_quotes)
 end_date = datetime.today()                 # end point for pulling data
 start_date = end_date - timedelta(days=30)  # start pulling for 30 days ago
 
-# Grab historical prices
-historical_prices = trading_robot.grab_historical_prices(
-    start=end_date,
-    end=start_date,
+# Load historical prices into a StockFrame, only the bars missing from the local cache get downloaded
+stock_frame = trading_robot.load_historical_prices(
+    start=start_date,
+    end=end_date,
     bar_size=1,   # One day bars only!
     bar_type='minute'
 )
 
-# Convert data into a StockFrame
-stock_frame = trading_robot.create_stock_frame(data=historical_prices['aggregated'])
+# Keep a week of bars in memory while running (never less than the indicators need), older ones go to disk
+stock_frame.set_retention(max_age_milliseconds=7 * 24 * 60 * 60 * 1000, spill=BarSpill())
 
 # Print the head of the StockFrame
 pprint.pprint(stock_frame.frame.head(n=20))
@@ -156,31 +158,14 @@ trades_dict = {         # If the above indicator happens, this is the trade I wa
     }
 }
 
-while True:
-    # Grab the latest bar
-    latest_bar = trading_robot.get_latest_bar()
+# Dump the per-stage timings and API counters every minute while running, into the
+# data folder next to the package (where the order journal lives) wherever this is run from
+trading_robot.metrics.path = pathlib.Path(__file__).resolve().parent.joinpath('data', 'metrics.json')
+trading_robot.metrics.dump_interval = 60.0
 
-    # Add those bars to the StockFrame
-    stock_frame.add_rows(data=latest_bar)
-
-    # Refresh the indicators
-    indicator_client.refresh()
-
-    print("="*50)
-    print("Current StockFrame")
-    print("-"*50)
-    print(stock_frame.symbol_groups.tail())
-    print("-"*50)
-    print("")
-
-    # Check for signals
-    signals = indicator_client.check_signals()
-
-    # Execute trades
-    trading_robot.execute_signals(signals=signals, trades_to_execute=trades_dict)
-
-    # Grab the last bar, keep in mind this is after adding the new rows
-    last_bar_timestamp = trading_robot.stock_frame.frame.tail(1).index.get_level_values(1)
-
-    # Wait till the next bar
-    trading_robot.wait_till_next_bar(last_bar_timestamp=last_bar_timestamp)
\ No newline at end of file
+# Run the robot on the event loop, it fetches each bar as it closes and reports the bar close to order latency
+latency_report = asyncio.run(
+    trading_robot.run(indicators=indicator_client, trades_to_execute=trades_dict)
+)
+pprint.pprint(latency_report)
+pprint.pprint(trading_robot.metrics.snapshot())
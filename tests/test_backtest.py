@@ -0,0 +1,55 @@
+import operator
+import numpy as np
+import pytest
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+from pyRobot.backtest import Backtest
+
+def golden_cross_frame() -> StockFrame:
+    # SMA(2) crosses above SMA(3) on bar 3 and back below on bar 7, every bar opens a quarter above the last close
+    closes = {
+        'CROSS': [10.0, 10.0, 10.0, 11.0, 12.0, 13.0, 13.0, 12.0, 11.0, 10.0],
+        'FLAT': [10.0] * 10
+    }
+    rows = []
+    for symbol, series in closes.items():
+        for bar, close in enumerate(series):
+            rows.append({
+                'symbol': symbol,
+                'datetime': 60_000 * bar,
+                'open': series[bar - 1] + 0.25 if bar else close,
+                'close': close,
+                'high': close + 1.0,
+                'low': close - 1.0,
+                'volume': 100
+            })
+    return StockFrame(data=rows)
+
+def golden_cross(stock_frame: StockFrame, fast: int = 2, slow: int = 3) -> Indicators:
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.sma(period=fast, column_name='sma_fast')
+    indicators.sma(period=slow, column_name='sma_slow')
+    indicators.set_indicator_signal_compare(indicator_1='sma_fast', indicator_2='sma_slow', condition_buy=operator.gt, condition_sell=operator.lt)
+    return indicators
+
+def test_golden_cross_trade():
+    stock_frame = golden_cross_frame()
+    backtest = Backtest(stock_frame=stock_frame, indicators=golden_cross(stock_frame=stock_frame), quantity=10, commission=0.5)
+    results = backtest.run()
+
+    # Signalled on the closes of bars 3 and 7, filled on the opens of bars 4 and 8 (11.25 and 12.25)
+    np.testing.assert_array_equal(backtest.positions['CROSS'], [0, 0, 0, 0, 1, 1, 1, 1, 0, 0])
+    np.testing.assert_allclose(backtest.equity['CROSS'], [0.0, 0.0, 0.0, 0.0, 7.0, 17.0, 17.0, 7.0, 9.0, 9.0])
+
+    cross = results.loc['CROSS']
+    assert cross['profit_loss'] == pytest.approx(10 * (12.25 - 11.25) - 2 * 0.5)
+    assert cross['trades'] == 2
+    assert cross['round_trips'] == 1
+    assert cross['max_drawdown'] == pytest.approx(10.0)
+    assert cross['exposure'] == pytest.approx(0.4)
+
+    # Equal averages never cross
+    flat = results.loc['FLAT']
+    assert flat['trades'] == 0
+    assert flat['profit_loss'] == 0.0
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from pyRobot.bar_aggregator import BarAggregator, replay_ticks
+
+MINUTE = 60_000
+
+def bar(symbol: str, prices: list, volume: int, start: int) -> dict:
+    return {
+        'symbol': symbol,
+        'open': prices[0],
+        'close': prices[-1],
+        'high': max(prices),
+        'low': min(prices),
+        'volume': volume,
+        'datetime': start
+    }
+
+def replay(path, aggregator: BarAggregator) -> list:
+    # The bars finished after each tick, then the ones left open at the end
+    async def collect():
+        finished = []
+        async for tick in replay_ticks(path=str(path)):
+            finished.append(aggregator.add_tick(**tick))
+        finished.append(aggregator.flush())
+        return finished
+
+    return asyncio.run(collect())
+
+def test_replay_closes_bars_on_the_tick_clock_with_a_grace_period(tmp_path):
+    ticks = [
+        {'symbol': 'AAA', 'price': 10.0, 'size': 1, 'timestamp': 0},
+        {'symbol': 'BBB', 'price': 20.0, 'size': 2, 'timestamp': 1_000},
+        {'symbol': 'AAA', 'price': 11.0, 'size': 3, 'timestamp': 30_000},
+        # Exactly on the boundary, so it opens the next bar
+        {'symbol': 'AAA', 'price': 12.0, 'size': 4, 'timestamp': MINUTE},
+        # Late, but within the grace period
+        {'symbol': 'BBB', 'price': 21.0, 'size': 5, 'timestamp': MINUTE - 500},
+        {'symbol': 'AAA', 'price': 12.5, 'size': 6, 'timestamp': MINUTE + 5_000},
+        # Late, after the grace period closed the bar
+        {'symbol': 'BBB', 'price': 19.0, 'size': 7, 'timestamp': MINUTE - 2_000},
+        {'symbol': 'BBB', 'price': 22.0, 'size': 8, 'timestamp': MINUTE + 10_000}
+    ]
+
+    path = tmp_path.joinpath('ticks.jsonl')
+    path.write_text(''.join(json.dumps(tick) + '\n' for tick in ticks))
+
+    aggregator = BarAggregator(bar_milliseconds=MINUTE, grace_milliseconds=5_000)
+    finished = replay(path=path, aggregator=aggregator)
+
+    assert finished == [
+        [],
+        [],
+        [],
+        # AAA's own next tick finishes its bar, BBB's waits for the grace period
+        [bar(symbol='AAA', prices=[10.0, 11.0], volume=4, start=0)],
+        [],
+        [bar(symbol='BBB', prices=[20.0, 21.0], volume=7, start=0)],
+        [],
+        [],
+        [
+            bar(symbol='AAA', prices=[12.0, 12.5], volume=10, start=MINUTE),
+            bar(symbol='BBB', prices=[22.0], volume=8, start=MINUTE)
+        ]
+    ]
+    assert aggregator.late_ticks == 1
+    assert aggregator.clock == MINUTE + 10_000
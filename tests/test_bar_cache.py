@@ -0,0 +1,38 @@
+from pyRobot.bar_cache import BarCache
+
+MINUTE = 60_000
+
+def minute_candles(minutes: list) -> list:
+    return [
+        {'datetime': minute * MINUTE, 'open': 1.0, 'close': 1.0, 'high': 1.0, 'low': 1.0, 'volume': 1}
+        for minute in minutes
+    ]
+
+def test_missing_ranges_include_interior_gaps(tmp_path):
+    cache = BarCache(folder=tmp_path)
+    cache.update(symbol='SYM', candles=minute_candles(list(range(10, 20)) + list(range(30, 40))))
+
+    assert cache.missing_ranges(symbol='SYM', start=0, end=45 * MINUTE) == [
+        (0, 10 * MINUTE),
+        (19 * MINUTE, 30 * MINUTE),
+        (39 * MINUTE, 45 * MINUTE)
+    ]
+    assert cache.missing_ranges(symbol='SYM', start=12 * MINUTE, end=35 * MINUTE) == [(19 * MINUTE, 30 * MINUTE)]
+
+def test_empty_ranges_are_not_fetched_again(tmp_path):
+    cache = BarCache(folder=tmp_path)
+    cache.update(symbol='SYM', candles=minute_candles(list(range(10, 20)) + list(range(30, 40))))
+
+    # The gap and the time before the first bar came back empty
+    cache.update(symbol='SYM', candles=[], fetched=[(0, 10 * MINUTE), (19 * MINUTE, 30 * MINUTE)])
+
+    # Only the newest bar is fetched again, it may not have closed
+    assert cache.missing_ranges(symbol='SYM', start=0, end=45 * MINUTE) == [(39 * MINUTE, 45 * MINUTE)]
+
+def test_symbol_without_bars_remembers_it_was_fetched(tmp_path):
+    cache = BarCache(folder=tmp_path)
+    assert cache.missing_ranges(symbol='SYM', start=0, end=10 * MINUTE) == [(0, 10 * MINUTE)]
+
+    assert cache.update(symbol='SYM', candles=[], fetched=[(0, 10 * MINUTE)]) is None
+    assert cache.missing_ranges(symbol='SYM', start=0, end=10 * MINUTE) == []
+    assert cache.missing_ranges(symbol='SYM', start=0, end=15 * MINUTE) == [(10 * MINUTE, 15 * MINUTE)]
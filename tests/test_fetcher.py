@@ -0,0 +1,74 @@
+import threading
+import time as time
+
+from pyRobot.fetcher import PriceFetcher
+
+class SlowSession():
+    # Every call takes latency seconds, the stuck symbols hang until released
+    def __init__(self, latency: float, stuck: list) -> None:
+        self.latency = latency
+        self.stuck = stuck
+        self.release = threading.Event()
+
+    def get_price_history(self, symbol: str, **kwargs) -> dict:
+        if symbol in self.stuck:
+            self.release.wait()
+        else:
+            time.sleep(self.latency)
+        return {'symbol': symbol, 'candles': []}
+
+def test_more_slow_requests_than_workers():
+    session = SlowSession(latency=0.2, stuck=['STUCK'])
+    fetcher = PriceFetcher(session=session, max_workers=2, requests_per_second=1000.0, burst=1000, timeout=0.3, max_retries=0)
+    symbols = ['STUCK'] + ['SYM{}'.format(number) for number in range(6)]
+
+    try:
+        responses = fetcher.fetch(requests={symbol: {'symbol': symbol} for symbol in symbols})
+
+        # Only the hanging call times out, the rest waited for a worker instead of timing out in the queue
+        assert sorted(responses) == symbols[1:]
+        assert list(fetcher.failures) == ['STUCK']
+        assert fetcher.metrics.counters['get_price_history.timeouts'] == 1
+        assert fetcher.abandoned == 1
+    finally:
+        session.release.set()
+        fetcher.close()
+
+    time.sleep(0.05)
+    assert fetcher.abandoned == 0
+
+def test_gives_up_when_every_worker_is_stuck():
+    session = SlowSession(latency=0.0, stuck=['STUCK0', 'STUCK1'])
+    fetcher = PriceFetcher(session=session, max_workers=2, requests_per_second=1000.0, burst=1000, timeout=0.1, max_retries=0)
+    symbols = ['STUCK0', 'STUCK1', 'SYM0']
+
+    try:
+        responses = fetcher.fetch(requests={symbol: {'symbol': symbol} for symbol in symbols})
+
+        assert responses == {}
+        assert sorted(fetcher.failures) == symbols
+    finally:
+        session.release.set()
+        fetcher.close()
+
+class FakeClock():
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_default_budget_admits_at_most_120_calls_a_minute():
+    clock = FakeClock()
+    fetcher = PriceFetcher(session=None, clock=clock)
+
+    # Ask for a call every 10 ms for three simulated minutes
+    admitted = []
+    for step in range(18_000):
+        clock.now = step / 100
+        if fetcher._try_acquire() == 0.0:
+            admitted.append(clock.now)
+    fetcher.close()
+
+    assert sum(1 for moment in admitted if moment < 60.0) == 120
+    assert max(sum(1 for moment in admitted if start <= moment < start + 60.0) for start in admitted) == 120
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+
+START_TIME = 1_600_000_000_000
+BAR_MILLISECONDS = 60_000
+
+def candles(symbols: int, bars: int, start_bar: int = 0, seed: int = 0, price: float = 100.0) -> list:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for symbol_number in range(symbols):
+        close = price + np.cumsum(rng.normal(scale=0.1, size=bars))
+        for bar in range(bars):
+            rows.append({
+                'symbol': 'SYM{}'.format(symbol_number),
+                'open': float(close[bar]),
+                'close': float(close[bar]),
+                'high': float(close[bar]) + 0.05,
+                'low': float(close[bar]) - 0.05,
+                'volume': 100,
+                'datetime': START_TIME + (start_bar + bar) * BAR_MILLISECONDS
+            })
+    return rows
+
+def expected_ema(stock_frame: StockFrame, symbol: str, period: int) -> np.ndarray:
+    return pd.Series(stock_frame.store.column(symbol, 'close')).ewm(span=period).mean().to_numpy()
+
+def test_two_streaming_indicators_share_a_frame():
+    stock_frame = StockFrame(data=candles(symbols=2, bars=50))
+    first = Indicators(price_data_frame=stock_frame)
+    second = Indicators(price_data_frame=stock_frame)
+    first.ema(period=10, column_name='ema_10')
+    second.ema(period=20, column_name='ema_20')
+
+    for bar in range(5):
+        stock_frame.add_rows(data=candles(symbols=2, bars=1, start_bar=50 + bar, seed=bar + 1))
+        first.refresh()
+        second.refresh()
+
+    for symbol in ('SYM0', 'SYM1'):
+        np.testing.assert_allclose(stock_frame.store.column(symbol, 'ema_10'), expected_ema(stock_frame, symbol, 10))
+        np.testing.assert_allclose(stock_frame.store.column(symbol, 'ema_20'), expected_ema(stock_frame, symbol, 20))
+
+def test_two_streaming_indicators_follow_evictions():
+    stock_frame = StockFrame(data=candles(symbols=1, bars=200))
+    first = Indicators(price_data_frame=stock_frame)
+    second = Indicators(price_data_frame=stock_frame)
+    first.sma(period=5, column_name='sma_5')
+    second.sma(period=8, column_name='sma_8')
+    stock_frame.set_retention(max_bars=100)
+
+    for bar in range(300):
+        stock_frame.add_rows(data=candles(symbols=1, bars=1, start_bar=200 + bar, seed=bar + 1))
+        first.refresh()
+        second.refresh()
+
+    closes = pd.Series(stock_frame.store.column('SYM0', 'close'))
+    np.testing.assert_allclose(stock_frame.store.column('SYM0', 'sma_5')[8:], closes.rolling(5).mean().to_numpy()[8:])
+    np.testing.assert_allclose(stock_frame.store.column('SYM0', 'sma_8')[8:], closes.rolling(8).mean().to_numpy()[8:])
+
+def test_retention_set_before_registering_keeps_the_lookback():
+    stock_frame = StockFrame(data=candles(symbols=1, bars=100))
+    stock_frame.set_retention(max_bars=10)
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.sma(period=50)
+
+    assert not np.isnan(stock_frame.store.column('SYM0', 'sma')[-1])
+
+    for bar in range(20):
+        stock_frame.add_rows(data=candles(symbols=1, bars=1, start_bar=100 + bar, seed=bar + 1))
+        indicators.refresh()
+
+    # Trimmed to the SMA's lookback, not to the 10 bars asked for
+    closes = pd.Series(stock_frame.store.column('SYM0', 'close'))
+    assert len(closes) >= 50
+    np.testing.assert_allclose(stock_frame.store.column('SYM0', 'sma')[49:], closes.rolling(50).mean().to_numpy()[49:])
+
+def test_bollinger_bands_hold_up_on_long_high_priced_history():
+    bars = 200_000
+    rng = np.random.default_rng(1)
+    close = 3000.0 + np.cumsum(rng.normal(scale=0.1, size=bars))
+    arrays = {
+        'SYM0': {
+            'datetime': START_TIME + np.arange(bars, dtype=np.int64) * BAR_MILLISECONDS,
+            'open': close,
+            'close': close,
+            'high': close + 0.05,
+            'low': close - 0.05,
+            'volume': np.full(bars, 100, dtype=np.int64)
+        }
+    }
+
+    for streaming in [True, False]:
+        stock_frame = StockFrame.from_arrays(arrays=arrays)
+        indicators = Indicators(price_data_frame=stock_frame, streaming=streaming)
+        indicators.bollinger_bands(period=20)
+
+        if streaming:
+            for bar in range(20):
+                stock_frame.add_rows(data=candles(symbols=1, bars=1, start_bar=bars + bar, seed=bar + 1, price=close[-1]))
+                indicators.refresh()
+            upper = stock_frame.store.column('SYM0', 'bollinger_upper')
+            middle = stock_frame.store.column('SYM0', 'bollinger_middle')
+            closes = pd.Series(stock_frame.store.column('SYM0', 'close'))
+        else:
+            upper = stock_frame.frame['bollinger_upper'].to_numpy()
+            middle = stock_frame.frame['bollinger_middle'].to_numpy()
+            closes = pd.Series(close)
+
+        expected = closes.rolling(20).std().to_numpy()
+        np.testing.assert_allclose((upper - middle)[19:] / 2.0, expected[19:], rtol=1e-5)
+
+def ohlcv(symbols: int, bars: int, start_bar: int = 0, seed: int = 0) -> list:
+    # Candles with a random range and volume, so the range and volume indicators have something to do
+    rng = np.random.default_rng(seed)
+    rows = []
+    for symbol_number in range(symbols):
+        close = 100.0 + np.cumsum(rng.normal(scale=0.5, size=bars))
+        spread = np.abs(rng.normal(scale=0.4, size=bars))
+        volume = rng.integers(100, 10_000, size=bars)
+        for bar in range(bars):
+            rows.append({
+                'symbol': 'SYM{}'.format(symbol_number),
+                'open': float(close[bar]),
+                'close': float(close[bar]),
+                'high': float(close[bar] + spread[bar]),
+                'low': float(close[bar] - spread[bar]),
+                'volume': int(volume[bar]),
+                'datetime': START_TIME + (start_bar + bar) * BAR_MILLISECONDS
+            })
+    return rows
+
+def register_extended(indicators: Indicators) -> None:
+    indicators.macd()
+    indicators.atr()
+    indicators.vwap()
+    indicators.stochastic_oscillator()
+    indicators.obv()
+
+def expected_extended(prices: pd.DataFrame) -> dict:
+    close, high, low, volume = prices['close'], prices['high'], prices['low'], prices['volume'].astype(float)
+
+    line = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    signal = line.ewm(span=9).mean()
+
+    previous_close = close.shift(1)
+    true_range = pd.concat([high - low, (high - previous_close).abs(), (low - previous_close).abs()], axis=1).max(axis=1)
+
+    typical_price = (high + low + close) / 3.0
+    highest = high.rolling(14).max()
+    lowest = low.rolling(14).min()
+    percent_k = 100.0 * (close - lowest) / (highest - lowest)
+
+    return {
+        'macd': line,
+        'macd_signal': signal,
+        'macd_histogram': line - signal,
+        'atr': true_range.ewm(alpha=1.0 / 14, adjust=False).mean(),
+        'vwap': (typical_price * volume).rolling(20).sum() / volume.rolling(20).sum(),
+        'stochastic_k': percent_k,
+        'stochastic_d': percent_k.rolling(3).mean(),
+        'obv': (np.sign(close.diff()).fillna(0.0) * volume).cumsum()
+    }
+
+def test_extended_indicators_streaming_batch_and_pandas_agree():
+    stock_frame = StockFrame(data=ohlcv(symbols=3, bars=150))
+    indicators = Indicators(price_data_frame=stock_frame)
+    register_extended(indicators=indicators)
+
+    # Every new bar first comes in unfinished, then gets updated in place
+    for bar in range(50):
+        finished = ohlcv(symbols=3, bars=1, start_bar=150 + bar, seed=bar + 1)
+        unfinished = [dict(quote, close=quote['close'] - 0.3, high=quote['high'] + 0.7, volume=quote['volume'] // 2) for quote in finished]
+        stock_frame.add_rows(data=unfinished)
+        indicators.refresh()
+        stock_frame.add_rows(data=finished)
+        indicators.refresh()
+
+    store = stock_frame.store
+    batch_frame = StockFrame.from_arrays(arrays={
+        symbol: {'datetime': store.timestamps(symbol), **{name: store.column(symbol, name) for name in ['open', 'close', 'high', 'low', 'volume']}}
+        for symbol in store.symbols
+    })
+    register_extended(indicators=Indicators(price_data_frame=batch_frame, streaming=False))
+
+    for symbol in store.symbols:
+        prices = pd.DataFrame({name: store.column(symbol, name) for name in ['close', 'high', 'low', 'volume']})
+        assert len(prices) == 200
+
+        for column, expected in expected_extended(prices=prices).items():
+            streamed = store.column(symbol, column)
+            batched = batch_frame.frame.loc[symbol, column].to_numpy()
+            np.testing.assert_allclose(streamed, expected.to_numpy(), rtol=1e-9, atol=1e-9, err_msg=column)
+            np.testing.assert_allclose(batched, expected.to_numpy(), rtol=1e-9, atol=1e-9, err_msg=column)
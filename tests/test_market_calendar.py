@@ -0,0 +1,74 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from pyRobot.market_calendar import MarketCalendar, nyse_holidays
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+def at(*args) -> float:
+    return datetime(*args, tzinfo=NEW_YORK).timestamp()
+
+def test_holiday_rules():
+    holidays_2021, _ = nyse_holidays(2021)
+    holidays_2022, _ = nyse_holidays(2022)
+
+    # New Year's 2022 fell on a Saturday, the Friday before stays a trading day
+    assert date(2021, 12, 31) not in holidays_2021
+    assert date(2021, 12, 31) not in holidays_2022
+    assert MarketCalendar().is_trading_day(date(2021, 12, 31))
+
+    # Juneteenth from 2022 on, taken on the Monday when it falls on a Sunday
+    assert date(2021, 6, 18) not in holidays_2021
+    assert date(2022, 6, 20) in holidays_2022
+
+def test_early_close_after_thanksgiving():
+    calendar = MarketCalendar()
+    holidays, early_closes = nyse_holidays(2023)
+    assert date(2023, 11, 23) in holidays
+    assert date(2023, 11, 24) in early_closes
+
+    assert calendar.session(at(2023, 11, 24, 12, 59)) == 'regular'
+    assert calendar.session(at(2023, 11, 24, 13, 0)) == 'post'
+    assert calendar.next_bar_boundary(at(2023, 11, 24, 12, 59, 30)) == at(2023, 11, 24, 13, 0)
+    assert calendar.next_bar_boundary(at(2023, 11, 24, 10, 0), bar_type='daily') == at(2023, 11, 24, 13, 0)
+
+def test_sessions_across_the_dst_change():
+    calendar = MarketCalendar()
+
+    # Clocks went forward on Sunday 10 March 2024, the open moved from 14:30 to 13:30 UTC
+    friday_open = datetime(2024, 3, 8, 14, 30, tzinfo=ZoneInfo('UTC')).timestamp()
+    monday_open = datetime(2024, 3, 11, 13, 30, tzinfo=ZoneInfo('UTC')).timestamp()
+    assert friday_open == at(2024, 3, 8, 9, 30)
+    assert monday_open == at(2024, 3, 11, 9, 30)
+
+    assert calendar.session(friday_open - 1) == 'pre'
+    assert calendar.session(friday_open) == 'regular'
+    assert calendar.session(monday_open - 1) == 'pre'
+    assert calendar.session(monday_open) == 'regular'
+    assert calendar.next_open(at(2024, 3, 8, 17, 0)) == monday_open
+
+    # Back in November, Friday's post market ends after midnight UTC and stays on Friday's row
+    assert calendar.session(at(2024, 11, 1, 18, 29)) == 'post'
+    assert calendar.session(at(2024, 11, 1, 18, 30)) is None
+    assert calendar.next_open(at(2024, 11, 1, 18, 30)) == at(2024, 11, 4, 9, 30)
+
+def test_next_open_skips_a_holiday_monday():
+    calendar = MarketCalendar()
+
+    # Martin Luther King Jr. Day, 15 January 2024
+    assert calendar.next_open(at(2024, 1, 12, 16, 0)) == at(2024, 1, 16, 9, 30)
+    assert calendar.next_open(at(2024, 1, 15, 10, 0)) == at(2024, 1, 16, 9, 30)
+    assert calendar.next_open(at(2024, 1, 16, 10, 0)) == at(2024, 1, 16, 10, 0)
+
+def test_minute_boundary_just_before_the_close():
+    calendar = MarketCalendar()
+
+    assert calendar.next_bar_boundary(at(2024, 1, 16, 15, 58, 59)) == at(2024, 1, 16, 15, 59)
+    assert calendar.next_bar_boundary(at(2024, 1, 16, 15, 59, 30)) == at(2024, 1, 16, 16, 0)
+
+    # Five minute bars end with the session even when it is not a whole bar away
+    assert calendar.next_bar_boundary(at(2024, 1, 16, 15, 57), bar_size=5) == at(2024, 1, 16, 16, 0)
+
+    # At the close the next bar is the first one of the next trading day
+    assert calendar.next_bar_boundary(at(2024, 1, 16, 16, 0)) == at(2024, 1, 17, 9, 31)
+    assert calendar.next_bar_boundary(at(2024, 1, 12, 16, 0)) == at(2024, 1, 16, 9, 31)
@@ -0,0 +1,53 @@
+from pyRobot.stock_frame import StockFrame
+from pyRobot.backtest import Backtest
+from pyRobot.optimizer import ParameterSweep
+from tests.test_indicators import candles
+from tests.test_backtest import golden_cross
+
+def test_sweep_ranks_like_the_backtests_it_runs():
+    history = candles(symbols=3, bars=300)
+    stock_frame = StockFrame(data=history)
+    sweep = ParameterSweep(
+        stock_frame=stock_frame,
+        indicators=golden_cross(stock_frame=stock_frame, fast=5, slow=20),
+        indicator_grid={'sma_fast': {'period': [3, 8]}, 'sma_slow': {'period': [15, 30]}},
+        processes=2
+    )
+    ranked = sweep.run()
+
+    # The same four backtests, one at a time on a frame of their own
+    direct = {}
+    for fast in [3, 8]:
+        for slow in [15, 30]:
+            frame = StockFrame(data=history)
+            results = Backtest(stock_frame=frame, indicators=golden_cross(stock_frame=frame, fast=fast, slow=slow)).run()
+            direct[(fast, slow)] = (float(results['profit_loss'].sum()), int(results['trades'].sum()))
+
+    expected = sorted(direct, key=lambda params: direct[params][0], reverse=True)
+    assert list(zip(ranked['sma_fast.period'], ranked['sma_slow.period'])) == expected
+    for fast, slow, profit_loss, trades in zip(ranked['sma_fast.period'], ranked['sma_slow.period'], ranked['profit_loss'], ranked['trades']):
+        assert (profit_loss, trades) == direct[(fast, slow)]
+
+def test_sweep_shares_a_compact_frame_as_float32():
+    history = candles(symbols=2, bars=200)
+    stock_frame = StockFrame(data=history, compact=True)
+    sweep = ParameterSweep(
+        stock_frame=stock_frame,
+        indicators=golden_cross(stock_frame=stock_frame, fast=3, slow=15),
+        indicator_grid={'sma_slow': {'period': [15, 30]}},
+        processes=2
+    )
+
+    blocks, layout, _, _ = sweep._share_columns()
+    for block in blocks:
+        block.close()
+        block.unlink()
+    assert {name: dtype for name, (_, dtype, _) in layout.items()} == {
+        'datetime': '<i8', 'open': '<f4', 'close': '<f4', 'high': '<f4', 'low': '<f4', 'volume': '<i8'
+    }
+
+    ranked = sweep.run()
+    for slow, profit_loss in zip(ranked['sma_slow.period'], ranked['profit_loss']):
+        frame = StockFrame(data=history, compact=True)
+        results = Backtest(stock_frame=frame, indicators=golden_cross(stock_frame=frame, fast=3, slow=slow)).run()
+        assert profit_loss == float(results['profit_loss'].sum())
@@ -0,0 +1,76 @@
+from pyRobot.order_journal import OrderJournal
+
+def test_last_write_survives_close(tmp_path):
+    path = tmp_path.joinpath('orders.jsonl')
+
+    # Nothing reaches the fsync threshold, only close syncs the orders
+    with OrderJournal(path=path, sync_every=1000, sync_interval=3600.0) as journal:
+        journal.append(orders=[{'order_id': 1, 'status': 'QUEUED'}])
+        journal.append(orders=[{'order_id': 1, 'status': 'FILLED'}, {'order_id': 2, 'status': 'QUEUED'}])
+        assert journal._unsynced == 3
+
+    assert journal._file.closed
+    assert journal._unsynced == 0
+    journal.close()
+
+    reopened = OrderJournal(path=path)
+    assert list(reopened) == [{'order_id': 1, 'status': 'FILLED'}, {'order_id': 2, 'status': 'QUEUED'}]
+    reopened.close()
+
+def test_append_after_close_reopens(tmp_path):
+    journal = OrderJournal(path=tmp_path.joinpath('orders.jsonl'))
+    journal.close()
+
+    journal.append(orders=[{'order_id': 3, 'status': 'QUEUED'}])
+    journal.close()
+
+    assert journal.get(3) == {'order_id': 3, 'status': 'QUEUED'}
+
+def order(order_id: int, symbol: str, status: str, minute: int) -> dict:
+    return {
+        'order_id': order_id,
+        'status': status,
+        'timestamp': '2020-01-02T09:{minute:02d}:00'.format(minute=minute),
+        'request_body': {'orderLegCollection': [{'instrument': {'symbol': symbol}}]}
+    }
+
+def scanned(journal: OrderJournal, symbol: str = None, since: str = None) -> list:
+    # What find returns, by reading every order
+    return [
+        order for order in journal
+        if (not since or order['timestamp'] >= since)
+        and (not symbol or order['request_body']['orderLegCollection'][0]['instrument']['symbol'] == symbol)
+    ]
+
+def test_find_by_symbol_and_since_matches_a_full_scan(tmp_path):
+    path = tmp_path.joinpath('orders.jsonl')
+    journal = OrderJournal(path=path)
+
+    journal.append(orders=[order(order_id=1, symbol='MSFT', status='QUEUED', minute=0), order(order_id=2, symbol='AAPL', status='QUEUED', minute=1)])
+    journal.append(orders=[order(order_id=3, symbol='MSFT', status='QUEUED', minute=2), order(order_id=1, symbol='MSFT', status='FILLED', minute=3)])
+    # Order 2 was replaced by one for another symbol
+    journal.append(orders=[order(order_id=2, symbol='SQ', status='REPLACED', minute=4), order(order_id=4, symbol='AAPL', status='QUEUED', minute=5)])
+
+    queries = [
+        (symbol, since)
+        for symbol in [None, 'MSFT', 'AAPL', 'SQ', 'TSLA']
+        for since in [None, '2020-01-02T09:00:00', '2020-01-02T09:02:30', '2020-01-02T09:04:00', '2020-01-02T10:00:00']
+    ]
+
+    for symbol, since in queries:
+        assert journal.find(symbol=symbol, since=since) == scanned(journal, symbol=symbol, since=since)
+
+    assert [found['order_id'] for found in journal.find(symbol='MSFT')] == [3, 1]
+    assert journal.find(symbol='AAPL') == [order(order_id=4, symbol='AAPL', status='QUEUED', minute=5)]
+    assert [found['order_id'] for found in journal.find(since='2020-01-02T09:02:30')] == [1, 2, 4]
+
+    # The indexes are rebuilt by a compaction and when the journal is opened again
+    journal.compact()
+    for symbol, since in queries:
+        assert journal.find(symbol=symbol, since=since) == scanned(journal, symbol=symbol, since=since)
+    journal.close()
+
+    reopened = OrderJournal(path=path)
+    for symbol, since in queries:
+        assert reopened.find(symbol=symbol, since=since) == scanned(reopened, symbol=symbol, since=since)
+    reopened.close()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('td.client')
+
+from pyRobot.portfolio import Portfolio
+from pyRobot.stock_frame import StockFrame
+
+def bars(closes: dict) -> list:
+    # Two bars per symbol, the second one's close is the latest
+    return [
+        {'symbol': symbol, 'datetime': 60_000 * bar, 'open': 1.0, 'close': close if bar else 1.0, 'high': 1.0, 'low': 1.0, 'volume': 1}
+        for symbol, close in closes.items()
+        for bar in range(2)
+    ]
+
+def mixed_portfolio() -> Portfolio:
+    portfolio = Portfolio(account_number='123')
+    portfolio.add_positions(positions=[
+        {'symbol': 'AAPL', 'asset_type': 'equity', 'quantity': 10, 'purchase_price': 100.0},
+        {'symbol': 'SPY', 'asset_type': 'etf', 'quantity': 5, 'purchase_price': 400.0},
+        {'symbol': 'TSLA', 'asset_type': 'equity', 'quantity': -4, 'purchase_price': 200.0},
+        {'symbol': 'NEWCO', 'asset_type': 'equity', 'quantity': 2, 'purchase_price': 50.0}
+    ])
+    return portfolio
+
+def test_mark_to_market_on_a_mixed_portfolio():
+    portfolio = mixed_portfolio()
+    stock_frame = StockFrame(data=bars(closes={'AAPL': 110.0, 'SPY': 420.0, 'TSLA': 230.0}))
+
+    # NEWCO has no bars yet and is valued at cost
+    assert portfolio.mark_to_market(stock_frame=stock_frame) == 1100.0 + 2100.0 - 920.0 + 100.0
+    assert portfolio.profit_loss == 100.0 + 100.0 - 120.0
+    np.testing.assert_array_equal(portfolio.market_values(), [1100.0, 2100.0, -920.0, 100.0])
+
+    # A new bar moves the next mark
+    stock_frame.add_rows(data=[{'symbol': 'AAPL', 'datetime': 120_000, 'open': 1.0, 'close': 90.0, 'high': 1.0, 'low': 1.0, 'volume': 1}])
+    assert portfolio.mark_to_market(stock_frame=stock_frame) == 900.0 + 2100.0 - 920.0 + 100.0
+    assert portfolio.positions['AAPL']['quantity'] == 10
+
+def test_weights_allocation_and_exposure():
+    portfolio = mixed_portfolio()
+    portfolio.mark_to_market(stock_frame=StockFrame(data=bars(closes={'AAPL': 110.0, 'SPY': 420.0, 'TSLA': 230.0})))
+    gross = 1100.0 + 2100.0 + 920.0 + 100.0
+
+    np.testing.assert_allclose(portfolio.allocation_weights(), np.array([1100.0, 2100.0, -920.0, 100.0]) / gross)
+
+    allocation = portfolio.total_allocation()
+    assert allocation == pytest.approx({'equity': 2120.0 / gross, 'etf': 2100.0 / gross})
+
+    assert portfolio.risk_exposure() == pytest.approx({
+        'long': 3300.0,
+        'short': 920.0,
+        'gross': gross,
+        'net': 2380.0,
+        'net_fraction': 2380.0 / gross,
+        'largest_weight': 2100.0 / gross
+    })
+
+def test_add_positions_adds_every_position():
+    portfolio = mixed_portfolio()
+
+    assert portfolio.positions_count == 4
+    assert list(portfolio.positions) == ['AAPL', 'SPY', 'TSLA', 'NEWCO']
+
+def test_remove_position_of_an_unknown_symbol():
+    portfolio = mixed_portfolio()
+
+    assert portfolio.remove_position(symbol='MSFT') == (False, 'MSFT did not exist in the portfolio.')
+    assert portfolio.remove_position(symbol='SPY') == (True, 'SPY was successfully removed.')
+    assert sorted(portfolio.positions) == ['AAPL', 'NEWCO', 'TSLA']
+    assert portfolio.positions['NEWCO']['purchase_price'] == 50.0
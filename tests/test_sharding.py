@@ -0,0 +1,43 @@
+import operator
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+from pyRobot.sharding import ShardPool
+from tests.test_indicators import candles
+
+def build(history: list) -> tuple:
+    stock_frame = StockFrame(data=history)
+    stock_frame.set_retention(max_bars=30)
+    indicators = Indicators(price_data_frame=stock_frame)
+    indicators.rsi(period=14)
+    indicators.sma(period=20)
+    indicators.set_indicator_signals(indicator='rsi', buy=50.0, sell=50.0, condition_buy=operator.ge, condition_sell=operator.lt)
+    return stock_frame, indicators
+
+def as_lists(signals: dict) -> dict:
+    return {side: sorted(hits.index.to_list()) for side, hits in signals.items()}
+
+def test_shards_fire_the_same_signals_as_one_process():
+    history = candles(symbols=7, bars=60)
+    stock_frame, indicators = build(history=history)
+    sharded_frame, sharded_indicators = build(history=history)
+
+    with ShardPool(stock_frame=sharded_frame, indicators=sharded_indicators, shards=3) as pool:
+        fired = 0
+        for bar in range(80):
+            # Every third bar one symbol has no trade, its hit has to be remembered
+            latest_bar = [
+                quote for quote in candles(symbols=7, bars=1, start_bar=60 + bar, seed=bar + 1)
+                if bar % 3 or quote['symbol'] != 'SYM{}'.format(bar % 7)
+            ]
+
+            stock_frame.add_rows(data=latest_bar)
+            indicators.refresh()
+            expected = as_lists(indicators.check_signals())
+
+            assert as_lists(pool.process_bar(latest_bar=latest_bar)) == expected
+            fired += sum(len(symbols) for symbols in expected.values())
+
+    # Retention kicked in and both sides actually fired
+    assert stock_frame.store.length('SYM1') < 140
+    assert fired > 0
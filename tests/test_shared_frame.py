@@ -0,0 +1,108 @@
+import os
+import threading
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.shared_frame import SharedFramePublisher, SLOTS, attach_frame
+from tests.test_indicators import candles
+
+def frame_name(test: str) -> str:
+    return 'pyrobot_test_{test}_{pid}'.format(test=test, pid=os.getpid())
+
+def published_closes(stock_frame: StockFrame) -> dict:
+    return {symbol: stock_frame.store.column(symbol, 'close').copy() for symbol in stock_frame.store.symbols}
+
+def snapshot_closes(snapshot) -> dict:
+    return {symbol: np.array(snapshot.column(symbol, 'close')) for symbol in snapshot.symbols}
+
+def assert_same(closes: dict, expected: dict) -> None:
+    assert list(closes) == list(expected)
+    for symbol, values in expected.items():
+        np.testing.assert_array_equal(closes[symbol], values)
+
+def test_publisher_takes_over_a_stale_block():
+    name = frame_name('stale')
+
+    # What a crashed run leaves behind: the header block, never unlinked
+    stale = shared_memory.SharedMemory(name=name, create=True, size=64)
+    stale.close()
+
+    stock_frame = StockFrame(data=candles(symbols=2, bars=10))
+    publisher = SharedFramePublisher(stock_frame=stock_frame, name=name)
+    try:
+        publisher.publish()
+        reader = attach_frame(name=name)
+        assert_same(snapshot_closes(reader.snapshot(copy=True)), published_closes(stock_frame))
+        reader.close()
+    finally:
+        publisher.close()
+        publisher.close()
+
+def test_reader_retries_a_slot_written_over_while_it_reads():
+    name = frame_name('torn')
+    stock_frame = StockFrame(data=candles(symbols=3, bars=10))
+    publisher = SharedFramePublisher(stock_frame=stock_frame, name=name, headroom=2)
+    publisher.publish()
+    reader = attach_frame(name=name)
+
+    # Between reading the header and the slot, the publisher comes around to that slot again
+    # (with new symbols and outgrown regions, so in a new generation of blocks too)
+    read_block = reader._block
+    bars = iter(range(SLOTS))
+
+    def publish_while_reading(block_name: str):
+        block = read_block(block_name)
+        for bar in bars:
+            stock_frame.add_rows(data=candles(symbols=4, bars=3, start_bar=10 + 3 * bar, seed=bar + 1))
+            publisher.publish()
+        return block
+
+    reader._block = publish_while_reading
+    try:
+        snapshot = reader.snapshot(copy=True)
+        assert snapshot.version == publisher.version == SLOTS + 1
+        assert publisher._generation > 1
+        assert_same(snapshot_closes(snapshot), published_closes(stock_frame))
+    finally:
+        reader.close()
+        publisher.close()
+
+def test_reader_snapshots_while_the_publisher_appends():
+    name = frame_name('live')
+    stock_frame = StockFrame(data=candles(symbols=3, bars=20))
+    publisher = SharedFramePublisher(stock_frame=stock_frame, name=name, headroom=8)
+    expected = {1: published_closes(stock_frame)}
+    publisher.publish()
+
+    reader = attach_frame(name=name)
+    done = threading.Event()
+    seen = []
+    errors = []
+
+    def read() -> None:
+        try:
+            while not done.is_set():
+                snapshot = reader.snapshot(copy=True)
+                assert_same(snapshot_closes(snapshot), expected[snapshot.version])
+                seen.append(snapshot.version)
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    try:
+        for bar in range(200):
+            stock_frame.add_rows(data=candles(symbols=3 + bar // 50, bars=1, start_bar=20 + bar, seed=bar + 1))
+            expected[publisher.version + 1] = published_closes(stock_frame)
+            publisher.publish()
+    finally:
+        done.set()
+        thread.join()
+        reader.close()
+        publisher.close()
+
+    assert not errors, errors[0]
+    assert publisher._generation > 1
+    assert len(set(seen)) > 1
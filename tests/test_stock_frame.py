@@ -0,0 +1,59 @@
+import numpy as np
+
+from pyRobot.stock_frame import StockFrame
+from pyRobot.indicators import Indicators
+from tests.test_indicators import candles, START_TIME
+
+def test_latest_values_leaves_unknown_symbols_alone():
+    stock_frame = StockFrame(data=candles(symbols=2, bars=10))
+
+    symbols, values = stock_frame.latest_values(column_names=['close'], symbols=['SYM1', 'MISSING'])
+
+    assert symbols == ['SYM1', 'MISSING']
+    assert values[0, 0] == stock_frame.store.column('SYM1', 'close')[-1]
+    assert np.isnan(values[1, 0])
+    assert 'MISSING' not in stock_frame.store
+
+def test_latest_values_honours_symbols_on_the_pandas_view():
+    stock_frame = StockFrame(data=candles(symbols=3, bars=30))
+    indicators = Indicators(price_data_frame=stock_frame, streaming=False)
+    indicators.sma(period=5)
+
+    symbols, values = stock_frame.latest_values(column_names=['sma'], symbols=['SYM2', 'MISSING'])
+
+    assert symbols == ['SYM2', 'MISSING']
+    assert values[0, 0] == stock_frame.frame.loc['SYM2', 'sma'].iloc[-1]
+    assert np.isnan(values[1, 0])
+
+def wide_price_arrays(price: float) -> dict:
+    # A price that float32 can only hold to about two cents
+    timestamps = START_TIME + np.arange(10, dtype=np.int64) * 60_000
+    prices = price + np.arange(10) * 0.01
+    return {
+        'SYM0': {
+            'datetime': timestamps,
+            'open': prices,
+            'close': prices,
+            'high': prices,
+            'low': prices,
+            'volume': np.full(10, 100, dtype=np.int64)
+        }
+    }
+
+def test_compact_from_arrays_keeps_float64_when_cents_do_not_fit():
+    arrays = wide_price_arrays(price=612345.67)
+    stock_frame = StockFrame.from_arrays(arrays=arrays, compact=True)
+
+    assert stock_frame.store.dtypes['close'] == np.float64
+    np.testing.assert_array_equal(stock_frame.store.column('SYM0', 'close'), arrays['SYM0']['close'])
+
+    # Longer bars keep the float64 prices too
+    timeframe = stock_frame.add_timeframe(name='5min')
+    assert timeframe.store.dtypes['close'] == np.float64
+    assert np.isin(timeframe.store.column('SYM0', 'close'), arrays['SYM0']['close']).all()
+
+def test_compact_from_arrays_uses_float32_when_cents_fit():
+    stock_frame = StockFrame.from_arrays(arrays=wide_price_arrays(price=123.45), compact=True)
+
+    assert stock_frame.store.dtypes['close'] == np.float32
+    assert stock_frame.add_timeframe(name='5min').store.dtypes['close'] == np.float32